@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import hashlib
+import os
+
+from fastapi import Request, Response, status
+
+from .. import metrics
+
+# Default Cache-Control per endpoint. ``no-cache`` lets browsers keep the body
+# but forces a conditional revalidation, which is answered with 304 when the
+# data has not changed. Override with KABUCOUNT_CACHE_CONTROL_<NAME>, e.g.
+# KABUCOUNT_CACHE_CONTROL_QUOTES="private, max-age=60".
+CACHE_CONTROL = {
+    "transactions": "no-cache",
+    "positions": "no-cache",
+    "funds": "no-cache",
+    "quotes": "no-cache",
+    "dashboard": "no-cache",
+}
+
+
+def cache_control(endpoint: str) -> str:
+    override = os.environ.get(f"KABUCOUNT_CACHE_CONTROL_{endpoint.upper()}")
+    if override and override.strip():
+        return override.strip()
+    return CACHE_CONTROL.get(endpoint, "no-cache")
+
+
+def make_etag(*parts: object) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8"))
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison as required for ``If-None-Match`` (RFC 9110 §13.1.2)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_response(
+    request: Request, response: Response, endpoint: str, *parts: object
+) -> Response | None:
+    """Return a 304 response if the client's copy is current.
+
+    Otherwise the ETag and Cache-Control headers are set on ``response`` and
+    ``None`` is returned so the handler goes on to build the body.
+    """
+    etag = make_etag(endpoint, *parts)
+    headers = {"ETag": etag, "Cache-Control": cache_control(endpoint)}
+    if_none_match = request.headers.get("if-none-match")
+    matched = etag_matches(if_none_match, etag)
+    if if_none_match:
+        metrics.record_cache(f"etag_{endpoint}", matched)
+    if matched:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+import anyio
+from fastapi import HTTPException, Request, Response, status
+
+from ..serialization import dump_json
+from ..storage.async_repository import run_storage
+from ..storage.sqlite_storage import SQLiteStorage
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# How long a completed response is replayed for the same key.
+IDEMPOTENCY_TTL_SECONDS = _env_float("KABUCOUNT_IDEMPOTENCY_TTL_SECONDS", 86400)
+# Upper bound on stored keys; the oldest are evicted first.
+IDEMPOTENCY_MAX_KEYS = int(_env_float("KABUCOUNT_IDEMPOTENCY_MAX_KEYS", 10000))
+# Lease on an in-flight key, after which a retry may run the request again.
+IDEMPOTENCY_LEASE_SECONDS = 60.0
+# Bulk eviction runs at most this often; expired keys are also cleared on claim.
+_EVICT_INTERVAL_SECONDS = 60.0
+_MAX_KEY_LENGTH = 255
+
+_last_eviction = 0.0
+
+
+def _fingerprint(request: Request, body: bytes) -> str:
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+async def idempotent(
+    request: Request,
+    storage: SQLiteStorage,
+    status_code: int,
+    tp: Any,
+    call: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Run ``call`` at most once per ``Idempotency-Key`` header value.
+
+    Without the header ``call``'s result is returned unchanged. With it, the
+    first request stores its serialized response and retries with the same
+    key get that response back (marked ``Idempotent-Replayed: true``) after a
+    single primary-key lookup. A retry while the first request is still
+    running gets 409; reusing a key for a different request gets 422. Failed
+    requests release the key so they can be retried.
+    """
+    key = request.headers.get("idempotency-key")
+    if key is None:
+        return await call()
+    key = key.strip()
+    if not key or len(key) > _MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{_MAX_KEY_LENGTH} characters",
+        )
+
+    global _last_eviction
+    now = time.time()
+    if now - _last_eviction >= _EVICT_INTERVAL_SECONDS:
+        _last_eviction = now
+        await run_storage(storage.evict_idempotency_keys, now, IDEMPOTENCY_MAX_KEYS)
+
+    fingerprint = _fingerprint(request, await request.body())
+    existing = await run_storage(
+        storage.claim_idempotency_key, key, fingerprint, now, now + IDEMPOTENCY_LEASE_SECONDS
+    )
+    if existing is not None:
+        if existing["status_code"] is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+        if existing["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request",
+            )
+        return Response(
+            content=existing["body"],
+            status_code=existing["status_code"],
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    try:
+        result = await call()
+    except BaseException:
+        with anyio.CancelScope(shield=True):
+            await run_storage(storage.release_idempotency_key, key)
+        raise
+    body = dump_json(tp, result)
+    await run_storage(
+        storage.complete_idempotency_key,
+        key,
+        status_code,
+        body,
+        time.time() + IDEMPOTENCY_TTL_SECONDS,
+    )
+    return Response(content=body, status_code=status_code, media_type="application/json")
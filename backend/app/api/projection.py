@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import types
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+# Nested include/exclude tree in pydantic's format, e.g.
+# {"symbol": True, "breakdown": {"__all__": {"quantity": True}}}.
+FieldSpec = dict[Any, Any]
+
+
+@dataclass(frozen=True)
+class Projection:
+    """Compiled ``fields=``/``exclude=`` selection for one response type."""
+
+    include: FieldSpec | None = None
+    exclude: FieldSpec | None = None
+
+    @property
+    def is_empty(self) -> bool:
+        return self.include is None and self.exclude is None
+
+    def many(self) -> Projection:
+        """The same selection applied to every item of a list."""
+        return Projection(
+            include={"__all__": self.include} if self.include is not None else None,
+            exclude={"__all__": self.exclude} if self.exclude is not None else None,
+        )
+
+    def under(self, name: str, keep: tuple[str, ...] = ()) -> Projection:
+        """The selection applied to field ``name``; ``keep`` siblings stay whole."""
+        include = None
+        if self.include is not None:
+            include = {name: self.include, **{field: True for field in keep}}
+        exclude = {name: self.exclude} if self.exclude is not None else None
+        return Projection(include=include, exclude=exclude)
+
+
+def _unwrap(annotation: Any) -> tuple[type[BaseModel] | None, bool]:
+    """Return the model behind ``annotation`` and whether it is a list of them."""
+    is_list = False
+    while True:
+        origin = get_origin(annotation)
+        if origin in (Union, types.UnionType):
+            args = [arg for arg in get_args(annotation) if arg is not type(None)]
+            if len(args) != 1:
+                return None, is_list
+            annotation = args[0]
+        elif origin in (list, tuple, set, frozenset):
+            is_list = True
+            annotation = get_args(annotation)[0]
+        else:
+            break
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, is_list
+    return None, is_list
+
+
+def _parse_paths(value: str | None) -> list[list[str]]:
+    if not value:
+        return []
+    return [
+        [part.strip() for part in item.split(".")]
+        for item in value.split(",")
+        if item.strip()
+    ]
+
+
+def _build_spec(model: type[BaseModel], paths: list[list[str]]) -> FieldSpec:
+    # Plain tree first: name -> True (whole field) or name -> subtree.
+    tree: dict[str, Any] = {}
+    for path in paths:
+        current_model: type[BaseModel] | None = model
+        node = tree
+        for depth, name in enumerate(path):
+            if current_model is None or name not in current_model.model_fields:
+                raise ValueError(f"Unknown field {'.'.join(path[: depth + 1])}")
+            last = depth == len(path) - 1
+            existing = node.get(name)
+            if last:
+                node[name] = True
+                break
+            if existing is True:
+                break
+            current_model, _ = _unwrap(current_model.model_fields[name].annotation)
+            if current_model is None:
+                raise ValueError(f"Field {'.'.join(path[: depth + 1])} has no subfields")
+            node = node.setdefault(name, {})
+    return _to_pydantic(model, tree)
+
+
+def _to_pydantic(model: type[BaseModel], tree: dict[str, Any]) -> FieldSpec:
+    spec: FieldSpec = {}
+    for name, subtree in tree.items():
+        if subtree is True:
+            spec[name] = True
+            continue
+        child, is_list = _unwrap(model.model_fields[name].annotation)
+        assert child is not None
+        compiled = _to_pydantic(child, subtree)
+        spec[name] = {"__all__": compiled} if is_list else compiled
+    return spec
+
+
+@lru_cache(maxsize=256)
+def compile_projection(
+    model: type[BaseModel], fields: str | None, exclude: str | None
+) -> Projection:
+    """Validate dotted field paths against ``model`` and build the selection.
+
+    Compiled selections are cached per query, so repeated requests go straight
+    to the serializer. Unknown fields raise ``ValueError``.
+    """
+    include_paths = _parse_paths(fields)
+    exclude_paths = _parse_paths(exclude)
+    return Projection(
+        include=_build_spec(model, include_paths) if include_paths else None,
+        exclude=_build_spec(model, exclude_paths) if exclude_paths else None,
+    )
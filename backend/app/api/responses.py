@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import Response
+
+from ..serialization import dump_json
+from .projection import Projection
+
+
+def json_response(
+    response: Response, tp: Any, data: Any, projection: Projection | None = None
+) -> Response:
+    """Serialize ``data`` as ``tp`` straight to JSON bytes.
+
+    Skips FastAPI's response-model re-validation and ``jsonable_encoder``
+    pass; with a projection, unselected fields are never serialized. Headers
+    already set on ``response`` (ETag, Cache-Control) are carried over.
+    """
+    body = dump_json(
+        tp,
+        data,
+        include=projection.include if projection else None,
+        exclude=projection.exclude if projection else None,
+    )
+    headers = {
+        key: value for key, value in response.headers.items() if key != "content-length"
+    }
+    return Response(content=body, media_type="application/json", headers=headers)
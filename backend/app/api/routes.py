@@ -1,10 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+from collections.abc import AsyncIterator
 from datetime import date
 
-from fastapi import APIRouter, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+from .caching import conditional_response
+from .idempotency import idempotent
+from .projection import Projection, compile_projection
+from .responses import json_response
 from ..models.schemas import (
+    BatchRequest,
+    BatchResponse,
+    BulkTransactionResponse,
+    ChangesResponse,
+    DashboardResponse,
     FundSnapshots,
     FundingCapitalAdjustment,
     FundingCapitalAdjustmentBase,
@@ -17,15 +30,19 @@ from ..models.schemas import (
     QuoteSnapshot,
     HealthResponse,
     Position,
+    PositionHistoryBatchRequest,
+    PositionHistoryBatchResponse,
     PositionHistoryResponse,
+    PriceImportSummary,
     RoundTripYieldRequest,
     RoundTripYieldResponse,
     TaxSettlementRecord,
     TaxSettlementRequest,
     TaxSettlementUpdate,
-    TaxStatus,
     Transaction,
     TransactionCreate,
+    TransactionPage,
+    TransactionQuery,
     TransactionUpdate,
 )
 from ..services.analytics import (
@@ -36,23 +53,106 @@ from ..services.analytics import (
     record_tax_settlement,
     update_tax_settlement,
 )
-from ..services.history import get_position_history
+from ..services.batch import run_batch
+from ..services.changes import list_changes
+from ..services.dashboard import (
+    build_dashboard,
+    dashboard_collections,
+    load_dashboard_snapshot,
+    parse_dashboard_include,
+)
+from ..services.events import HEARTBEAT_SECONDS, broadcaster, change_feed
+from ..services.downsampling import normalize_resolution
+from ..services.export import (
+    EXPORT_COLLECTIONS,
+    MEDIA_TYPES,
+    iter_archive_export,
+    iter_collection_export,
+    normalize_export_format,
+)
+from ..services import transactions as transaction_service
+from ..services.ingest import ingest_bulk_transactions, parse_bulk_payload
+from ..services.history import (
+    get_position_histories,
+    get_position_history,
+    iter_position_histories,
+    resolve_history_range,
+)
+from ..services.price_import import detect_format, import_price_file
+from ..services.provider import run_market_data
+from ..storage.async_repository import AsyncLocalDataRepository
 from ..storage.repository import LocalDataRepository
-from ..services.quotes import refresh_quotes_if_needed
+from ..services.quotes import refresh_quotes_if_needed_async
 
 router = APIRouter(prefix="/api", tags=["kabucount"])
 repository = LocalDataRepository()
 repository.ensure_default_groups()
 
 
+async def get_storage() -> AsyncLocalDataRepository:
+    # Resolved per request so tests and scripts can swap ``repository``.
+    return AsyncLocalDataRepository(repository)
+
+
+def _resolve_projection(model, fields: str | None, exclude: str | None) -> Projection:
+    try:
+        return compile_projection(model, fields, exclude)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
 @router.get("/health", response_model=HealthResponse)
-def health_check() -> HealthResponse:
+async def health_check() -> HealthResponse:
     return HealthResponse(status="ok")
 
 
 @router.get("/transactions", response_model=list[Transaction])
-def list_transactions() -> list[Transaction]:
-    return repository.list_transactions()
+async def list_transactions(
+    request: Request,
+    response: Response,
+    query: TransactionQuery = Depends(),
+    fields: str | None = None,
+    exclude: str | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    projection = _resolve_projection(Transaction, fields, exclude)
+    not_modified = conditional_response(
+        request,
+        response,
+        "transactions",
+        store.sync.data_revision("transactions"),
+        request.url.query,
+    )
+    if not_modified is not None:
+        return not_modified
+    if query.is_empty():
+        transactions = await store.list_transactions()
+    else:
+        transactions = await store.query_transactions(query)
+    return json_response(response, list[Transaction], transactions, projection.many())
+
+
+@router.get("/transactions/page", response_model=TransactionPage)
+async def page_transactions(
+    response: Response,
+    query: TransactionQuery = Depends(),
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    fields: str | None = None,
+    exclude: str | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    projection = _resolve_projection(Transaction, fields, exclude)
+    try:
+        page = await store.page_transactions(query, cursor=cursor, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return json_response(
+        response,
+        TransactionPage,
+        page,
+        projection.many().under("items", keep=("next_cursor",)),
+    )
 
 
 @router.post(
@@ -60,36 +160,66 @@ def list_transactions() -> list[Transaction]:
     response_model=Transaction,
     status_code=status.HTTP_201_CREATED,
 )
-def create_transaction(payload: TransactionCreate) -> Transaction:
-    transactions = repository.list_transactions()
-    groups = repository.list_funding_groups()
-    if payload.funding_group not in {group.name for group in groups}:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Funding group not found",
-        )
-    if payload.quantity < 0:
-        available_quantity = sum(
-            tx.quantity
-            for tx in transactions
-            if tx.symbol == payload.symbol
-            and tx.market == payload.market
-            and tx.cash_currency == payload.cash_currency
-        )
-        if available_quantity + payload.quantity < -1e-9:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Insufficient position to complete sell order",
-            )
-    return repository.add_transaction(payload)
+async def create_transaction(
+    payload: TransactionCreate,
+    request: Request,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    return await idempotent(
+        request,
+        store.sync.sqlite,
+        status.HTTP_201_CREATED,
+        Transaction,
+        lambda: _create_transaction(payload, store),
+    )
+
+
+async def _create_transaction(
+    payload: TransactionCreate, store: AsyncLocalDataRepository
+) -> Transaction:
+    try:
+        return await store.run(transaction_service.create_transaction, payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def execute_batch(
+    payload: BatchRequest,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> BatchResponse:
+    """Run create/update/delete operations atomically with one write per collection."""
+    return await store.run(run_batch, payload)
+
+
+@router.post("/transactions/bulk", response_model=BulkTransactionResponse)
+async def create_transactions_bulk(
+    request: Request,
+    atomic: bool = False,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> BulkTransactionResponse:
+    """Ingest a JSON array or NDJSON body of transactions with one write.
+
+    Valid rows are committed and invalid ones reported per row; with
+    ``atomic=true`` nothing is written unless every row is valid.
+    """
+    try:
+        rows = parse_bulk_payload(await request.body())
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    return await store.run(ingest_bulk_transactions, rows, atomic)
 
 
 @router.post(
     "/transactions/round-yield",
     response_model=RoundTripYieldResponse,
 )
-def calculate_round_trip_yield(payload: RoundTripYieldRequest) -> RoundTripYieldResponse:
-    transactions = repository.list_transactions()
+async def calculate_round_trip_yield(
+    payload: RoundTripYieldRequest,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> RoundTripYieldResponse:
+    transactions = await store.list_transactions()
     transaction_lookup = {tx.id: tx for tx in transactions}
     missing = [tx_id for tx_id in payload.transaction_ids if tx_id not in transaction_lookup]
     if missing:
@@ -99,7 +229,7 @@ def calculate_round_trip_yield(payload: RoundTripYieldRequest) -> RoundTripYield
         )
 
     selected_transactions = [transaction_lookup[tx_id] for tx_id in payload.transaction_ids]
-    settlements = repository.list_tax_settlements()
+    settlements = await store.list_tax_settlements()
     relevant_settlements = [
         record for record in settlements if record.transaction_id in payload.transaction_ids
     ]
@@ -115,99 +245,223 @@ def calculate_round_trip_yield(payload: RoundTripYieldRequest) -> RoundTripYield
     methods=["PUT", "PATCH"],
     response_model=Transaction,
 )
-def update_transaction(transaction_id: str, payload: TransactionUpdate) -> Transaction:
+async def update_transaction(
+    transaction_id: str,
+    payload: TransactionUpdate,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> Transaction:
     try:
-        repository.get_transaction(transaction_id)
+        await store.get_transaction(transaction_id)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
 
-    groups = repository.list_funding_groups()
-    if payload.funding_group not in {group.name for group in groups}:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Funding group not found",
-        )
-
-    transactions = repository.list_transactions()
-    filtered_transactions = [tx for tx in transactions if tx.id != transaction_id]
-    if payload.quantity < 0:
-        available_quantity = sum(
-            tx.quantity
-            for tx in filtered_transactions
-            if tx.symbol == payload.symbol
-            and tx.market == payload.market
-            and tx.cash_currency == payload.cash_currency
-        )
-        if available_quantity + payload.quantity < -1e-9:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Insufficient position to complete sell order",
-            )
-
-    if payload.taxed == TaxStatus.NO:
-        settlements = repository.list_tax_settlements()
-        if any(item.transaction_id == transaction_id for item in settlements):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot mark transaction as untaxed while a tax settlement exists",
-            )
-
-    updated_transaction = Transaction(id=transaction_id, **payload.model_dump())
     try:
-        return repository.update_transaction(updated_transaction)
+        return await store.run(transaction_service.update_transaction, transaction_id, payload)
     except ValueError as exc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
 
 @router.delete("/transactions/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_transaction(transaction_id: str) -> Response:
+async def delete_transaction(
+    transaction_id: str,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> Response:
     try:
-        repository.delete_transaction(transaction_id)
+        await store.delete_transaction(transaction_id)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.get("/positions", response_model=list[Position])
-def get_positions() -> list[Position]:
-    transactions = repository.list_transactions()
-    fx_exchanges = repository.list_fx_exchanges()
-    quotes = repository.list_quotes()
+async def get_positions(
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    exclude: str | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    projection = _resolve_projection(Position, fields, exclude)
+    not_modified = conditional_response(
+        request,
+        response,
+        "positions",
+        store.sync.data_revision("transactions", "fx_exchanges", "quotes"),
+        fields,
+        exclude,
+    )
+    if not_modified is not None:
+        return not_modified
+    transactions = await store.list_transactions()
+    fx_exchanges = await store.list_fx_exchanges()
+    quotes = await store.list_quotes()
+    try:
+        positions = await run_in_threadpool(
+            compute_positions, transactions, fx_exchanges, quotes
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return json_response(response, list[Position], positions, projection.many())
+
+
+def _resolve_resolution(resolution: str) -> str:
+    try:
+        return normalize_resolution(resolution)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+def _resolve_history_range(
+    period: str, start: date | None, end: date | None
+) -> tuple[date, date]:
     try:
-        return compute_positions(transactions, fx_exchanges, quotes)
+        return resolve_history_range(period, start, end)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
 
 @router.get("/positions/history", response_model=PositionHistoryResponse)
-def get_positions_history(
+async def get_positions_history(
     symbol: str,
     market: Market,
     period: str = "1y",
+    start: date | None = None,
+    end: date | None = None,
+    max_points: int | None = Query(default=None, ge=3),
+    resolution: str = "1d",
+    align: bool = False,
+    store: AsyncLocalDataRepository = Depends(get_storage),
 ) -> PositionHistoryResponse:
-    normalized_period = period.strip().lower() if period else "1y"
-    if normalized_period not in {"1y", "1yr", "1year"}:
-        normalized_period = "1y"
-    transactions = repository.list_transactions()
-    fx_exchanges = repository.list_fx_exchanges()
-    return get_position_history(
+    range_start, range_end = _resolve_history_range(period, start, end)
+    normalized_resolution = _resolve_resolution(resolution)
+    transactions = await store.list_transactions()
+    fx_exchanges = await store.list_fx_exchanges()
+    return await run_market_data(
+        get_position_history,
         transactions=transactions,
         fx_exchanges=fx_exchanges,
         symbol=symbol,
         market=market,
-        period=normalized_period,
+        start=range_start,
+        end=range_end,
+        max_points=max_points,
+        resolution=normalized_resolution,
+        align=align,
+        store=store.sync.sqlite,
+    )
+
+
+@router.post("/positions/history/batch", response_model=PositionHistoryBatchResponse)
+async def get_positions_history_batch(
+    payload: PositionHistoryBatchRequest,
+    request: Request,
+    format: str | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    range_start, range_end = _resolve_history_range(payload.period, payload.start, payload.end)
+    normalized_resolution = _resolve_resolution(payload.resolution)
+    items = [(item.symbol, item.market) for item in payload.items]
+    transactions = await store.list_transactions()
+    fx_exchanges = await store.list_fx_exchanges()
+    options = {
+        "transactions": transactions,
+        "fx_exchanges": fx_exchanges,
+        "items": items,
+        "start": range_start,
+        "end": range_end,
+        "max_points": payload.max_points,
+        "resolution": normalized_resolution,
+        "align": payload.align,
+        "store": store.sync.sqlite,
+    }
+
+    wants_ndjson = (format or "").lower() == "ndjson" or (
+        format is None and "application/x-ndjson" in request.headers.get("accept", "")
+    )
+    if wants_ndjson:
+        # Locally stored series are written immediately; the rest follow after one batched download.
+        return StreamingResponse(
+            _stream_position_histories(options), media_type="application/x-ndjson"
+        )
+
+    return PositionHistoryBatchResponse(
+        items=await run_market_data(get_position_histories, **options)
     )
 
 
+async def _stream_position_histories(options: dict) -> AsyncIterator[str]:
+    """NDJSON lines, each produced on the market-data limiter like the JSON path."""
+    histories = iter_position_histories(**options)
+
+    def next_line() -> str | None:
+        response = next(histories, None)
+        return None if response is None else response.model_dump_json() + "\n"
+
+    try:
+        while (line := await run_market_data(next_line)) is not None:
+            yield line
+    finally:
+        histories.close()
+
+
+@router.post("/prices/import", response_model=PriceImportSummary)
+async def import_prices(
+    request: Request,
+    format: str | None = None,
+    symbol: str | None = None,
+    market: Market | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> PriceImportSummary:
+    content_type = request.headers.get("content-type", "")
+    if format is None:
+        format = "parquet" if "parquet" in content_type else "csv"
+    body = await request.body()
+    if not body:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty price file")
+    try:
+        fmt = detect_format("upload", format)
+        return await run_in_threadpool(
+            import_price_file, store.sync.sqlite, body, fmt, symbol=symbol, market=market
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
 @router.get("/funds", response_model=FundSnapshots)
-def get_funds() -> FundSnapshots:
-    transactions = repository.list_transactions()
-    groups = repository.list_funding_groups()
-    settlements = repository.list_tax_settlements()
-    adjustments = repository.list_capital_adjustments()
-    fx_exchanges = repository.list_fx_exchanges()
+async def get_funds(
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    exclude: str | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    projection = _resolve_projection(FundSnapshots, fields, exclude)
+    # Holding periods are measured against today, so the date is part of the tag.
+    not_modified = conditional_response(
+        request,
+        response,
+        "funds",
+        store.sync.data_revision(
+            "transactions",
+            "funding_groups",
+            "tax_settlements",
+            "capital_adjustments",
+            "fx_exchanges",
+        ),
+        date.today(),
+        fields,
+        exclude,
+    )
+    if not_modified is not None:
+        return not_modified
+    transactions = await store.list_transactions()
+    groups = await store.list_funding_groups()
+    settlements = await store.list_tax_settlements()
+    adjustments = await store.list_capital_adjustments()
+    fx_exchanges = await store.list_fx_exchanges()
     try:
-        return compute_fund_snapshots(
+        snapshots = await run_in_threadpool(
+            compute_fund_snapshots,
             transactions,
             groups,
             settlements,
@@ -216,11 +470,61 @@ def get_funds() -> FundSnapshots:
         )
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return json_response(response, FundSnapshots, snapshots, projection)
+
+
+@router.get("/dashboard", response_model=DashboardResponse)
+async def get_dashboard(
+    request: Request,
+    response: Response,
+    include: str | None = None,
+    fields: str | None = None,
+    exclude: str | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    try:
+        sections = parse_dashboard_include(include)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    projection = _resolve_projection(DashboardResponse, fields, exclude)
+    not_modified = conditional_response(
+        request,
+        response,
+        "dashboard",
+        store.sync.data_revision(*dashboard_collections(sections)),
+        ",".join(sections),
+        date.today(),
+        fields,
+        exclude,
+    )
+    if not_modified is not None:
+        return not_modified
+    snapshot = await store.run(load_dashboard_snapshot, sections)
+    try:
+        dashboard = await run_in_threadpool(build_dashboard, snapshot, sections)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return json_response(response, DashboardResponse, dashboard, projection)
+
+
+@router.get("/changes", response_model=ChangesResponse)
+async def get_changes(
+    response: Response,
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=5000),
+    client_id: str | None = Query(default=None, min_length=1, max_length=128),
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    changes = await store.run(list_changes, since, limit, client_id)
+    return json_response(response, ChangesResponse, changes)
 
 
 @router.get("/funding-groups", response_model=list[FundingGroup])
-def list_funding_groups() -> list[FundingGroup]:
-    return repository.list_funding_groups()
+async def list_funding_groups(
+    response: Response,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    return json_response(response, list[FundingGroup], await store.list_funding_groups())
 
 
 @router.post(
@@ -228,25 +532,35 @@ def list_funding_groups() -> list[FundingGroup]:
     response_model=FundingGroup,
     status_code=status.HTTP_201_CREATED,
 )
-def create_funding_group(payload: FundingGroup) -> FundingGroup:
-    return repository.upsert_funding_group(payload)
+async def create_funding_group(
+    payload: FundingGroup,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> FundingGroup:
+    return await store.upsert_funding_group(payload)
 
 
 @router.patch(
     "/funding-groups/{name}",
     response_model=FundingGroup,
 )
-def update_funding_group(name: str, payload: FundingGroupUpdate) -> FundingGroup:
+async def update_funding_group(
+    name: str,
+    payload: FundingGroupUpdate,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> FundingGroup:
     try:
-        return repository.patch_funding_group(name, payload)
+        return await store.patch_funding_group(name, payload)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
 
 
 @router.delete("/funding-groups/{name}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_funding_group(name: str) -> Response:
+async def delete_funding_group(
+    name: str,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> Response:
     try:
-        repository.delete_funding_group(name)
+        await store.delete_funding_group(name)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -257,11 +571,13 @@ def delete_funding_group(name: str) -> Response:
     response_model=FundingCapitalAdjustment,
     status_code=status.HTTP_201_CREATED,
 )
-def add_funding_capital(
-    name: str, payload: FundingCapitalAdjustmentBase
+async def add_funding_capital(
+    name: str,
+    payload: FundingCapitalAdjustmentBase,
+    store: AsyncLocalDataRepository = Depends(get_storage),
 ) -> FundingCapitalAdjustment:
     try:
-        repository.get_funding_group(name)
+        await store.get_funding_group(name)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
 
@@ -271,20 +587,25 @@ def add_funding_capital(
         effective_date=payload.effective_date,
         notes=payload.notes,
     )
-    return repository.add_capital_adjustment(create_payload)
+    return await store.add_capital_adjustment(create_payload)
 
 
 @router.get(
     "/funding-groups/capital",
     response_model=list[FundingCapitalAdjustment],
 )
-def list_capital_adjustments() -> list[FundingCapitalAdjustment]:
-    return repository.list_capital_adjustments()
+async def list_capital_adjustments(
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> list[FundingCapitalAdjustment]:
+    return await store.list_capital_adjustments()
 
 
 @router.get("/fx-exchanges", response_model=list[FxExchangeRecord])
-def list_fx_exchanges() -> list[FxExchangeRecord]:
-    return repository.list_fx_exchanges()
+async def list_fx_exchanges(
+    response: Response,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    return json_response(response, list[FxExchangeRecord], await store.list_fx_exchanges())
 
 
 @router.post(
@@ -292,38 +613,66 @@ def list_fx_exchanges() -> list[FxExchangeRecord]:
     response_model=FxExchangeRecord,
     status_code=status.HTTP_201_CREATED,
 )
-def create_fx_exchange(payload: FxExchangeCreate) -> FxExchangeRecord:
-    return repository.add_fx_exchange(payload)
+async def create_fx_exchange(
+    payload: FxExchangeCreate,
+    request: Request,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    return await idempotent(
+        request,
+        store.sync.sqlite,
+        status.HTTP_201_CREATED,
+        FxExchangeRecord,
+        lambda: store.add_fx_exchange(payload),
+    )
 
 
 @router.delete(
     "/fx-exchanges/{exchange_id}",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-def delete_fx_exchange(exchange_id: str) -> Response:
+async def delete_fx_exchange(
+    exchange_id: str,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> Response:
     try:
-        repository.delete_fx_exchange(exchange_id)
+        await store.delete_fx_exchange(exchange_id)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.get("/quotes", response_model=QuoteSnapshot)
-def list_quotes() -> QuoteSnapshot:
-    records = repository.list_quotes()
+async def list_quotes(
+    request: Request,
+    response: Response,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    # An empty snapshot is dated today, so the date is part of the tag.
+    not_modified = conditional_response(
+        request, response, "quotes", store.sync.data_revision("quotes"), date.today()
+    )
+    if not_modified is not None:
+        return not_modified
+    records = await store.list_quotes()
     as_of = records[0].as_of if records else date.today()
-    return QuoteSnapshot(as_of=as_of, records=records)
+    return json_response(response, QuoteSnapshot, QuoteSnapshot(as_of=as_of, records=records))
 
 
 @router.post("/quotes/refresh", response_model=QuoteSnapshot)
-def refresh_quotes(force: bool = False) -> QuoteSnapshot:
-    snapshot = refresh_quotes_if_needed(repository, force=force)
-    return snapshot
+async def refresh_quotes(
+    force: bool = False,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> QuoteSnapshot:
+    return await refresh_quotes_if_needed_async(store, force=force)
 
 
 @router.get("/tax/settlements", response_model=list[TaxSettlementRecord])
-def list_tax_settlements() -> list[TaxSettlementRecord]:
-    return repository.list_tax_settlements()
+async def list_tax_settlements(
+    response: Response,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    return json_response(response, list[TaxSettlementRecord], await store.list_tax_settlements())
 
 
 @router.post(
@@ -331,9 +680,25 @@ def list_tax_settlements() -> list[TaxSettlementRecord]:
     response_model=TaxSettlementRecord,
     status_code=status.HTTP_201_CREATED,
 )
-def settle_tax(payload: TaxSettlementRequest) -> TaxSettlementRecord:
+async def settle_tax(
+    payload: TaxSettlementRequest,
+    request: Request,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+):
+    return await idempotent(
+        request,
+        store.sync.sqlite,
+        status.HTTP_201_CREATED,
+        TaxSettlementRecord,
+        lambda: _settle_tax(payload, store),
+    )
+
+
+async def _settle_tax(
+    payload: TaxSettlementRequest, store: AsyncLocalDataRepository
+) -> TaxSettlementRecord:
     try:
-        return record_tax_settlement(repository, payload)
+        return await store.run(record_tax_settlement, payload)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
@@ -342,9 +707,13 @@ def settle_tax(payload: TaxSettlementRequest) -> TaxSettlementRecord:
     "/tax/settlements/{settlement_id}",
     response_model=TaxSettlementRecord,
 )
-def edit_tax_settlement(settlement_id: str, payload: TaxSettlementUpdate) -> TaxSettlementRecord:
+async def edit_tax_settlement(
+    settlement_id: str,
+    payload: TaxSettlementUpdate,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> TaxSettlementRecord:
     try:
-        return update_tax_settlement(repository, settlement_id, payload)
+        return await store.run(update_tax_settlement, settlement_id, payload)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
@@ -353,9 +722,79 @@ def edit_tax_settlement(settlement_id: str, payload: TaxSettlementUpdate) -> Tax
     "/tax/settlements/{settlement_id}",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-def remove_tax_settlement(settlement_id: str) -> Response:
+async def remove_tax_settlement(
+    settlement_id: str,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> Response:
     try:
-        delete_tax_settlement(repository, settlement_id)
+        await store.run(delete_tax_settlement, settlement_id)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
     return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _resolve_export_format(format: str | None) -> str:
+    try:
+        return normalize_export_format(format)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+def _attachment(filename: str) -> dict[str, str]:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+@router.get("/export")
+async def export_archive(
+    format: str | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> StreamingResponse:
+    fmt = _resolve_export_format(format)
+    filename = f"kabumemo-export-{date.today().isoformat()}.zip"
+    return StreamingResponse(
+        iter_archive_export(store.sync.sqlite, fmt),
+        media_type=MEDIA_TYPES["zip"],
+        headers=_attachment(filename),
+    )
+
+
+@router.get("/export/{collection}")
+async def export_collection(
+    collection: str,
+    format: str | None = None,
+    store: AsyncLocalDataRepository = Depends(get_storage),
+) -> StreamingResponse:
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown export collection {collection}",
+        )
+    fmt = _resolve_export_format(format)
+    return StreamingResponse(
+        iter_collection_export(store.sync.sqlite, collection, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers=_attachment(f"{collection}.{fmt}"),
+    )
+
+
+@router.get("/events")
+async def stream_events(request: Request) -> StreamingResponse:
+    change_feed.attach(repository)
+
+    async def events():
+        async with broadcaster.subscribe() as queue:
+            await change_feed.ensure_running()
+            yield b"retry: 3000\nevent: ready\ndata: {}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield event.encode()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
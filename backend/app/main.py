@@ -1,17 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 import os
 
-from fastapi import FastAPI, HTTPException, status
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Request, Response, status
 
+from . import metrics, profiling
+from .api import routes
 from .api.routes import router as api_router
+from .middleware import CompressionMiddleware, MetricsMiddleware, ProfilingMiddleware
+from .services.provider import start_market_data_warm_up
+from .services.quotes import QUOTE_REFRESH_SECONDS, run_quote_scheduler
+from .static import IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles, SpaShell
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # pandas/yfinance load lazily; warm them in the background so the first
+    # chart or quote refresh does not pay the import cost inline.
+    start_market_data_warm_up()
+    scheduler = None
+    if QUOTE_REFRESH_SECONDS > 0:
+        scheduler = asyncio.create_task(
+            run_quote_scheduler(lambda: routes.repository, QUOTE_REFRESH_SECONDS)
+        )
+    yield
+    if scheduler is not None:
+        scheduler.cancel()
+        with suppress(asyncio.CancelledError):
+            await scheduler
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Kabumemo API", version="0.1.0")
+    app = FastAPI(title="Kabumemo API", version="0.1.0", lifespan=lifespan)
+    app.add_middleware(CompressionMiddleware)
+    if metrics.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+    if profiling.PROFILING_ENABLED:
+        print("[Startup] Request profiling enabled")
+        app.add_middleware(
+            ProfilingMiddleware,
+            directory=lambda: routes.repository.base_path / "profiles",
+        )
     app.include_router(api_router)
 
+    if metrics.METRICS_ENABLED:
+        # Registered ahead of the SPA catch-all below.
+        @app.get("/metrics", include_in_schema=False)
+        async def serve_metrics() -> Response:
+            return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
     env_dist = os.environ.get("KABUMEMO_DIST_DIR")
     if env_dist:
         dist_dir = Path(env_dist).expanduser().resolve()
@@ -19,27 +57,30 @@ def create_app() -> FastAPI:
         dist_dir = Path.cwd().parent / "frontend" / "dist"
         if not dist_dir.exists():
             dist_dir = Path(__file__).resolve().parents[2] / "frontend" / "dist"
-    if dist_dir.exists():
+    if (dist_dir / "index.html").is_file():
         print(f"[Startup] Serving frontend from {dist_dir}")
 
         assets_dir = dist_dir / "assets"
         if assets_dir.exists():
-            app.mount("/assets", StaticFiles(directory=assets_dir), name="frontend-assets")
+            app.mount(
+                "/assets",
+                PrecompressedStaticFiles(
+                    directory=assets_dir, cache_control=IMMUTABLE_CACHE_CONTROL
+                ),
+                name="frontend-assets",
+            )
+
+        shell = SpaShell(dist_dir)
 
         @app.get("/")
-        async def serve_root() -> FileResponse:
-            return FileResponse(dist_dir / "index.html")
+        async def serve_root(request: Request) -> Response:
+            return shell.index_response(request.headers)
 
         @app.get("/{full_path:path}")
-        async def serve_spa(full_path: str):
+        async def serve_spa(full_path: str, request: Request) -> Response:
             if full_path.startswith("api/"):
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-
-            candidate = dist_dir / full_path
-            if candidate.exists() and candidate.is_file():
-                return FileResponse(candidate)
-
-            return FileResponse(dist_dir / "index.html")
+            return shell.response(full_path, request.headers)
     else:
         print(f"[Startup] Frontend dist directory not found: {dist_dir}")
     return app
@@ -0,0 +1,312 @@
+"""Minimal in-process metrics registry rendered in the Prometheus text format.
+
+Metrics are plain counters and histograms keyed by label values. Updating one
+costs a dict lookup and a short lock, so instrumentation can stay on the hot
+path. ``KABUCOUNT_METRICS=0`` turns every update into a no-op.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+METRICS_ENABLED = os.environ.get("KABUCOUNT_METRICS", "1").strip().lower() not in {
+    "0",
+    "false",
+    "no",
+    "off",
+}
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; tuned for a local app where most work is sub-millisecond to ~1 s.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, values: tuple[Any, ...]) -> tuple[str, ...]:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(value) for value in values)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:  # pragma: no cover - overridden
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum.
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, *labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: Any) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series else 0
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        lines: list[str] = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.histogram(
+    "kabumemo_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+repository_read_duration = REGISTRY.histogram(
+    "kabumemo_repository_read_seconds",
+    "Time to read and parse a JSON collection file.",
+    ("collection",),
+)
+repository_read_bytes = REGISTRY.counter(
+    "kabumemo_repository_read_bytes_total",
+    "Bytes read from JSON collection files.",
+    ("collection",),
+)
+repository_write_duration = REGISTRY.histogram(
+    "kabumemo_repository_write_seconds",
+    "Time to serialize, write and mirror a JSON collection file.",
+    ("collection",),
+)
+repository_write_bytes = REGISTRY.counter(
+    "kabumemo_repository_write_bytes_total",
+    "Bytes written to JSON collection files.",
+    ("collection",),
+)
+sqlite_duration = REGISTRY.histogram(
+    "kabumemo_sqlite_operation_seconds",
+    "Time spent in SQLite storage operations.",
+    ("operation",),
+)
+analytics_duration = REGISTRY.histogram(
+    "kabumemo_analytics_seconds",
+    "Time spent in analytics computations.",
+    ("function",),
+)
+analytics_input_size = REGISTRY.histogram(
+    "kabumemo_analytics_input_rows",
+    "Number of input rows handed to analytics computations.",
+    ("function",),
+    buckets=SIZE_BUCKETS,
+)
+provider_call_duration = REGISTRY.histogram(
+    "kabumemo_provider_call_seconds",
+    "Latency of market-data provider (yfinance) calls.",
+    ("operation",),
+)
+provider_failures = REGISTRY.counter(
+    "kabumemo_provider_failures_total",
+    "Failed or timed-out market-data provider calls.",
+    ("operation", "reason"),
+)
+cache_requests = REGISTRY.counter(
+    "kabumemo_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ("cache", "result"),
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    cache_requests.inc(cache, "hit" if hit else "miss")
+
+
+def timed(histogram: Histogram, *labels: Any) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator observing the wall time of each call in ``histogram``."""
+
+    def decorate(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+
+        return wrapper
+
+    return decorate
+
+
+def timed_analytics(func: Callable[..., T]) -> Callable[..., T]:
+    """Time an analytics function and record the size of its first argument."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        if args and hasattr(args[0], "__len__"):
+            analytics_input_size.observe(len(args[0]), name)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            analytics_duration.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+
+def timed_methods(histogram: Histogram, exclude: tuple[str, ...] = ()) -> Callable[[type], type]:
+    """Class decorator timing every public method, labelled by method name.
+
+    Generator methods are left alone: their body runs while the caller
+    iterates, so wrapping them would only time their creation.
+    """
+
+    def decorate(cls: type) -> type:
+        for name, member in list(vars(cls).items()):
+            if (
+                name.startswith("_")
+                or name in exclude
+                or not inspect.isfunction(member)
+                or inspect.isgeneratorfunction(member)
+            ):
+                continue
+            setattr(cls, name, timed(histogram, name)(member))
+        return cls
+
+    return decorate
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Protocol
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics, profiling
+
+try:  # brotli is optional; without it clients are served gzip.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(int(os.environ.get(name, default)), 0)
+    except ValueError:
+        return default
+
+
+COMPRESSION_MIN_SIZE = _env_int("KABUCOUNT_COMPRESSION_MIN_SIZE", 1024)
+
+_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+# Event streams must reach the client message by message; never buffer them.
+_NEVER_COMPRESS_TYPES = ("text/event-stream",)
+
+
+def available_encodings() -> tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str | None, supported: tuple[str, ...]) -> str | None:
+    """Pick the preferred encoding from ``Accept-Encoding`` honouring q-values."""
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[token] = quality
+    wildcard = weights.get("*", 0.0)
+    best: str | None = None
+    best_quality = 0.0
+    # ``supported`` is ordered by server preference, which breaks ties.
+    for encoding in supported:
+        quality = weights.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class _GzipEncoder:
+    def __init__(self, level: int = 6) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int = 5) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _make_encoder(encoding: str) -> _Encoder:
+    return _BrotliEncoder() if encoding == "br" else _GzipEncoder()
+
+
+def _is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(_NEVER_COMPRESS_TYPES):
+        return False
+    return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Negotiated brotli/gzip compression for responses above ``minimum_size``.
+
+    Responses that already carry a ``Content-Encoding`` (such as precompressed
+    static assets) or whose media type does not benefit from compression pass
+    through untouched. Streaming bodies are flushed chunk by chunk so NDJSON
+    consumers still see rows as soon as they are produced.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding"), available_encodings()
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send | None = None
+        self.start_message: Message | None = None
+        self.encoder: _Encoder | None = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        assert self.send is not None
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.start_message = message
+            self.passthrough = (
+                "content-encoding" in headers
+                or not _is_compressible(headers.get("content-type", ""))
+                or message["status"] in (204, 304)
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(start)
+                await self.send(message)
+                self.passthrough = True
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            self.encoder = _make_encoder(self.encoding)
+            if more_body:
+                del headers["Content-Length"]
+                payload = self.encoder.compress(body) + self.encoder.flush()
+            else:
+                payload = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(payload))
+            if "etag" in headers and not headers["etag"].startswith("W/"):
+                # The bytes differ from the identity representation, so only a
+                # weak validator still holds; If-None-Match compares weakly.
+                headers["ETag"] = "W/" + headers["etag"]
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": payload, "more_body": more_body})
+            return
+
+        assert self.encoder is not None
+        payload = self.encoder.compress(body)
+        payload += self.encoder.flush() if more_body else self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": payload, "more_body": more_body})
+
+
+class MetricsMiddleware:
+    """Record request latency labelled by route template rather than raw path.
+
+    The router stores the matched endpoint in the scope; it is mapped back to
+    the route's path template (``/api/transactions/{transaction_id}``) so
+    label cardinality stays bounded. Requests no route claimed are reported
+    as ``unmatched``.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._templates: dict[int, str] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.http_request_duration.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                self._route_template(scope),
+                status_code,
+            )
+
+    def _route_template(self, scope: Scope) -> str:
+        # Routes set "endpoint"; mounts (static assets) only replace "app".
+        target: Any = scope.get("endpoint") or scope.get("app")
+        router = scope.get("router")
+        if target is None or router is None:
+            return "unmatched"
+        template = self._templates.get(id(target))
+        if template is None:
+            template = "unmatched"
+            for route in router.routes:
+                if getattr(route, "endpoint", None) is target or getattr(route, "app", None) is target:
+                    template = getattr(route, "path", "unmatched") or "unmatched"
+                    break
+            self._templates[id(target)] = template
+        return template
+
+
+class ProfilingMiddleware:
+    """Sample a single request on demand and store its collapsed stacks.
+
+    Only requests carrying the profile header or query flag pay for sampling;
+    the stored file name is returned in ``X-Kabumemo-Profile``.
+    """
+
+    def __init__(self, app: ASGIApp, directory: Callable[[], Path]) -> None:
+        self.app = app
+        self.directory = directory
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not profiling.profile_requested(
+            scope.get("query_string", b""), scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+        target = profiling.profile_path(self.directory(), scope["method"], scope["path"])
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Kabumemo-Profile", target.name)
+            await send(message)
+
+        sampler = profiling.StackSampler()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            # Joining the sampler thread and writing the file both block, so
+            # keep them off the event loop; shield them so a cancelled
+            # request still stores its profile.
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(self._finish, sampler, target)
+
+    @staticmethod
+    def _finish(sampler: profiling.StackSampler, target: Path) -> None:
+        sampler.stop()
+        profiling.write_profile(target, sampler.collapsed())
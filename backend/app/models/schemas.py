@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, datetime
 from enum import Enum
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import BaseModel, Field, FieldValidationInfo, field_validator, model_validator
 
@@ -27,6 +27,31 @@ class TradeSide(str, Enum):
     SELL = "sell"
 
 
+class BulkRowStatus(str, Enum):
+    CREATED = "created"
+    SKIPPED = "skipped"
+    ERROR = "error"
+
+
+class BatchAction(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class BatchResource(str, Enum):
+    TRANSACTIONS = "transactions"
+    FX_EXCHANGES = "fx_exchanges"
+    TAX_SETTLEMENTS = "tax_settlements"
+    CAPITAL_ADJUSTMENTS = "capital_adjustments"
+
+
+class ChangeOperation(str, Enum):
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
 class FundingGroup(BaseModel):
     name: str = Field(..., min_length=1)
     currency: Currency
@@ -158,6 +183,60 @@ class TransactionUpdate(TransactionBase):
     pass
 
 
+class TransactionQuery(BaseModel):
+    symbol: Optional[str] = None
+    market: Optional[Market] = None
+    funding_group: Optional[str] = None
+    taxed: Optional[TaxStatus] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+    def is_empty(self) -> bool:
+        return not self.model_dump(exclude_none=True)
+
+
+class TransactionPage(BaseModel):
+    items: list[Transaction]
+    next_cursor: Optional[str] = None
+
+
+class BulkTransactionResult(BaseModel):
+    index: int
+    status: BulkRowStatus
+    transaction: Optional[Transaction] = None
+    error: Optional[str] = None
+
+
+class BulkTransactionResponse(BaseModel):
+    committed: bool
+    created: int
+    failed: int
+    results: list[BulkTransactionResult]
+
+
+class BatchOperation(BaseModel):
+    action: BatchAction
+    resource: BatchResource
+    id: Optional[str] = None
+    payload: Optional[dict[str, Any]] = None
+
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=500)
+
+
+class BatchOperationResult(BaseModel):
+    index: int
+    status_code: int
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: list[BatchOperationResult]
+
+
 class PositionBreakdown(BaseModel):
     currency: Currency
     quantity: float
@@ -211,12 +290,47 @@ class TradeMarker(BaseModel):
     transaction_id: str
 
 
+class AlignedHistoryRow(BaseModel):
+    date: date
+    close: float
+    markers: list[TradeMarker] = Field(default_factory=list)
+    position: float
+    average_cost: float | None = None
+
+
 class PositionHistoryResponse(BaseModel):
     symbol: str
     market: Market
     currency: Currency
     series: list[PriceHistoryPoint]
     markers: list[TradeMarker]
+    aligned: list[AlignedHistoryRow] | None = None
+
+
+class PositionHistoryItem(BaseModel):
+    symbol: str = Field(..., min_length=1)
+    market: Market
+
+
+class PositionHistoryBatchRequest(BaseModel):
+    items: list[PositionHistoryItem] = Field(..., min_length=1, max_length=200)
+    period: str = "1y"
+    start: Optional[date] = None
+    end: Optional[date] = None
+    max_points: Optional[int] = Field(default=None, ge=3)
+    resolution: str = "1d"
+    align: bool = False
+
+
+class PositionHistoryBatchResponse(BaseModel):
+    items: list[PositionHistoryResponse]
+
+
+class PriceImportSummary(BaseModel):
+    rows: int
+    symbols: int
+    first_date: date | None
+    last_date: date | None
 
 
 class FundSnapshot(BaseModel):
@@ -307,6 +421,32 @@ class TaxSettlementRecord(BaseModel):
         return self
 
 
+class DashboardResponse(BaseModel):
+    transactions: Optional[list[Transaction]] = None
+    positions: Optional[list[Position]] = None
+    funds: Optional[FundSnapshots] = None
+    funding_groups: Optional[list[FundingGroup]] = None
+    quotes: Optional[QuoteSnapshot] = None
+    tax_settlements: Optional[list[TaxSettlementRecord]] = None
+
+
+class ChangeEntry(BaseModel):
+    seq: int
+    collection: str
+    op: ChangeOperation
+    id: str
+    changed_at: datetime
+    record: Optional[dict[str, Any]] = None
+
+
+class ChangesResponse(BaseModel):
+    since: int
+    latest_seq: int
+    reset: bool = False
+    has_more: bool = False
+    changes: list[ChangeEntry] = Field(default_factory=list)
+
+
 class TaxSettlementUpdate(BaseModel):
     amount: Optional[float] = Field(default=None, gt=0.0)
     funding_group: Optional[str] = Field(default=None, min_length=1)
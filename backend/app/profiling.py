@@ -0,0 +1,151 @@
+"""Opt-in sampling profiler for single requests.
+
+``KABUCOUNT_PROFILING=1`` arms the hook; a request then opts in with the
+``X-Kabumemo-Profile: 1`` header or a ``profile=1`` query flag. While it runs,
+a background thread samples the stacks of every thread that is executing
+application code and the result is written as collapsed stacks
+(``frame;frame;frame count``), which speedscope and flamegraph.pl open
+directly.
+
+Sampling rather than cProfile: handlers do their work on storage and
+market-data worker threads, which a profiler attached to the event-loop
+thread would never see. Concurrent requests running application code at the
+same time show up in the same profile.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Iterable
+
+PROFILING_ENABLED = os.environ.get("KABUCOUNT_PROFILING", "0").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+
+PROFILE_HEADER = "x-kabumemo-profile"
+PROFILE_QUERY_FLAG = "profile"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(float(os.environ.get(name, default)), 0.0)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(int(os.environ.get(name, default)), 1)
+    except ValueError:
+        return default
+
+
+PROFILE_INTERVAL_SECONDS = _env_float("KABUCOUNT_PROFILING_INTERVAL_MS", 1.0) / 1000
+PROFILE_KEEP = _env_int("KABUCOUNT_PROFILING_KEEP", 50)
+
+APP_ROOT = str(Path(__file__).resolve().parent)
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(APP_ROOT):
+        filename = "app" + filename[len(APP_ROOT):].replace(os.sep, "/")
+    else:
+        filename = os.path.basename(filename)
+    # ";" separates frames; the count follows the last space, so spaces are fine.
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler:
+    """Count the stacks of threads running code under ``include`` prefixes."""
+
+    def __init__(
+        self,
+        interval: float = PROFILE_INTERVAL_SECONDS,
+        include: Iterable[str] = (APP_ROOT,),
+    ) -> None:
+        self.interval = interval
+        self.include = tuple(include)
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> StackSampler:
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="kabumemo-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            self.sample(skip=own)
+            self._stop.wait(self.interval)
+
+    def sample(self, skip: int | None = None) -> None:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip:
+                continue
+            stack: list[FrameType] = []
+            relevant = False
+            current: FrameType | None = frame
+            while current is not None:
+                stack.append(current)
+                relevant = relevant or current.f_code.co_filename.startswith(self.include)
+                current = current.f_back
+            if relevant:
+                self.samples[";".join(_frame_label(item) for item in reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def profile_requested(query_string: bytes, headers: Iterable[tuple[bytes, bytes]]) -> bool:
+    for name, value in headers:
+        if name.lower() == PROFILE_HEADER.encode() and value.strip() not in (b"", b"0"):
+            return True
+    for item in query_string.split(b"&"):
+        name, _, value = item.partition(b"=")
+        if name == PROFILE_QUERY_FLAG.encode() and value not in (b"0", b"false"):
+            return True
+    return False
+
+
+def profile_path(directory: Path, method: str, path: str) -> Path:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    unique = time.perf_counter_ns() % 1_000_000
+    return directory / f"{stamp}-{unique:06d}-{method.lower()}-{slug}.collapsed"
+
+
+def write_profile(target: Path, collapsed: str) -> None:
+    """Store one profile and prune all but the newest ``PROFILE_KEEP`` files."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(collapsed, encoding="utf-8")
+    profiles = sorted(target.parent.glob("*.collapsed"), key=lambda item: item.name)
+    for stale in profiles[:-PROFILE_KEEP]:
+        stale.unlink(missing_ok=True)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from types import ModuleType
+from typing import Any
+
+from pydantic import TypeAdapter
+
+orjson: ModuleType | None
+try:  # Optional: faster parsing of storage files and ad-hoc payloads.
+    import orjson
+except ImportError:  # pragma: no cover - exercised when the extra is absent
+    orjson = None
+
+
+@lru_cache(maxsize=None)
+def type_adapter(tp: Any) -> TypeAdapter[Any]:
+    """Build the validator/serializer for ``tp`` once per process."""
+    return TypeAdapter(tp)
+
+
+def dump_json(
+    tp: Any,
+    data: Any,
+    *,
+    include: Any = None,
+    exclude: Any = None,
+    indent: int | None = None,
+) -> bytes:
+    """Serialize ``data`` as ``tp`` in a single pass through pydantic-core.
+
+    Output matches ``json.dumps(..., ensure_ascii=False)`` of the model dumps,
+    except that floats below 1e-4 are written in positional notation
+    (``0.00001`` rather than ``1e-05``); both parse to the same value.
+    """
+    return type_adapter(tp).dump_json(data, include=include, exclude=exclude, indent=indent)
+
+
+def dumps(data: Any) -> bytes:
+    """Compact JSON for plain Python data (dicts, lists, scalars)."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
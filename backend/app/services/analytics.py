@@ -6,6 +6,7 @@ from math import isclose
 from typing import Iterable
 from uuid import uuid4
 
+from .. import metrics
 from ..models.schemas import (
     AggregatedFundSnapshot,
     Currency,
@@ -53,6 +54,7 @@ def _fx_lookup(exchanges: Iterable[FxExchangeRecord]) -> dict[str, FxExchangeRec
     return {item.transaction_id: item for item in exchanges if item.transaction_id}
 
 
+@metrics.timed_analytics
 def compute_positions(
     transactions: Iterable[Transaction],
     fx_exchanges: Iterable[FxExchangeRecord] | None = None,
@@ -210,6 +212,7 @@ def compute_positions(
         )
     return positions
 
+@metrics.timed_analytics
 def compute_fund_snapshots(
     transactions: Iterable[Transaction],
     funding_groups: Iterable[FundingGroup],
@@ -512,6 +515,7 @@ def delete_tax_settlement(
     repo.mark_transaction_untaxed(record.transaction_id)
 
 
+@metrics.timed_analytics
 def compute_round_trip_yield(
     transactions: Iterable[Transaction],
     settlements: Iterable[TaxSettlementRecord],
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Callable
+
+from pydantic import BaseModel, ValidationError
+
+from ..models.schemas import (
+    BatchAction,
+    BatchOperation,
+    BatchOperationResult,
+    BatchRequest,
+    BatchResource,
+    BatchResponse,
+    FundingCapitalAdjustmentCreate,
+    FxExchangeCreate,
+    TaxSettlementRequest,
+    TaxSettlementUpdate,
+    TransactionCreate,
+    TransactionUpdate,
+)
+from ..storage.repository import LocalDataRepository
+from .analytics import delete_tax_settlement, record_tax_settlement, update_tax_settlement
+from .ingest import format_validation_error
+from .transactions import create_transaction, update_transaction
+
+# "$<index>.<field>" refers to a field of an earlier operation's result, e.g.
+# an FX exchange linked to a transaction created in the same batch.
+_REFERENCE = re.compile(r"^\$(\d+)\.(\w+)$")
+
+
+class _Abort(Exception):
+    pass
+
+
+def _resolve(value: Any, outputs: list[dict[str, Any] | None]) -> Any:
+    if isinstance(value, str):
+        match = _REFERENCE.match(value)
+        if not match:
+            return value
+        index, field = int(match.group(1)), match.group(2)
+        output = outputs[index] if index < len(outputs) else None
+        if output is None:
+            raise ValueError(f"Reference {value} does not point to an earlier result")
+        if field not in output:
+            raise ValueError(f"Reference {value} names an unknown field")
+        return output[field]
+    if isinstance(value, dict):
+        return {key: _resolve(item, outputs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, outputs) for item in value]
+    return value
+
+
+def _require_id(operation: BatchOperation, outputs: list[dict[str, Any] | None]) -> str:
+    if not operation.id:
+        raise ValueError("id is required")
+    return _resolve(operation.id, outputs)
+
+
+def _transactions(repo, operation, payload, record_id):
+    if operation.action == BatchAction.CREATE:
+        return 201, create_transaction(repo, TransactionCreate.model_validate(payload))
+    if operation.action == BatchAction.UPDATE:
+        return 200, update_transaction(repo, record_id, TransactionUpdate.model_validate(payload))
+    repo.delete_transaction(record_id)
+    return 204, None
+
+
+def _fx_exchanges(repo, operation, payload, record_id):
+    if operation.action == BatchAction.CREATE:
+        return 201, repo.add_fx_exchange(FxExchangeCreate.model_validate(payload))
+    if operation.action == BatchAction.DELETE:
+        repo.delete_fx_exchange(record_id)
+        return 204, None
+    raise ValueError("FX exchanges cannot be updated; delete and recreate instead")
+
+
+def _tax_settlements(repo, operation, payload, record_id):
+    if operation.action == BatchAction.CREATE:
+        return 201, record_tax_settlement(repo, TaxSettlementRequest.model_validate(payload))
+    if operation.action == BatchAction.UPDATE:
+        return 200, update_tax_settlement(
+            repo, record_id, TaxSettlementUpdate.model_validate(payload)
+        )
+    delete_tax_settlement(repo, record_id)
+    return 204, None
+
+
+def _capital_adjustments(repo, operation, payload, record_id):
+    if operation.action != BatchAction.CREATE:
+        raise ValueError("Capital adjustments can only be created")
+    create_payload = FundingCapitalAdjustmentCreate.model_validate(payload)
+    repo.get_funding_group(create_payload.funding_group)
+    return 201, repo.add_capital_adjustment(create_payload)
+
+
+_HANDLERS: dict[BatchResource, Callable[..., tuple[int, BaseModel | None]]] = {
+    BatchResource.TRANSACTIONS: _transactions,
+    BatchResource.FX_EXCHANGES: _fx_exchanges,
+    BatchResource.TAX_SETTLEMENTS: _tax_settlements,
+    BatchResource.CAPITAL_ADJUSTMENTS: _capital_adjustments,
+}
+
+
+def _error_status(exc: Exception) -> int:
+    if isinstance(exc, ValidationError):
+        return 422
+    # Repository lookups report missing records as "<Thing> <id> not found".
+    return 404 if str(exc).endswith("not found") else 400
+
+
+def run_batch(repo: LocalDataRepository, request: BatchRequest) -> BatchResponse:
+    """Apply ``request.operations`` in order inside one unit of work.
+
+    Every touched collection is written once at the end. The first failing
+    operation aborts the batch: nothing is written, it reports its error, and
+    the operations after it report 424 without running.
+    """
+    results: list[BatchOperationResult] = []
+    outputs: list[dict[str, Any] | None] = []
+    try:
+        with repo.unit_of_work():
+            for index, operation in enumerate(request.operations):
+                try:
+                    payload = _resolve(operation.payload or {}, outputs)
+                    record_id = (
+                        _require_id(operation, outputs)
+                        if operation.action != BatchAction.CREATE
+                        else None
+                    )
+                    status_code, result = _HANDLERS[operation.resource](
+                        repo, operation, payload, record_id
+                    )
+                except (ValueError, ValidationError) as exc:
+                    error = (
+                        format_validation_error(exc)
+                        if isinstance(exc, ValidationError)
+                        else str(exc)
+                    )
+                    results.append(
+                        BatchOperationResult(
+                            index=index, status_code=_error_status(exc), error=error
+                        )
+                    )
+                    raise _Abort from exc
+                output = result.model_dump(mode="json") if result is not None else None
+                outputs.append(output)
+                results.append(
+                    BatchOperationResult(index=index, status_code=status_code, result=output)
+                )
+    except _Abort:
+        results.extend(
+            BatchOperationResult(
+                index=index, status_code=424, error="Not executed: an earlier operation failed"
+            )
+            for index in range(len(results), len(request.operations))
+        )
+        return BatchResponse(committed=False, results=results)
+    return BatchResponse(committed=True, results=results)
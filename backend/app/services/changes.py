@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from ..models.schemas import ChangeEntry, ChangeOperation, ChangesResponse
+from ..storage.repository import LocalDataRepository
+
+# Entries older than this are compacted even if a client never acknowledged
+# them; such a client gets ``reset`` and refetches.
+CHANGE_RETENTION_DAYS = float(os.environ.get("KABUCOUNT_CHANGE_RETENTION_DAYS", "30"))
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.isoformat(timespec="seconds")
+
+
+def list_changes(
+    repository: LocalDataRepository,
+    since: int = 0,
+    limit: int = 1000,
+    client_id: str | None = None,
+) -> ChangesResponse:
+    """Return changes after ``since`` with the current state of each record.
+
+    ``since=0`` means the client holds nothing yet. Like a ``since`` that was
+    compacted away (or is ahead of the log), it yields ``reset=True``: the
+    client should note ``latest_seq``, refetch the full lists and sync from
+    there. Passing ``client_id`` acknowledges everything up to ``since`` so
+    the log can be compacted once every client has seen it.
+    """
+    storage = repository.sqlite
+    now = datetime.now(timezone.utc)
+    if client_id:
+        storage.acknowledge_changes(client_id, since, _timestamp(now))
+    storage.compact_changes(_timestamp(now - timedelta(days=CHANGE_RETENTION_DAYS)))
+
+    latest = storage.latest_change_seq()
+    if since <= 0 or since < storage.change_horizon() or since > latest:
+        return ChangesResponse(since=since, latest_seq=latest, reset=True)
+
+    rows = storage.changes_since(since, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    entries: dict[str, dict[str, dict]] = {}
+    changes: list[ChangeEntry] = []
+    for row in rows:
+        op = ChangeOperation(row["op"])
+        record = None
+        if op != ChangeOperation.DELETE:
+            collection = row["collection"]
+            if collection not in entries:
+                entries[collection] = repository.load_keyed_entries(collection)
+            record = entries[collection].get(row["record_id"])
+        changes.append(
+            ChangeEntry(
+                seq=row["seq"],
+                collection=row["collection"],
+                op=op,
+                id=row["record_id"],
+                changed_at=row["changed_at"],
+                record=record,
+            )
+        )
+    return ChangesResponse(
+        since=since,
+        latest_seq=rows[-1]["seq"] if has_more else latest,
+        has_more=has_more,
+        changes=changes,
+    )
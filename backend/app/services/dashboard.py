@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Iterable
+
+from ..models.schemas import DashboardResponse, QuoteSnapshot
+from ..storage.repository import LocalDataRepository
+from .analytics import compute_fund_snapshots, compute_positions
+
+# Section -> collections it is built from, in the order they are loaded.
+DASHBOARD_SECTIONS: dict[str, tuple[str, ...]] = {
+    "transactions": ("transactions",),
+    "positions": ("transactions", "fx_exchanges", "quotes"),
+    "funds": (
+        "transactions",
+        "funding_groups",
+        "tax_settlements",
+        "capital_adjustments",
+        "fx_exchanges",
+    ),
+    "funding_groups": ("funding_groups",),
+    "quotes": ("quotes",),
+    "tax_settlements": ("tax_settlements",),
+}
+
+_LOADERS = {
+    "transactions": "list_transactions",
+    "funding_groups": "list_funding_groups",
+    "tax_settlements": "list_tax_settlements",
+    "capital_adjustments": "list_capital_adjustments",
+    "fx_exchanges": "list_fx_exchanges",
+    "quotes": "list_quotes",
+}
+
+
+def parse_dashboard_include(include: str | None) -> list[str]:
+    """Resolve a comma-separated ``include`` value; empty means every section.
+
+    Names may use the API path spelling (``funding-groups``) or the response
+    key (``funding_groups``).
+    """
+    if not include or not include.strip():
+        return list(DASHBOARD_SECTIONS)
+    sections: list[str] = []
+    for raw in include.split(","):
+        name = raw.strip().lower().replace("-", "_").replace("/", "_")
+        if name == "tax_settlement":
+            name = "tax_settlements"
+        if not name:
+            continue
+        if name not in DASHBOARD_SECTIONS:
+            raise ValueError(f"Unknown dashboard section {raw.strip()}")
+        if name not in sections:
+            sections.append(name)
+    return sections
+
+
+def dashboard_collections(sections: Iterable[str]) -> list[str]:
+    collections: list[str] = []
+    for section in sections:
+        for collection in DASHBOARD_SECTIONS[section]:
+            if collection not in collections:
+                collections.append(collection)
+    return collections
+
+
+def load_dashboard_snapshot(
+    repository: LocalDataRepository, sections: Iterable[str]
+) -> dict[str, list[Any]]:
+    """Read every collection the sections need, each exactly once."""
+    return {
+        collection: getattr(repository, _LOADERS[collection])()
+        for collection in dashboard_collections(sections)
+    }
+
+
+def build_dashboard(snapshot: dict[str, list[Any]], sections: Iterable[str]) -> DashboardResponse:
+    """Assemble the requested sections from one shared snapshot."""
+    result = DashboardResponse()
+    for section in sections:
+        if section == "positions":
+            result.positions = compute_positions(
+                snapshot["transactions"], snapshot["fx_exchanges"], snapshot["quotes"]
+            )
+        elif section == "funds":
+            result.funds = compute_fund_snapshots(
+                snapshot["transactions"],
+                snapshot["funding_groups"],
+                snapshot["tax_settlements"],
+                snapshot["capital_adjustments"],
+                snapshot["fx_exchanges"],
+            )
+        elif section == "quotes":
+            records = snapshot["quotes"]
+            as_of = records[0].as_of if records else date.today()
+            result.quotes = QuoteSnapshot(as_of=as_of, records=records)
+        else:
+            setattr(result, section, snapshot[section])
+    return result
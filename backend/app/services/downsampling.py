@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import TYPE_CHECKING, Iterable, Sequence
+
+from ..models.schemas import PriceHistoryPoint
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import numpy as np
+
+RESOLUTIONS = {"1d", "1wk", "1mo"}
+
+
+def normalize_resolution(resolution: str | None) -> str:
+    normalized = resolution.strip().lower() if resolution else "1d"
+    aliases = {"d": "1d", "day": "1d", "w": "1wk", "1w": "1wk", "week": "1wk", "m": "1mo", "month": "1mo"}
+    normalized = aliases.get(normalized, normalized)
+    if normalized not in RESOLUTIONS:
+        raise ValueError(f"Unsupported resolution {resolution}")
+    return normalized
+
+
+def _period_last_indices(days: np.ndarray, resolution: str) -> np.ndarray:
+    """Index of the last bar in every calendar week or month."""
+    import numpy as np
+
+    if resolution == "1wk":
+        # 1970-01-01 was a Thursday; shifting by three days starts weeks on Monday.
+        keys = (days.astype("int64") + 3) // 7
+    else:
+        keys = days.astype("datetime64[M]").astype("int64")
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = keys[1:] != keys[:-1]
+    return np.flatnonzero(last)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets selection over ``(x, y)``.
+
+    Returns the sorted indices of at most ``threshold`` points; the first and
+    last points are always kept.
+    """
+    import numpy as np
+
+    size = len(x)
+    if threshold >= size:
+        return np.arange(size)
+    if threshold < 3:
+        return np.array([0, size - 1])
+
+    x = x.astype("float64")
+    y = y.astype("float64")
+    edges = np.linspace(1, size - 1, threshold - 1).astype("int64")
+    selected = np.empty(threshold, dtype="int64")
+    selected[0] = 0
+    selected[-1] = size - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_start = stop
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else size
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs(
+            (px - avg_x) * (y[start:stop] - py) - (px - x[start:stop]) * (avg_y - py)
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_series(
+    points: Sequence[PriceHistoryPoint],
+    *,
+    max_points: int | None = None,
+    resolution: str = "1d",
+    anchors: Iterable[date] = (),
+) -> list[PriceHistoryPoint]:
+    """Reduce ``points`` while keeping the chart shape and every anchor date.
+
+    ``resolution`` first collapses bars to the last close of each week or
+    month; ``max_points`` then applies LTTB to the remainder. The bar on or
+    after each anchor date (typically a trade marker) is always retained and
+    counted against the budget; only when anchors alone exceed it does the
+    result grow past ``max_points``.
+    """
+    resolution = normalize_resolution(resolution)
+    if not points or (resolution == "1d" and (max_points is None or len(points) <= max_points)):
+        return list(points)
+
+    import numpy as np
+
+    days = np.array([point.date for point in points], dtype="datetime64[D]")
+    closes = np.fromiter((point.close for point in points), dtype="float64", count=len(points))
+
+    anchor_days = np.array(sorted(set(anchors)), dtype="datetime64[D]")
+    anchor_indices = np.searchsorted(days, anchor_days, side="left")
+    anchor_indices = anchor_indices[anchor_indices < len(days)]
+
+    candidates = (
+        np.arange(len(days)) if resolution == "1d" else _period_last_indices(days, resolution)
+    )
+    if max_points is not None and len(candidates) > max_points:
+        budget = max(max_points - len(anchor_indices), 3)
+        picked = lttb_indices(
+            days[candidates].astype("int64"), closes[candidates], min(budget, len(candidates))
+        )
+        candidates = candidates[picked]
+
+    keep = np.union1d(candidates, anchor_indices)
+    return [points[int(index)] for index in keep]
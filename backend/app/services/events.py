@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+import anyio
+
+from ..serialization import dumps
+from ..storage.repository import LocalDataRepository
+from .analytics import compute_fund_snapshots, compute_positions
+
+# Seconds between keep-alive comments on idle event streams.
+HEARTBEAT_SECONDS = float(os.environ.get("KABUCOUNT_EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Collections whose writes can change each kind of delta.
+POSITION_SOURCES = {"transactions", "fx_exchanges", "quotes"}
+FUND_SOURCES = {
+    "transactions",
+    "funding_groups",
+    "tax_settlements",
+    "capital_adjustments",
+    "fx_exchanges",
+}
+
+
+@dataclass(frozen=True)
+class Event:
+    name: str
+    data: dict[str, Any]
+
+    def encode(self) -> bytes:
+        return b"event: %s\ndata: %s\n\n" % (self.name.encode("utf-8"), dumps(self.data))
+
+
+class EventBroadcaster:
+    """In-process fan-out of events to every connected subscriber.
+
+    :meth:`publish` may be called from any thread. Each subscriber owns a
+    bounded queue; a subscriber that falls behind gets a single ``resync``
+    event instead of an unbounded backlog and should refetch its state.
+    """
+
+    def __init__(self, queue_size: int = 64) -> None:
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: dict[asyncio.Queue[Event], asyncio.AbstractEventLoop] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue[Event]]:
+        queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                self._subscribers.pop(queue, None)
+
+    def publish(self, name: str, data: dict[str, Any]) -> None:
+        event = Event(name, data)
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:  # pragma: no cover - subscriber loop already closed
+                pass
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue[Event], event: Event) -> None:
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(Event("resync", {}))
+            return
+        queue.put_nowait(event)
+
+
+def _keyed(items: list[Any], key) -> dict[Any, dict[str, Any]]:
+    return {key(item): item.model_dump(mode="json") for item in items}
+
+
+def _diff(
+    previous: dict[Any, dict[str, Any]] | None, current: dict[Any, dict[str, Any]]
+) -> tuple[list[dict[str, Any]], list[Any]]:
+    previous = previous or {}
+    changed = [value for key, value in current.items() if previous.get(key) != value]
+    removed = [key for key in previous if key not in current]
+    return changed, removed
+
+
+class ChangeFeed:
+    """Turn repository writes into position, quote and fund deltas.
+
+    Write notifications only mark collections dirty; a single task on the
+    event loop debounces them, recomputes the affected views off the loop and
+    publishes what changed since the last broadcast. Nothing is computed
+    while no client is subscribed.
+    """
+
+    def __init__(self, broadcaster: EventBroadcaster, debounce: float = 0.05) -> None:
+        self.broadcaster = broadcaster
+        self.debounce = debounce
+        self._repository: LocalDataRepository | None = None
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self._collect_lock = threading.Lock()
+        self._wake: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._positions: dict[Any, dict[str, Any]] | None = None
+        self._quotes: dict[Any, dict[str, Any]] | None = None
+        self._funds: dict[Any, dict[str, Any]] | None = None
+        self._aggregated: dict[Any, dict[str, Any]] | None = None
+
+    def attach(self, repository: LocalDataRepository) -> None:
+        """Follow ``repository``; re-attaching to another one resets the baseline."""
+        if repository is self._repository:
+            return
+        if self._repository is not None:
+            self._repository.remove_change_listener(self.notify)
+        self._repository = repository
+        self._positions = self._quotes = self._funds = self._aggregated = None
+        repository.add_change_listener(self.notify)
+
+    def notify(self, collection: str) -> None:
+        with self._lock:
+            self._dirty.add(collection)
+            loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:  # pragma: no cover - loop shut down
+                pass
+
+    async def ensure_running(self) -> None:
+        """Start the publishing task on the current loop and prime the baseline.
+
+        Call after subscribing: writes that landed while nobody listened are
+        still pending and get flushed to the new subscriber.
+        """
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            with self._lock:
+                self._loop = loop
+                self._wake = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        await anyio.to_thread.run_sync(self._prime)
+        with self._lock:
+            pending = bool(self._dirty)
+        if pending and self._wake is not None:
+            self._wake.set()
+
+    def _prime(self) -> None:
+        if self._positions is None:
+            self.collect(set())
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.debounce)
+            self._wake.clear()
+            if not self.broadcaster.subscriber_count:
+                continue
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                continue
+            try:
+                events = await anyio.to_thread.run_sync(self.collect, dirty)
+            except Exception:  # pragma: no cover - keep the feed alive
+                events = [("resync", {})]
+            for name, data in events:
+                self.broadcaster.publish(name, data)
+
+    def collect(self, dirty: set[str]) -> list[tuple[str, dict[str, Any]]]:
+        """Recompute the views touched by ``dirty`` and return their deltas.
+
+        Views without a baseline yet are computed silently.
+        """
+        with self._collect_lock:
+            return self._collect(dirty)
+
+    def _collect(self, dirty: set[str]) -> list[tuple[str, dict[str, Any]]]:
+        repository = self._repository
+        if repository is None:
+            return []
+        events: list[tuple[str, dict[str, Any]]] = []
+        transactions = fx_exchanges = None
+
+        if "quotes" in dirty or self._quotes is None:
+            quotes = repository.list_quotes()
+            current = _keyed(quotes, lambda quote: (quote.symbol, quote.market.value))
+            changed, _ = _diff(self._quotes, current)
+            if self._quotes is not None and changed:
+                events.append(("quotes", {"changed": changed}))
+            self._quotes = current
+
+        if dirty & POSITION_SOURCES or self._positions is None:
+            transactions = repository.list_transactions()
+            fx_exchanges = repository.list_fx_exchanges()
+            positions = compute_positions(transactions, fx_exchanges, repository.list_quotes())
+            current = _keyed(positions, lambda position: (position.symbol, position.market.value))
+            changed, removed = _diff(self._positions, current)
+            if self._positions is not None and (changed or removed):
+                events.append(
+                    (
+                        "positions",
+                        {
+                            "changed": changed,
+                            "removed": [
+                                {"symbol": symbol, "market": market} for symbol, market in removed
+                            ],
+                        },
+                    )
+                )
+            self._positions = current
+
+        if dirty & FUND_SOURCES or self._funds is None:
+            snapshots = compute_fund_snapshots(
+                transactions if transactions is not None else repository.list_transactions(),
+                repository.list_funding_groups(),
+                repository.list_tax_settlements(),
+                repository.list_capital_adjustments(),
+                fx_exchanges if fx_exchanges is not None else repository.list_fx_exchanges(),
+            )
+            funds = _keyed(snapshots.funds, lambda fund: fund.name)
+            aggregated = _keyed(snapshots.aggregated, lambda item: item.currency.value)
+            changed, removed = _diff(self._funds, funds)
+            changed_totals, _ = _diff(self._aggregated, aggregated)
+            if self._funds is not None and (changed or removed or changed_totals):
+                events.append(
+                    (
+                        "funds",
+                        {"changed": changed, "removed": removed, "aggregated": changed_totals},
+                    )
+                )
+            self._funds, self._aggregated = funds, aggregated
+        return events
+
+
+broadcaster = EventBroadcaster()
+change_feed = ChangeFeed(broadcaster)
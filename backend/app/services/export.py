@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zipfile
+from typing import Iterator
+
+from pydantic import BaseModel
+
+from ..models.schemas import (
+    FundingCapitalAdjustment,
+    FundingGroup,
+    FxExchangeRecord,
+    QuoteRecord,
+    TaxSettlementRecord,
+    Transaction,
+)
+from ..storage.sqlite_storage import SQLiteStorage
+
+EXPORT_FORMATS = {"ndjson", "csv"}
+
+# URL name -> (SQLite table, row model). Names follow the API paths.
+EXPORT_COLLECTIONS: dict[str, tuple[str, type[BaseModel]]] = {
+    "transactions": ("transactions", Transaction),
+    "funding-groups": ("funding_groups", FundingGroup),
+    "tax-settlements": ("tax_settlements", TaxSettlementRecord),
+    "capital-adjustments": ("capital_adjustments", FundingCapitalAdjustment),
+    "fx-exchanges": ("fx_exchanges", FxExchangeRecord),
+    "quotes": ("quotes", QuoteRecord),
+}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "zip": "application/zip",
+}
+
+
+def normalize_export_format(fmt: str | None) -> str:
+    normalized = (fmt or "ndjson").strip().lower()
+    if normalized == "jsonl":
+        normalized = "ndjson"
+    if normalized not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format {fmt}")
+    return normalized
+
+
+def iter_collection_export(
+    storage: SQLiteStorage, collection: str, fmt: str, batch_size: int = 500
+) -> Iterator[bytes]:
+    """Stream one collection as NDJSON or CSV, one chunk per cursor batch.
+
+    Rows go through the API model so exports match what the endpoints return;
+    memory stays bounded by ``batch_size`` regardless of table size.
+    """
+    table, model = EXPORT_COLLECTIONS[collection]
+    if fmt == "ndjson":
+        for rows in storage.iter_table(table, batch_size):
+            yield b"".join(
+                model.model_validate(dict(row)).model_dump_json().encode("utf-8") + b"\n"
+                for row in rows
+            )
+        return
+
+    fields = list(model.model_fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in storage.iter_table(table, batch_size):
+        for row in rows:
+            data = model.model_validate(dict(row)).model_dump(mode="json")
+            writer.writerow(_csv_value(data[field]) for field in fields)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _csv_value(value: object) -> object:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only sink that hands out whatever the zip writer produced so far."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_archive_export(storage: SQLiteStorage, fmt: str) -> Iterator[bytes]:
+    """Stream every collection into a zip archive without buffering it whole.
+
+    The archive is written to an unseekable sink, so entries use data
+    descriptors and the bytes can be forwarded as soon as they are produced.
+    """
+    sink = _StreamBuffer()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for collection in EXPORT_COLLECTIONS:
+            with archive.open(f"{collection}.{fmt}", mode="w", force_zip64=True) as entry:
+                for chunk in iter_collection_export(storage, collection, fmt):
+                    entry.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+    yield sink.drain()
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-from datetime import date
-from typing import Iterable
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Generator, Iterable, Iterator, Sequence
 
-import pandas as pd
-import yfinance as yf
+from dateutil.relativedelta import relativedelta
 
+from .. import metrics
 from ..models.schemas import (
+    AlignedHistoryRow,
     Currency,
     FxExchangeRecord,
     Market,
@@ -16,6 +20,64 @@ from ..models.schemas import (
     TradeSide,
     Transaction,
 )
+from ..storage.sqlite_storage import SQLiteStorage
+from .downsampling import downsample_series
+from .provider import provider_gate
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import pandas as pd
+
+
+PERIOD_OFFSETS = {
+    "1mo": relativedelta(months=1),
+    "3mo": relativedelta(months=3),
+    "6mo": relativedelta(months=6),
+    "1y": relativedelta(years=1),
+    "2y": relativedelta(years=2),
+    "5y": relativedelta(years=5),
+    "10y": relativedelta(years=10),
+}
+PERIOD_ALIASES = {"1yr": "1y", "1year": "1y"}
+PERIODS = {*PERIOD_OFFSETS, "ytd", "max"}
+
+
+@dataclass(frozen=True)
+class _PriceSeries:
+    """Sorted daily closes for one symbol plus what has been fetched so far."""
+
+    dates: list[date]
+    points: list[PriceHistoryPoint]
+    coverage_start: date | None = None
+    fetched_on: date | None = None
+
+    def slice(self, start: date, end: date) -> list[PriceHistoryPoint]:
+        lower = bisect_left(self.dates, start)
+        upper = bisect_right(self.dates, end)
+        return self.points[lower:upper]
+
+    def merged(
+        self, points: Sequence[PriceHistoryPoint], coverage_start: date, fetched_on: date
+    ) -> _PriceSeries:
+        if self.dates and points and points[0].date > self.dates[-1]:
+            merged_points = [*self.points, *points]
+        else:
+            by_date = {point.date: point for point in self.points}
+            by_date.update((point.date, point) for point in points)
+            merged_points = [by_date[key] for key in sorted(by_date)]
+        return _PriceSeries(
+            dates=[point.date for point in merged_points],
+            points=merged_points,
+            coverage_start=coverage_start,
+            fetched_on=fetched_on,
+        )
+
+
+_EMPTY_SERIES = _PriceSeries(dates=[], points=[])
+
+# In-memory view of the local price store keyed by (symbol, market). It is the
+# same-day cache and the fallback when the provider is slow or unavailable.
+_series_cache: dict[tuple[str, Market], _PriceSeries] = {}
+_series_cache_lock = threading.Lock()
 
 
 def _market_currency(market: Market) -> Currency:
@@ -23,6 +85,8 @@ def _market_currency(market: Market) -> Currency:
 
 
 def _extract_close_series(data: pd.DataFrame | None, ticker: str) -> pd.Series:
+    import pandas as pd
+
     if not isinstance(data, pd.DataFrame) or data.empty:
         return pd.Series(dtype=float)
     if "Close" in data.columns:
@@ -44,22 +108,43 @@ def _extract_close_series(data: pd.DataFrame | None, ticker: str) -> pd.Series:
     return pd.Series(dtype=float)
 
 
-def fetch_price_history(symbol: str, market: Market, period: str = "1y") -> list[PriceHistoryPoint]:
+def _normalize_period(period: str | None) -> str:
     normalized = period.strip().lower() if period else "1y"
-    if normalized not in {"1y", "1yr", "1year"}:
-        normalized = "1y"
+    normalized = PERIOD_ALIASES.get(normalized, normalized)
+    if normalized not in PERIODS:
+        raise ValueError(f"Unsupported period {period}")
+    return normalized
+
+
+def resolve_history_range(
+    period: str | None = "1y",
+    start: date | None = None,
+    end: date | None = None,
+) -> tuple[date, date]:
+    """Turn a preset period and optional explicit bounds into ``(start, end)``.
+
+    ``date.min`` stands for the full available history (``max``).
+    """
+    today = date.today()
+    end = min(end or today, today)
+    if start is None:
+        normalized = _normalize_period(period)
+        if normalized == "max":
+            start = date.min
+        elif normalized == "ytd":
+            start = date(end.year, 1, 1)
+        else:
+            start = end - PERIOD_OFFSETS[normalized]
+    if start > end:
+        raise ValueError("start must not be after end")
+    return start, end
 
-    ticker = symbol
-    try:
-        data = yf.download(tickers=ticker, period=normalized, interval="1d", progress=False)
-    except Exception:
-        return []
-    close_series = _extract_close_series(data, ticker).dropna()
-    if close_series.empty:
-        return []
+
+def _series_to_points(close_series: pd.Series) -> list[PriceHistoryPoint]:
+    import pandas as pd
 
     points: list[PriceHistoryPoint] = []
-    for timestamp, value in close_series.items():
+    for timestamp, value in close_series.dropna().items():
         if pd.isna(value):
             continue
         ts = pd.Timestamp(timestamp)
@@ -68,6 +153,261 @@ def fetch_price_history(symbol: str, market: Market, period: str = "1y") -> list
     return points
 
 
+# ``(start, end)`` of one download; ``end`` is exclusive and ``None`` means
+# "through today", which also marks the series as refreshed.
+_Window = tuple[date, date | None]
+
+
+def _download_window(start: date, end: date | None = None) -> dict[str, str]:
+    if start == date.min and end is None:
+        return {"period": "max"}
+    # yfinance treats ``end`` as exclusive and starts at 1900 when ``start`` is omitted.
+    params = {"end": (end or date.today() + timedelta(days=1)).isoformat()}
+    if start != date.min:
+        params["start"] = start.isoformat()
+    return params
+
+
+def _download_errors(symbols: Sequence[str]) -> dict[str, str]:
+    """Provider failures of the last ``yf.download`` call, per symbol.
+
+    yfinance logs errors instead of raising them. "No price data found" only
+    means the window holds no bars, so it is not a failure.
+    """
+    from yfinance import shared
+
+    errors: dict[str, str] = getattr(shared, "_ERRORS", {})
+    return {
+        symbol: error
+        for symbol in symbols
+        if (error := errors.get(symbol.upper()))
+        and not error.startswith("YFPricesMissingError")
+    }
+
+
+def _download_price_history(
+    symbol: str, start: date, end: date | None = None
+) -> list[PriceHistoryPoint]:
+    """Daily closes in the window; raises when the provider call failed."""
+    # pandas/yfinance are imported on first use to keep API start-up light.
+    import yfinance as yf
+
+    data = yf.download(
+        tickers=symbol, interval="1d", progress=False, **_download_window(start, end)
+    )
+    errors = _download_errors([symbol])
+    if errors:
+        raise RuntimeError(f"Price download for {symbol} failed: {errors[symbol]}")
+    return _series_to_points(_extract_close_series(data, symbol))
+
+
+def _download_price_histories(
+    symbols: Sequence[str], start: date, end: date | None = None
+) -> dict[str, list[PriceHistoryPoint]]:
+    """Daily closes per symbol; symbols whose download failed are left out."""
+    if len(symbols) == 1:
+        return {symbols[0]: _download_price_history(symbols[0], start, end)}
+    import yfinance as yf
+
+    data = yf.download(
+        tickers=" ".join(symbols),
+        interval="1d",
+        group_by="ticker",
+        progress=False,
+        **_download_window(start, end),
+    )
+    errors = _download_errors(symbols)
+    return {
+        symbol: _series_to_points(_extract_close_series(data, symbol))
+        for symbol in symbols
+        if symbol not in errors
+    }
+
+
+def clear_price_history_cache() -> None:
+    with _series_cache_lock:
+        _series_cache.clear()
+
+
+def invalidate_price_history(keys: Iterable[tuple[str, Market]]) -> None:
+    """Drop in-memory series so the next read reloads them from the store."""
+    with _series_cache_lock:
+        for key in keys:
+            _series_cache.pop(key, None)
+
+
+def _load_series(symbol: str, market: Market, store: SQLiteStorage | None) -> _PriceSeries:
+    with _series_cache_lock:
+        series = _series_cache.get((symbol, market))
+    if series is not None or store is None:
+        if store is not None:
+            metrics.record_cache("price_series", True)
+        return series or _EMPTY_SERIES
+
+    metrics.record_cache("price_series", False)
+
+    rows = store.load_price_history(symbol, market.value)
+    coverage = store.get_price_coverage(symbol, market.value)
+    points = [PriceHistoryPoint(date=point_date, close=close) for point_date, close in rows]
+    series = _PriceSeries(
+        dates=[point.date for point in points],
+        points=points,
+        coverage_start=coverage[0] if coverage else None,
+        fetched_on=coverage[1] if coverage else None,
+    )
+    with _series_cache_lock:
+        return _series_cache.setdefault((symbol, market), series)
+
+
+def _missing_windows(series: _PriceSeries, start: date, end: date) -> list[_Window]:
+    """Downloads needed to answer ``[start, end]``; empty when it is covered.
+
+    Older history is backfilled only up to the stored coverage, and recent
+    bars are topped up from the last stored one, so a range is never fetched
+    twice.
+    """
+    if series.coverage_start is None or series.fetched_on is None:
+        return [(start, None)]
+    windows: list[_Window] = []
+    if start < series.coverage_start:
+        windows.append((start, series.coverage_start))
+    if series.fetched_on < min(end, date.today()):
+        # Re-read the last stored bar (it may have been a partial session) and
+        # everything after it, so coverage stays contiguous.
+        windows.append((series.dates[-1] if series.dates else series.fetched_on, None))
+    return windows
+
+
+def _merge_windows(windows: Iterable[_Window]) -> _Window:
+    """One window spanning every given window."""
+    windows = list(windows)
+    ends = [end for _, end in windows]
+    return (
+        min(start for start, _ in windows),
+        None if None in ends else max(end for end in ends if end is not None),
+    )
+
+
+def _store_download(
+    symbol: str,
+    market: Market,
+    window: _Window,
+    points: Sequence[PriceHistoryPoint],
+    store: SQLiteStorage | None,
+) -> _PriceSeries:
+    """Merge downloaded ``points`` and widen coverage to ``window``.
+
+    Called only for downloads that completed, so an empty result (weekend,
+    holiday or pre-listing window) still counts as covered and is not
+    requested again. Failed downloads raise before this and leave coverage
+    untouched.
+    """
+    start, end = window
+    with _series_cache_lock:
+        current = _series_cache.get((symbol, market), _EMPTY_SERIES)
+        coverage_start = (
+            start if current.coverage_start is None else min(current.coverage_start, start)
+        )
+        # Only a download through today refreshes ``fetched_on``.
+        fetched_on = (
+            date.today() if end is None or current.fetched_on is None else current.fetched_on
+        )
+        updated = current.merged(points, coverage_start, fetched_on)
+        _series_cache[(symbol, market)] = updated
+    if store is not None:
+        store.upsert_price_history(
+            (symbol, market.value, point.date, point.close) for point in points
+        )
+        store.set_price_coverage(symbol, market.value, coverage_start, fetched_on)
+    return updated
+
+
+def fetch_price_history(
+    symbol: str,
+    market: Market,
+    period: str = "1y",
+    *,
+    start: date | None = None,
+    end: date | None = None,
+    store: SQLiteStorage | None = None,
+) -> list[PriceHistoryPoint]:
+    """Daily closes for ``[start, end]`` served from the local price store.
+
+    Only the part of the range that has never been fetched (older history or
+    bars after the last top-up) is downloaded. When the provider fails or runs
+    past its budget the locally known bars are returned instead.
+    """
+    start, end = resolve_history_range(period, start, end)
+    series = _load_series(symbol, market, store)
+    windows = _missing_windows(series, start, end)
+    if not windows:
+        return series.slice(start, end)
+
+    def load() -> _PriceSeries:
+        updated = series
+        for window in windows:
+            points = _download_price_history(symbol, *window)
+            # Store from the worker itself so a fetch that outlives the
+            # caller's budget still refreshes the cache for the next request.
+            updated = _store_download(symbol, market, window, points, store)
+        return updated
+
+    try:
+        series = provider_gate.call((symbol, market, tuple(windows)), load)
+    except Exception:
+        pass
+    return series.slice(start, end)
+
+
+def fetch_price_histories(
+    items: Sequence[tuple[str, Market]],
+    period: str = "1y",
+    *,
+    start: date | None = None,
+    end: date | None = None,
+    store: SQLiteStorage | None = None,
+) -> Iterator[tuple[tuple[str, Market], list[PriceHistoryPoint]]]:
+    """Yield ``((symbol, market), series)`` pairs, locally available ones first.
+
+    Everything missing is resolved with a single batched provider call starting
+    at the earliest missing date; when it fails or exceeds the time budget each
+    symbol falls back to the bars already stored.
+    """
+    start, end = resolve_history_range(period, start, end)
+    pending: dict[tuple[str, Market], tuple[_PriceSeries, list[_Window]]] = {}
+    for symbol, market in dict.fromkeys(items):
+        series = _load_series(symbol, market, store)
+        windows = _missing_windows(series, start, end)
+        if not windows:
+            yield (symbol, market), series.slice(start, end)
+        else:
+            pending[(symbol, market)] = (series, windows)
+    if not pending:
+        return
+
+    # One call spanning every symbol's missing windows; the download covers
+    # each of them, so storing it under the shared window is exact.
+    batch_window = _merge_windows(window for _, windows in pending.values() for window in windows)
+    symbols = list(dict.fromkeys(symbol for symbol, _ in pending))
+
+    def load() -> dict[tuple[str, Market], _PriceSeries]:
+        downloaded = _download_price_histories(symbols, *batch_window)
+        updated: dict[tuple[str, Market], _PriceSeries] = {}
+        for symbol, market in pending:
+            if symbol in downloaded:
+                updated[(symbol, market)] = _store_download(
+                    symbol, market, batch_window, downloaded[symbol], store
+                )
+        return updated
+
+    try:
+        updated = provider_gate.call(("batch", batch_window, tuple(symbols)), load)
+    except Exception:
+        updated = {}
+    for key, (series, _) in pending.items():
+        yield key, updated.get(key, series).slice(start, end)
+
+
 def _convert_amount(amount: float, from_currency: Currency, to_currency: Currency, rate: float) -> float:
     if from_currency == to_currency:
         return amount
@@ -78,22 +418,27 @@ def _convert_amount(amount: float, from_currency: Currency, to_currency: Currenc
     return amount
 
 
-def build_trade_markers(
+def build_trade_markers_by_symbol(
     transactions: Iterable[Transaction],
     fx_exchanges: Iterable[FxExchangeRecord],
-    symbol: str,
-    market: Market,
-) -> list[TradeMarker]:
-    market_currency = _market_currency(market)
+    items: Iterable[tuple[str, Market]],
+) -> dict[tuple[str, Market], list[TradeMarker]]:
+    """Build markers for several symbols in one pass over the transactions."""
+    markers: dict[tuple[str, Market], list[TradeMarker]] = {
+        (symbol, market): [] for symbol, market in items
+    }
+    if not markers:
+        return markers
     fx_map = {fx.transaction_id: fx for fx in fx_exchanges if fx.transaction_id}
-    markers: list[TradeMarker] = []
 
     for tx in transactions:
-        if tx.symbol != symbol or tx.market != market:
+        bucket = markers.get((tx.symbol, tx.market))
+        if bucket is None:
             continue
         quantity = abs(tx.quantity)
         if quantity <= 0:
             continue
+        market_currency = _market_currency(tx.market)
         amount = tx.gross_amount
         currency = tx.cash_currency
 
@@ -104,7 +449,7 @@ def build_trade_markers(
                 currency = market_currency
 
         price = amount / quantity
-        markers.append(
+        bucket.append(
             TradeMarker(
                 date=tx.trade_date,
                 price=round(float(price), 6),
@@ -115,10 +460,99 @@ def build_trade_markers(
             )
         )
 
-    markers.sort(key=lambda item: (item.date, item.transaction_id))
+    for bucket in markers.values():
+        bucket.sort(key=lambda item: (item.date, item.transaction_id))
     return markers
 
 
+def build_trade_markers(
+    transactions: Iterable[Transaction],
+    fx_exchanges: Iterable[FxExchangeRecord],
+    symbol: str,
+    market: Market,
+) -> list[TradeMarker]:
+    return build_trade_markers_by_symbol(transactions, fx_exchanges, [(symbol, market)])[
+        (symbol, market)
+    ]
+
+
+def align_history(
+    series: Sequence[PriceHistoryPoint],
+    markers: Sequence[TradeMarker],
+    currency: Currency,
+) -> list[AlignedHistoryRow]:
+    """Join markers onto the bars of ``series`` with running position and cost.
+
+    Each marker is attached to the first bar on or after its trade date (the
+    same bar the downsampler keeps as an anchor). Position and average cost
+    follow the moving-average method used for positions; markers in another
+    currency move the quantity but not the cost basis. Trades before the first
+    bar seed the opening position; trades after the last bar are ignored.
+    """
+    if not series:
+        return []
+    if not markers:
+        return [
+            AlignedHistoryRow(
+                date=point.date, close=point.close, markers=[], position=0.0, average_cost=None
+            )
+            for point in series
+        ]
+    import numpy as np
+
+    days = np.array([point.date for point in series], dtype="datetime64[D]")
+    marker_days = np.array([marker.date for marker in markers], dtype="datetime64[D]")
+    bar_index = np.searchsorted(days, marker_days, side="left")
+
+    # Moving-average cost is path dependent, so the state per marker is one
+    # O(m) pass; broadcasting it onto the bars below is vectorized.
+    positions = np.empty(len(markers), dtype="float64")
+    costs = np.empty(len(markers), dtype="float64")
+    quantity = 0.0
+    total_cost = 0.0
+    for index, marker in enumerate(markers):
+        in_currency = marker.currency == currency
+        if marker.side == TradeSide.BUY:
+            quantity += marker.quantity
+            if in_currency:
+                total_cost += marker.price * marker.quantity
+        elif quantity > 0:
+            sold = min(marker.quantity, quantity)
+            total_cost -= total_cost / quantity * sold
+            quantity -= sold
+        if quantity <= 1e-9:
+            quantity = 0.0
+            total_cost = 0.0
+        positions[index] = quantity
+        costs[index] = total_cost
+
+    last_marker = np.searchsorted(bar_index, np.arange(len(days)), side="right") - 1
+    # np.where evaluates both branches, so index with a clamped copy.
+    safe_marker = np.maximum(last_marker, 0)
+    bar_positions = np.where(last_marker >= 0, positions[safe_marker], 0.0)
+    bar_costs = np.where(last_marker >= 0, costs[safe_marker], 0.0)
+
+    markers_by_bar: dict[int, list[TradeMarker]] = {}
+    opening = np.searchsorted(marker_days, days[0], side="left")
+    for marker, index in zip(markers[opening:], bar_index[opening:].tolist()):
+        if index < len(days):
+            markers_by_bar.setdefault(index, []).append(marker)
+
+    rows: list[AlignedHistoryRow] = []
+    for index, point in enumerate(series):
+        position = float(bar_positions[index])
+        rows.append(
+            AlignedHistoryRow(
+                date=point.date,
+                close=point.close,
+                markers=markers_by_bar.get(index, []),
+                position=round(position, 6),
+                average_cost=round(float(bar_costs[index]) / position, 6) if position else None,
+            )
+        )
+    return rows
+
+
 def get_position_history(
     *,
     transactions: Iterable[Transaction],
@@ -126,10 +560,24 @@ def get_position_history(
     symbol: str,
     market: Market,
     period: str = "1y",
+    start: date | None = None,
+    end: date | None = None,
+    max_points: int | None = None,
+    resolution: str = "1d",
+    align: bool = False,
+    store: SQLiteStorage | None = None,
 ) -> PositionHistoryResponse:
-    series = fetch_price_history(symbol, market, period=period)
+    series = fetch_price_history(
+        symbol, market, period=period, start=start, end=end, store=store
+    )
     markers = build_trade_markers(transactions, fx_exchanges, symbol, market)
     currency = _market_currency(market)
+    series = downsample_series(
+        series,
+        max_points=max_points,
+        resolution=resolution,
+        anchors=(marker.date for marker in markers),
+    )
 
     return PositionHistoryResponse(
         symbol=symbol,
@@ -137,4 +585,71 @@ def get_position_history(
         currency=currency,
         series=series,
         markers=markers,
+        aligned=align_history(series, markers, currency) if align else None,
     )
+
+
+def iter_position_histories(
+    *,
+    transactions: Iterable[Transaction],
+    fx_exchanges: Iterable[FxExchangeRecord],
+    items: Sequence[tuple[str, Market]],
+    period: str = "1y",
+    start: date | None = None,
+    end: date | None = None,
+    max_points: int | None = None,
+    resolution: str = "1d",
+    align: bool = False,
+    store: SQLiteStorage | None = None,
+) -> Generator[PositionHistoryResponse, None, None]:
+    """Yield one response per distinct ``(symbol, market)`` as series become available."""
+    markers = build_trade_markers_by_symbol(transactions, fx_exchanges, items)
+    histories = fetch_price_histories(items, period=period, start=start, end=end, store=store)
+    for (symbol, market), series in histories:
+        symbol_markers = markers[(symbol, market)]
+        currency = _market_currency(market)
+        series = downsample_series(
+            series,
+            max_points=max_points,
+            resolution=resolution,
+            anchors=(marker.date for marker in symbol_markers),
+        )
+        yield PositionHistoryResponse(
+            symbol=symbol,
+            market=market,
+            currency=currency,
+            series=series,
+            markers=symbol_markers,
+            aligned=align_history(series, symbol_markers, currency) if align else None,
+        )
+
+
+def get_position_histories(
+    *,
+    transactions: Iterable[Transaction],
+    fx_exchanges: Iterable[FxExchangeRecord],
+    items: Sequence[tuple[str, Market]],
+    period: str = "1y",
+    start: date | None = None,
+    end: date | None = None,
+    max_points: int | None = None,
+    resolution: str = "1d",
+    align: bool = False,
+    store: SQLiteStorage | None = None,
+) -> list[PositionHistoryResponse]:
+    responses = {
+        (response.symbol, response.market): response
+        for response in iter_position_histories(
+            transactions=transactions,
+            fx_exchanges=fx_exchanges,
+            items=items,
+            period=period,
+            start=start,
+            end=end,
+            max_points=max_points,
+            resolution=resolution,
+            align=align,
+            store=store,
+        )
+    }
+    return [responses[key] for key in dict.fromkeys(items)]
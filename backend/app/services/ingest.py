@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from itertools import accumulate
+from typing import Any, Iterable, Sequence
+
+from pydantic import ValidationError
+
+from ..models.schemas import (
+    BulkRowStatus,
+    BulkTransactionResponse,
+    BulkTransactionResult,
+    FundingGroup,
+    Transaction,
+    TransactionCreate,
+)
+from ..serialization import loads
+from ..storage.repository import LocalDataRepository
+
+_EPSILON = 1e-9
+
+
+def parse_bulk_payload(body: bytes) -> list[Any]:
+    """Decode a JSON array or NDJSON body into raw row objects.
+
+    NDJSON lines that are not valid JSON are kept as ``ValueError`` instances
+    so they can be reported against their row number instead of failing the
+    whole request.
+    """
+    text = body.decode("utf-8-sig").strip()
+    if not text:
+        return []
+    if text.startswith("["):
+        try:
+            payload = loads(text)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON array: {exc.msg}") from exc
+        return list(payload)
+    rows: list[Any] = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(loads(line))
+        except json.JSONDecodeError as exc:
+            rows.append(ValueError(f"Invalid JSON: {exc.msg}"))
+    return rows
+
+
+def format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def validate_bulk_transactions(
+    rows: Sequence[Any],
+    transactions: Iterable[Transaction],
+    groups: Iterable[FundingGroup],
+) -> tuple[list[BulkTransactionResult], list[TransactionCreate]]:
+    """Validate a batch against the journal in one pass per holding.
+
+    Rows are first parsed and checked for a known funding group. Sells are
+    then checked chronologically per ``(symbol, market, cash_currency)``: a
+    sell is accepted only if the running position stays non-negative from its
+    trade date onwards, counting existing trades, every valid buy in the batch
+    and the sells accepted before it. Within a day, buys are applied before
+    sells. Returns per-row results (in input order) and the accepted rows.
+    """
+    group_names = {group.name for group in groups}
+    results: list[BulkTransactionResult] = []
+    parsed: dict[int, TransactionCreate] = {}
+    for index, row in enumerate(rows):
+        if isinstance(row, Exception):
+            results.append(
+                BulkTransactionResult(index=index, status=BulkRowStatus.ERROR, error=str(row))
+            )
+            continue
+        try:
+            payload = TransactionCreate.model_validate(row)
+        except ValidationError as exc:
+            results.append(
+                BulkTransactionResult(
+                    index=index, status=BulkRowStatus.ERROR, error=format_validation_error(exc)
+                )
+            )
+            continue
+        if payload.funding_group not in group_names:
+            results.append(
+                BulkTransactionResult(
+                    index=index, status=BulkRowStatus.ERROR, error="Funding group not found"
+                )
+            )
+            continue
+        parsed[index] = payload
+        results.append(BulkTransactionResult(index=index, status=BulkRowStatus.CREATED))
+
+    # (trade_date, buys first, existing before new, input order) per holding.
+    events: dict[tuple, list[tuple]] = defaultdict(list)
+    for tx in transactions:
+        key = (tx.symbol, tx.market, tx.cash_currency)
+        events[key].append((tx.trade_date, tx.quantity < 0, 0, -1, tx.quantity))
+    sell_keys: set[tuple] = set()
+    for index, payload in parsed.items():
+        key = (payload.symbol, payload.market, payload.cash_currency)
+        events[key].append((payload.trade_date, payload.quantity < 0, 1, index, payload.quantity))
+        if payload.quantity < 0:
+            sell_keys.add(key)
+
+    for key in sell_keys:
+        ordered = sorted(events[key])
+        # Balance after each event with every new sell left out.
+        balances = list(
+            accumulate(
+                0.0 if index >= 0 and quantity < 0 else quantity
+                for _, _, _, index, quantity in ordered
+            )
+        )
+        suffix_min = list(accumulate(reversed(balances), min))[::-1]
+        consumed = 0.0
+        for position, (_, _, _, index, quantity) in enumerate(ordered):
+            if index < 0 or quantity >= 0:
+                continue
+            # Every accepted sell so far precedes this one, so all of them
+            # lower each balance from here on.
+            if suffix_min[position] - consumed + quantity < -_EPSILON:
+                results[index] = BulkTransactionResult(
+                    index=index,
+                    status=BulkRowStatus.ERROR,
+                    error="Insufficient position to complete sell order",
+                )
+                del parsed[index]
+                continue
+            consumed -= quantity
+
+    return results, [parsed[index] for index in sorted(parsed)]
+
+
+def ingest_bulk_transactions(
+    repo: LocalDataRepository, rows: Sequence[Any], atomic: bool = False
+) -> BulkTransactionResponse:
+    """Validate ``rows`` against the journal and append the accepted ones.
+
+    The read, the validation and the write run in one unit of work, so a
+    concurrent write cannot invalidate the checks before the rows land. With
+    ``atomic`` nothing is written unless every row is valid.
+    """
+    with repo.unit_of_work():
+        results, accepted = validate_bulk_transactions(
+            rows, repo.list_transactions(), repo.list_funding_groups()
+        )
+        failed = len(rows) - len(accepted)
+        if atomic and failed:
+            for result in results:
+                if result.status == BulkRowStatus.CREATED:
+                    result.status = BulkRowStatus.SKIPPED
+            return BulkTransactionResponse(
+                committed=False, created=0, failed=failed, results=results
+            )
+        created = repo.add_transactions(accepted)
+
+    accepted_results = [result for result in results if result.status == BulkRowStatus.CREATED]
+    for result, transaction in zip(accepted_results, created):
+        result.transaction = transaction
+    return BulkTransactionResponse(
+        committed=bool(created), created=len(created), failed=failed, results=results
+    )
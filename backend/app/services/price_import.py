@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import io
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Iterable
+
+from ..models.schemas import Market, PriceImportSummary
+from ..storage.sqlite_storage import SQLiteStorage
+from .history import invalidate_price_history
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import pandas as pd
+
+PRICE_FORMATS = {"csv", "parquet"}
+
+_SYMBOL_COLUMNS = ("symbol", "ticker", "code")
+_DATE_COLUMNS = ("date", "datetime", "timestamp", "trade_date")
+_CLOSE_COLUMNS = ("close", "adj close", "adj_close", "price")
+
+
+def detect_format(name: str, explicit: str | None = None) -> str:
+    fmt = (explicit or "").strip().lower() or Path(name).suffix.lstrip(".").lower()
+    if fmt in {"pq", "parq"}:
+        fmt = "parquet"
+    if fmt not in PRICE_FORMATS:
+        raise ValueError(f"Unsupported price file format {fmt or name}")
+    return fmt
+
+
+def _pick(columns: Iterable[str], candidates: tuple[str, ...]) -> str | None:
+    available = set(columns)
+    return next((name for name in candidates if name in available), None)
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    import pandas as pd
+
+    try:
+        # Fast path for the common ISO-8601 exports.
+        parsed = pd.to_datetime(values, errors="coerce", format="ISO8601", utc=True)
+    except (TypeError, ValueError):
+        parsed = pd.to_datetime(values, errors="coerce", format="mixed", utc=True)
+    return parsed.dt.tz_localize(None).dt.normalize()
+
+
+def read_price_frame(
+    source: str | Path | bytes | BinaryIO,
+    fmt: str,
+    *,
+    symbol: str | None = None,
+    market: Market | None = None,
+) -> pd.DataFrame:
+    """Parse a CSV/Parquet price file into ``symbol, market, date, close`` columns.
+
+    Files without a symbol column take ``symbol``; rows without a market use
+    ``market`` or are inferred from the ticker (``.T`` suffix → JP, else US).
+    Rows without a symbol or with unparsable dates or closes are dropped and
+    duplicates on ``(symbol, market, date)`` keep the last occurrence.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if fmt == "parquet":
+        try:
+            frame = pd.read_parquet(source)
+        except ImportError as exc:
+            raise ValueError("Parquet import requires pyarrow or fastparquet") from exc
+    else:
+        frame = pd.read_csv(source)
+
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    if isinstance(frame.index, pd.DatetimeIndex) and _pick(frame.columns, _DATE_COLUMNS) is None:
+        frame = frame.reset_index(names="date")
+
+    date_column = _pick(frame.columns, _DATE_COLUMNS)
+    close_column = _pick(frame.columns, _CLOSE_COLUMNS)
+    if date_column is None or close_column is None:
+        raise ValueError("Price file needs a date column and a close column")
+    symbol_column = _pick(frame.columns, _SYMBOL_COLUMNS)
+    if symbol_column is None and not symbol:
+        raise ValueError("Price file has no symbol column; pass a symbol")
+
+    # String clean-up runs on the distinct values only, then is broadcast back.
+    if symbol_column:
+        symbol_codes, symbol_values = pd.factorize(frame[symbol_column])
+        symbol_values = pd.Index(symbol_values).astype(str).str.strip()
+    else:
+        symbol_codes = np.zeros(len(frame), dtype="int64")
+        # A missing or blank fallback symbol marks every row invalid below.
+        symbol_values = pd.Index(["" if symbol is None else symbol.strip()])
+    inferred_markets = np.where(
+        symbol_values.str.upper().str.endswith(".T"), Market.JP.value, Market.US.value
+    )
+
+    if "market" in frame.columns:
+        market_codes, market_values = pd.factorize(frame["market"])
+        market_values = pd.Index(market_values).astype(str).str.strip().str.upper()
+        invalid = set(market_values) - {item.value for item in Market} - {""}
+        if invalid:
+            raise ValueError(f"Unknown market values: {', '.join(sorted(invalid))}")
+        market_codes = np.where(market_values.to_numpy()[market_codes] == "", -1, market_codes)
+        markets = np.where(
+            market_codes >= 0,
+            market_values.to_numpy(dtype=object)[market_codes],
+            inferred_markets[symbol_codes] if market is None else market.value,
+        )
+    else:
+        markets = (
+            np.full(len(frame), market.value, dtype=object)
+            if market is not None
+            else inferred_markets[symbol_codes]
+        )
+
+    result = pd.DataFrame(
+        {
+            "symbol": symbol_values.to_numpy(dtype=object)[symbol_codes],
+            "market": markets,
+            "date": _parse_dates(frame[date_column]).to_numpy(),
+            "close": pd.to_numeric(frame[close_column], errors="coerce").to_numpy(),
+        }
+    )
+    valid = (symbol_codes >= 0) & (result["symbol"] != "").to_numpy()
+    result = result[valid].dropna(subset=["date", "close"])
+
+    result = result.drop_duplicates(subset=["symbol", "market", "date"], keep="last")
+    return result.sort_values(["symbol", "market", "date"], ignore_index=True)[
+        ["symbol", "market", "date", "close"]
+    ]
+
+
+def import_price_frame(store: SQLiteStorage, frame: pd.DataFrame) -> PriceImportSummary:
+    """Upsert a normalized price frame and widen coverage for every symbol.
+
+    Coverage only grows where the imported range joins the stored one; bars
+    from a disjoint range are stored but the gap stays eligible for download.
+    """
+    if frame.empty:
+        return PriceImportSummary(rows=0, symbols=0, first_date=None, last_date=None)
+
+    rows = zip(
+        frame["symbol"].tolist(),
+        frame["market"].tolist(),
+        frame["date"].to_numpy(dtype="datetime64[D]").astype(str).tolist(),
+        frame["close"].round(6).tolist(),
+    )
+    written = store.upsert_price_rows(rows)
+
+    bounds = frame.groupby(["symbol", "market"], sort=False)["date"].agg(["min", "max"])
+    coverage = [
+        (symbol, market_value, first.date(), last.date())
+        for (symbol, market_value), first, last in zip(bounds.index, bounds["min"], bounds["max"])
+    ]
+    store.extend_price_coverage(coverage)
+    invalidate_price_history((symbol, Market(market_value)) for symbol, market_value, _, _ in coverage)
+
+    first_date: date = frame["date"].min().date()
+    last_date: date = frame["date"].max().date()
+    return PriceImportSummary(
+        rows=written,
+        symbols=len(coverage),
+        first_date=first_date,
+        last_date=last_date,
+    )
+
+
+def import_price_file(
+    store: SQLiteStorage,
+    source: str | Path | bytes | BinaryIO,
+    fmt: str,
+    *,
+    symbol: str | None = None,
+    market: Market | None = None,
+) -> PriceImportSummary:
+    frame = read_price_frame(source, fmt, symbol=symbol, market=market)
+    return import_price_frame(store, frame)
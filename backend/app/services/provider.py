@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, TypeVar
+
+import anyio
+
+from .. import metrics
+
+T = TypeVar("T")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(int(os.environ.get(name, default)), 1)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(float(os.environ.get(name, default)), 0.0)
+    except ValueError:
+        return default
+
+
+# Global cap on concurrent market-data (yfinance) calls and the per-call wait budget.
+PROVIDER_CONCURRENCY = _env_int("KABUCOUNT_PROVIDER_CONCURRENCY", 4)
+PROVIDER_TIMEOUT = _env_float("KABUCOUNT_PROVIDER_TIMEOUT", 15.0)
+
+
+class ProviderBusyError(TimeoutError):
+    """Raised when a provider call does not finish within its time budget."""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight execution.
+
+    The first caller for a key submits the work to the shared executor; callers
+    that arrive while it is running wait on the same future. The entry is
+    dropped once the call completes so the next caller triggers a fresh fetch.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor) -> None:
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def submit(self, key: Hashable, func: Callable[[], T]) -> Future:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(func)
+            self._calls[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def _operation_label(key: Hashable) -> str:
+    """Metric label for a single-flight key: ``quotes``, ``batch`` or ``history``."""
+    if isinstance(key, tuple) and key and key[0] in ("quotes", "batch"):
+        return key[0]
+    return "history"
+
+
+class ProviderGate:
+    """Bound concurrency and waiting time for market-data provider calls."""
+
+    def __init__(self, concurrency: int, timeout: float) -> None:
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        # Worker threads beyond the semaphore only ever wait for a slot, so the
+        # pool is sized to keep queued keys from blocking request threads.
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency * 2,
+            thread_name_prefix="kabumemo-provider",
+        )
+        self._flights = SingleFlight(self._executor)
+
+    def _guarded(self, key: Hashable, func: Callable[[], T]) -> Callable[[], T]:
+        operation = _operation_label(key)
+
+        def run() -> T:
+            if not self._slots.acquire(timeout=self.timeout):
+                metrics.provider_failures.inc(operation, "saturated")
+                raise ProviderBusyError("Market data provider is saturated")
+            start = time.perf_counter()
+            try:
+                return func()
+            except Exception:
+                metrics.provider_failures.inc(operation, "error")
+                raise
+            finally:
+                metrics.provider_call_duration.observe(time.perf_counter() - start, operation)
+                self._slots.release()
+
+        return run
+
+    def call(self, key: Hashable, func: Callable[[], T], timeout: float | None = None) -> T:
+        """Run ``func`` once per ``key`` and wait at most ``timeout`` seconds.
+
+        Raises :class:`ProviderBusyError` when the budget is exceeded; the
+        underlying call keeps running so its result can still be used by
+        whoever registered a completion callback.
+        """
+        future = self._flights.submit(key, self._guarded(key, func))
+        wait = self.timeout if timeout is None else timeout
+        try:
+            return future.result(timeout=wait)
+        except TimeoutError as exc:
+            metrics.provider_failures.inc(_operation_label(key), "timeout")
+            raise ProviderBusyError("Market data provider call timed out") from exc
+
+    async def acall(self, key: Hashable, func: Callable[[], T], timeout: float | None = None) -> T:
+        """Awaitable variant of :meth:`call`.
+
+        The event loop waits on the shared future directly, so no request
+        thread is held while the provider works.
+        """
+        future = self._flights.submit(key, self._guarded(key, func))
+        wait = self.timeout if timeout is None else timeout
+        try:
+            # shield() keeps a caller's timeout from cancelling the shared call.
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), wait)
+        except asyncio.TimeoutError as exc:
+            metrics.provider_failures.inc(_operation_label(key), "timeout")
+            raise ProviderBusyError("Market data provider call timed out") from exc
+
+    def submit(self, key: Hashable, func: Callable[[], T]) -> Future:
+        return self._flights.submit(key, self._guarded(key, func))
+
+
+# Threads that may block on history downloads at once; separate from the
+# storage pool so chart requests cannot starve journal reads.
+MARKET_DATA_CONCURRENCY = _env_int("KABUCOUNT_MARKET_DATA_THREADS", PROVIDER_CONCURRENCY * 2)
+
+_market_data_limiter: anyio.CapacityLimiter | None = None
+
+
+def market_data_limiter() -> anyio.CapacityLimiter:
+    global _market_data_limiter
+    if _market_data_limiter is None:
+        _market_data_limiter = anyio.CapacityLimiter(MARKET_DATA_CONCURRENCY)
+    return _market_data_limiter
+
+
+async def run_market_data(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking market-data work (history fetch + merge) off the event loop."""
+    return await anyio.to_thread.run_sync(
+        functools.partial(func, *args, **kwargs), limiter=market_data_limiter()
+    )
+
+
+provider_gate = ProviderGate(PROVIDER_CONCURRENCY, PROVIDER_TIMEOUT)
+
+
+def warm_up_market_data() -> None:
+    """Import the pandas/yfinance stack ahead of the first quote request."""
+    try:
+        import pandas  # noqa: F401
+        import yfinance  # noqa: F401
+    except Exception:  # pragma: no cover - warm-up is best effort
+        pass
+
+
+def start_market_data_warm_up() -> threading.Thread | None:
+    """Warm the market-data stack on a daemon thread unless disabled."""
+    if os.environ.get("KABUCOUNT_WARM_MARKET_DATA", "1").strip().lower() in {"0", "false", "no"}:
+        return None
+    thread = threading.Thread(
+        target=warm_up_market_data,
+        name="kabumemo-market-data-warm-up",
+        daemon=True,
+    )
+    thread.start()
+    return thread
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import os
 from datetime import date
-from typing import Iterable
-
-import pandas as pd
-import yfinance as yf
+from typing import Callable, Iterable
 
 from ..models.schemas import Currency, Market, QuoteRecord, QuoteSnapshot, Transaction
+from ..storage.async_repository import AsyncLocalDataRepository
 from ..storage.repository import LocalDataRepository
+from .provider import ProviderBusyError, provider_gate
+
+# Seconds between background quote refreshes; 0 leaves refreshing to clients.
+QUOTE_REFRESH_SECONDS = float(os.environ.get("KABUCOUNT_QUOTE_REFRESH_SECONDS", "0"))
 
 
 def _symbol_key(transaction: Transaction) -> str:
@@ -33,6 +37,10 @@ def _collect_symbols(transactions: Iterable[Transaction]) -> list[tuple[str, Mar
 def _fetch_prices(symbols: list[tuple[str, Market]]) -> list[QuoteRecord]:
     if not symbols:
         return []
+    # pandas/yfinance are imported on first use to keep API start-up light.
+    import pandas as pd
+    import yfinance as yf
+
     tickers = " ".join(symbol for symbol, _ in symbols)
     data = yf.download(tickers=tickers, period="1d", interval="1d", group_by="ticker", progress=False)
     if data is None or (isinstance(data, pd.DataFrame) and data.empty):
@@ -66,14 +74,74 @@ def _fetch_prices(symbols: list[tuple[str, Market]]) -> list[QuoteRecord]:
     return records
 
 
-def refresh_quotes_if_needed(repo: LocalDataRepository, force: bool = False) -> QuoteSnapshot:
-    existing = repo.list_quotes()
+def _current_snapshot(existing: list[QuoteRecord], force: bool) -> QuoteSnapshot | None:
     today = date.today()
     if existing and not force and all(record.as_of == today for record in existing):
         return QuoteSnapshot(as_of=today, records=existing)
+    return None
+
+
+def _previous_snapshot(existing: list[QuoteRecord]) -> QuoteSnapshot:
+    as_of = existing[0].as_of if existing else date.today()
+    return QuoteSnapshot(as_of=as_of, records=existing)
+
+
+def refresh_quotes_if_needed(repo: LocalDataRepository, force: bool = False) -> QuoteSnapshot:
+    existing = repo.list_quotes()
+    current = _current_snapshot(existing, force)
+    if current is not None:
+        return current
 
     transactions = repo.list_transactions()
     symbols = _collect_symbols(transactions)
-    records = _fetch_prices(symbols)
+    key = ("quotes", tuple(symbols))
+    try:
+        records = provider_gate.call(key, lambda: _fetch_prices(symbols))
+    except ProviderBusyError:
+        # Keep serving the previous snapshot instead of holding the worker thread.
+        return _previous_snapshot(existing)
     repo.replace_quotes(records)
-    return QuoteSnapshot(as_of=today, records=records)
+    return QuoteSnapshot(as_of=date.today(), records=records)
+
+
+async def refresh_quotes_if_needed_async(
+    repo: AsyncLocalDataRepository, force: bool = False
+) -> QuoteSnapshot:
+    """Async variant of :func:`refresh_quotes_if_needed`.
+
+    Storage calls run on the storage pool and the download is awaited through
+    the provider gate, so no thread waits on yfinance on the caller's behalf.
+    """
+    existing = await repo.list_quotes()
+    current = _current_snapshot(existing, force)
+    if current is not None:
+        return current
+
+    transactions = await repo.list_transactions()
+    symbols = _collect_symbols(transactions)
+    key = ("quotes", tuple(symbols))
+    try:
+        records = await provider_gate.acall(key, lambda: _fetch_prices(symbols))
+    except ProviderBusyError:
+        return _previous_snapshot(existing)
+    await repo.replace_quotes(records)
+    return QuoteSnapshot(as_of=date.today(), records=records)
+
+
+async def run_quote_scheduler(
+    get_repository: Callable[[], LocalDataRepository], interval: float
+) -> None:
+    """Force a quote refresh every ``interval`` seconds until cancelled.
+
+    Writes go through the repository, so live subscribers see new prices as
+    regular change events. ``get_repository`` is resolved on every tick so a
+    swapped repository is picked up.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_quotes_if_needed_async(
+                AsyncLocalDataRepository(get_repository()), force=True
+            )
+        except Exception as exc:  # keep the scheduler alive across provider errors
+            print(f"[Quotes] Scheduled refresh failed: {exc}")
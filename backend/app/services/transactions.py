@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from ..models.schemas import (
+    TaxStatus,
+    Transaction,
+    TransactionBase,
+    TransactionCreate,
+    TransactionUpdate,
+)
+from ..storage.repository import LocalDataRepository
+
+_EPSILON = 1e-9
+
+
+def _check_trade(
+    repo: LocalDataRepository, payload: TransactionBase, exclude_id: str | None = None
+) -> None:
+    if payload.funding_group not in {group.name for group in repo.list_funding_groups()}:
+        raise ValueError("Funding group not found")
+    if payload.quantity < 0:
+        available_quantity = sum(
+            tx.quantity
+            for tx in repo.list_transactions()
+            if tx.id != exclude_id
+            and tx.symbol == payload.symbol
+            and tx.market == payload.market
+            and tx.cash_currency == payload.cash_currency
+        )
+        if available_quantity + payload.quantity < -_EPSILON:
+            raise ValueError("Insufficient position to complete sell order")
+
+
+def create_transaction(repo: LocalDataRepository, payload: TransactionCreate) -> Transaction:
+    """Validate a new trade against the journal and store it.
+
+    The check and the write run in one unit of work, so a concurrent write
+    cannot slip in between them.
+    """
+    with repo.unit_of_work():
+        _check_trade(repo, payload)
+        return repo.add_transaction(payload)
+
+
+def update_transaction(
+    repo: LocalDataRepository, transaction_id: str, payload: TransactionUpdate
+) -> Transaction:
+    """Replace a trade after the same checks as :func:`create_transaction`.
+
+    Raises ``ValueError`` (``"... not found"``) if the trade does not exist.
+    """
+    with repo.unit_of_work():
+        repo.get_transaction(transaction_id)
+        _check_trade(repo, payload, exclude_id=transaction_id)
+        if payload.taxed == TaxStatus.NO and any(
+            item.transaction_id == transaction_id for item in repo.list_tax_settlements()
+        ):
+            raise ValueError("Cannot mark transaction as untaxed while a tax settlement exists")
+        return repo.update_transaction(Transaction(id=transaction_id, **payload.model_dump()))
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from .api.caching import etag_matches
+from .middleware import negotiate_encoding
+
+# Sibling suffix written by ``frontend/scripts/precompress.mjs`` per encoding.
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Vite fingerprints everything under /assets, so a URL never changes content.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Serve ``name.br`` / ``name.gz`` siblings generated at build time.
+
+    The compressed file is chosen from ``Accept-Encoding`` and sent with the
+    original media type; when no sibling exists the plain file is served and
+    left to :class:`~app.middleware.CompressionMiddleware`.
+    """
+
+    def __init__(self, *args, cache_control: str | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await self._get_response(path, scope)
+        if self.cache_control and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.cache_control
+        return response
+
+    async def _get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            encoding = negotiate_encoding(
+                Headers(scope=scope).get("accept-encoding"), tuple(PRECOMPRESSED_SUFFIXES)
+            )
+            if encoding is not None:
+                response = await self._precompressed_response(path, encoding, scope)
+                if response is not None:
+                    return response
+        return await super().get_response(path, scope)
+
+    async def _precompressed_response(
+        self, path: str, encoding: str, scope: Scope
+    ) -> Response | None:
+        try:
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, path + PRECOMPRESSED_SUFFIXES[encoding]
+            )
+        except OSError:
+            return None
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        original = os.fspath(full_path)[: -len(PRECOMPRESSED_SUFFIXES[encoding])]
+        response = FileResponse(
+            full_path,
+            stat_result=stat_result,
+            media_type=mimetypes.guess_type(original)[0] or "text/plain",
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+@dataclass(frozen=True)
+class _ShellVariant:
+    body: bytes
+    etag: str
+
+
+class SpaShell:
+    """In-memory index of a built ``dist`` directory.
+
+    The file list is captured once at start-up and ``index.html`` (plus any
+    precompressed siblings) is held in memory, so client-side routes are
+    answered without touching the filesystem. Rebuilding the frontend needs a
+    server restart to be picked up.
+    """
+
+    def __init__(self, dist_dir: Path) -> None:
+        self.dist_dir = dist_dir
+        self.files: dict[str, tuple[Path, os.stat_result]] = {}
+        for root, _, names in os.walk(dist_dir):
+            for name in names:
+                path = Path(root, name)
+                self.files[path.relative_to(dist_dir).as_posix()] = (path, path.stat())
+
+        index_body = (dist_dir / "index.html").read_bytes()
+        identity_etag = f'"{hashlib.sha1(index_body).hexdigest()}"'
+        self._index: dict[str | None, _ShellVariant] = {
+            None: _ShellVariant(index_body, identity_etag)
+        }
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            entry = self.files.get("index.html" + suffix)
+            if entry is not None:
+                self._index[encoding] = _ShellVariant(
+                    entry[0].read_bytes(), f'W/{identity_etag}'
+                )
+
+    def index_response(self, request_headers: Headers) -> Response:
+        encoding = negotiate_encoding(
+            request_headers.get("accept-encoding"),
+            tuple(encoding for encoding in PRECOMPRESSED_SUFFIXES if encoding in self._index),
+        )
+        variant = self._index[encoding]
+        headers = {"ETag": variant.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request_headers.get("if-none-match"), self._index[None].etag):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(variant.body, media_type="text/html", headers=headers)
+
+    def response(self, path: str, request_headers: Headers) -> Response:
+        """Serve a top-level dist file (favicon, manifest, ...) or fall back to the shell."""
+        entry = self.files.get(path)
+        if entry is None or path == "index.html":
+            return self.index_response(request_headers)
+        file_path, stat_result = entry
+        return FileResponse(file_path, stat_result=stat_result)
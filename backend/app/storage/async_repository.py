@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import functools
+import os
+from typing import Any, Callable, TypeVar
+
+import anyio
+
+from .repository import LocalDataRepository
+
+T = TypeVar("T")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(int(os.environ.get(name, default)), 1)
+    except ValueError:
+        return default
+
+
+# Worker threads reserved for JSON/SQLite access. Kept separate from the
+# default pool so slow market-data calls can never starve storage requests.
+STORAGE_CONCURRENCY = _env_int("KABUCOUNT_STORAGE_CONCURRENCY", 8)
+
+_storage_limiter: anyio.CapacityLimiter | None = None
+
+
+def storage_limiter() -> anyio.CapacityLimiter:
+    global _storage_limiter
+    if _storage_limiter is None:
+        _storage_limiter = anyio.CapacityLimiter(STORAGE_CONCURRENCY)
+    return _storage_limiter
+
+
+async def run_storage(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking storage work on the storage pool and await its result."""
+    return await anyio.to_thread.run_sync(
+        functools.partial(func, *args, **kwargs), limiter=storage_limiter()
+    )
+
+
+class AsyncLocalDataRepository:
+    """Awaitable facade over :class:`LocalDataRepository`.
+
+    Every public repository method is exposed as a coroutine with the same
+    signature; the blocking file and SQLite work runs on the storage pool so
+    the event loop stays free while it waits. Use :meth:`run` for services
+    that need several repository calls in a row.
+    """
+
+    def __init__(self, repository: LocalDataRepository) -> None:
+        self.sync = repository
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        attribute = getattr(self.sync, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await run_storage(attribute, *args, **kwargs)
+
+        return call
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``func(repository, *args, **kwargs)`` on the storage pool."""
+        return await run_storage(func, self.sync, *args, **kwargs)
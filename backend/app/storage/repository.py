@@ -1,10 +1,16 @@
 from __future__ import annotations
 
-import json
+import base64
+import binascii
+import functools
+import hashlib
 import os
-from datetime import date
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
 from pathlib import Path
-from typing import Callable, Iterable, List, Sequence, TypeVar
+from types import GenericAlias
+from typing import Any, Callable, Iterable, Iterator, List, Sequence, TypeVar, cast
 from uuid import uuid4
 
 from ..models.schemas import (
@@ -20,11 +26,58 @@ from ..models.schemas import (
     TaxStatus,
     Transaction,
     TransactionCreate,
+    TransactionPage,
+    TransactionQuery,
 )
+from .. import metrics
+from ..serialization import dump_json, loads
 from .sqlite_storage import SQLiteStorage
 
 
 T = TypeVar("T")
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Fields identifying a record in the change log, per collection.
+RECORD_KEYS: dict[str, tuple[str, ...]] = {
+    "transactions": ("id",),
+    "funding_groups": ("name",),
+    "tax_settlements": ("id",),
+    "capital_adjustments": ("id",),
+    "fx_exchanges": ("id",),
+    "quotes": ("symbol", "market"),
+}
+
+
+def encode_transaction_cursor(transaction: Transaction) -> str:
+    """Opaque keyset cursor pointing just after ``transaction``."""
+    raw = f"{transaction.trade_date.isoformat()}|{transaction.id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_transaction_cursor(cursor: str) -> tuple[date, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        trade_date, transaction_id = (
+            base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|", 1)
+        )
+        return date.fromisoformat(trade_date), transaction_id
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError("Invalid transaction cursor") from exc
+
+
+def _serialized(method: F) -> F:
+    """Run a read-modify-write repository method as its own unit of work.
+
+    Its reads then happen under the write lock too, so two concurrent writers
+    cannot both start from the same snapshot and drop each other's change.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: LocalDataRepository, *args: Any, **kwargs: Any) -> Any:
+        with self.unit_of_work():
+            return method(self, *args, **kwargs)
+
+    return cast(F, wrapper)
 
 
 class LocalDataRepository:
@@ -84,6 +137,24 @@ class LocalDataRepository:
             if not path.exists():
                 path.write_text("[]", encoding="utf-8")
 
+        self._collection_paths = {
+            "transactions": self._transactions_path,
+            "funding_groups": self._funding_groups_path,
+            "tax_settlements": self._tax_settlements_path,
+            "capital_adjustments": self._capital_adjustments_path,
+            "fx_exchanges": self._fx_exchanges_path,
+            "quotes": self._quotes_path,
+        }
+        self._collection_names = {path: name for name, path in self._collection_paths.items()}
+        # Bumped on every write so revisions change even when two writes land
+        # within the filesystem's mtime granularity with identical sizes.
+        self._write_counts: dict[Path, int] = {}
+        self._write_counts_lock = threading.Lock()
+        self._change_listeners: list[Callable[[str], None]] = []
+        # Serializes writes; a unit of work holds it from first read to commit.
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+
         self.sqlite = SQLiteStorage(sqlite_base / "kabumemo.db")
         if not self.sqlite.has_data():
             self._sync_sqlite_from_files()
@@ -110,34 +181,177 @@ class LocalDataRepository:
     def sqlite_has_data(self) -> bool:
         return self.sqlite.has_data()
 
+    def data_revision(self, *collections: str) -> str:
+        """Fingerprint of the named JSON collections, cheap enough to check per request.
+
+        Built from file metadata plus the in-process write counter, so it also
+        changes when a file is edited outside the API.
+        """
+        digest = hashlib.sha1()
+        for name in collections:
+            path = self._collection_paths[name]
+            try:
+                stat = path.stat()
+                fingerprint = f"{stat.st_mtime_ns}:{stat.st_size}"
+            except FileNotFoundError:
+                fingerprint = "missing"
+            digest.update(f"{name}={fingerprint}:{self._write_counts.get(path, 0)};".encode())
+        return digest.hexdigest()
+
+    def add_change_listener(self, listener: Callable[[str], None]) -> None:
+        """Call ``listener(collection)`` after every successful write.
+
+        Listeners run on the writing thread and must return quickly.
+        """
+        if listener not in self._change_listeners:
+            self._change_listeners.append(listener)
+
+    def remove_change_listener(self, listener: Callable[[str], None]) -> None:
+        if listener in self._change_listeners:
+            self._change_listeners.remove(listener)
+
+    def _notify_change(self, path: Path) -> None:
+        name = self._collection_names.get(path)
+        if name is None:
+            return
+        for listener in list(self._change_listeners):
+            try:
+                listener(name)
+            except Exception:  # pragma: no cover - a listener must not fail the write
+                pass
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """Group several repository calls into one atomic, serialized commit.
+
+        Writes inside the block are staged per collection (later writes to the
+        same collection replace earlier ones) and reads see the staged state.
+        On a clean exit every touched collection is written once; if the block
+        raises, nothing is written. The write lock is held for the whole
+        block, and every read-modify-write method of the repository runs as
+        its own unit, so no other write can interleave with the block's reads.
+        Nested blocks on the same thread join the outer one.
+        """
+        if getattr(self._local, "pending", None) is not None:
+            yield
+            return
+        with self._write_lock:
+            self._local.pending = {}
+            try:
+                yield
+            except BaseException:
+                self._local.pending = None
+                raise
+            pending, self._local.pending = self._local.pending, None
+            self._commit(pending)
+
+    def _commit(self, pending: dict[Path, tuple]) -> None:
+        applied: list[tuple[Path, str, type, Callable]] = []
+        try:
+            for path, (items, content, model, mirror) in pending.items():
+                previous_content = self._apply_write(path, items, content, model, mirror)
+                applied.append((path, previous_content, model, mirror))
+        except Exception:
+            # Put back the collections already written so the unit stays atomic.
+            for path, previous_content, model, mirror in reversed(applied):
+                try:
+                    restore_items = [model(**entry) for entry in loads(previous_content or "[]")]
+                    self._apply_write(path, restore_items, previous_content, model, mirror)
+                except Exception:
+                    pass
+            raise
+
+    def _read_collection(self, path: Path) -> str:
+        pending = getattr(self._local, "pending", None)
+        if pending is not None and path in pending:
+            return pending[path][1]
+        label = self._collection_names.get(path, path.stem)
+        with metrics.repository_read_duration.time(label):
+            content = path.read_text(encoding="utf-8")
+        metrics.repository_read_bytes.inc(label, amount=len(content))
+        return content
+
     def _write_with_mirror(
         self,
         path: Path,
         records: Iterable[T],
-        serializer: Callable[[T], dict],
+        model: type[T],
         mirror: Callable[[Sequence[T]], None],
-        restore_factory: Callable[[dict], T],
     ) -> None:
         items = list(records)
-        serialized = [serializer(item) for item in items]
+        # One serializer pass over the whole list; same layout as
+        # json.dumps(indent=2) of the per-item dumps. ``GenericAlias`` spells
+        # ``list[model]`` for a model only known at runtime.
+        content = dump_json(GenericAlias(list, (model,)), items, indent=2).decode("utf-8")
+        pending = getattr(self._local, "pending", None)
+        if pending is not None:
+            pending[path] = (items, content, model, mirror)
+            return
+        with self._write_lock:
+            self._apply_write(path, items, content, model, mirror)
+
+    def _apply_write(
+        self,
+        path: Path,
+        items: Sequence[T],
+        content: str,
+        model: type[T],
+        mirror: Callable[[Sequence[T]], None],
+    ) -> str:
+        """Write ``content`` and mirror ``items``; return the replaced content."""
         previous_content = path.read_text(encoding="utf-8") if path.exists() else "[]"
+        name = self._collection_names.get(path)
+        label = name or path.stem
         try:
-            mirror(items)
-            path.write_text(
-                json.dumps(serialized, ensure_ascii=False, indent=2), encoding="utf-8"
-            )
+            with metrics.repository_write_duration.time(label):
+                mirror(items)
+                path.write_text(content, encoding="utf-8")
+            metrics.repository_write_bytes.inc(label, amount=len(content))
+            with self._write_counts_lock:
+                self._write_counts[path] = self._write_counts.get(path, 0) + 1
         except Exception:
             try:
-                payload = json.loads(previous_content or "[]")
-                restore_items = [restore_factory(entry) for entry in payload]
+                payload = loads(previous_content or "[]")
+                restore_items = [model(**entry) for entry in payload]
                 mirror(restore_items)
             except Exception:
                 pass
             raise
+        if name is not None:
+            self._log_changes(name, previous_content, content)
+        self._notify_change(path)
+        return previous_content
+
+    def _keyed_entries(self, collection: str, content: str) -> dict[str, dict]:
+        fields = RECORD_KEYS[collection]
+        return {
+            ":".join(str(entry[field]) for field in fields): entry
+            for entry in loads(content or "[]")
+        }
+
+    def _log_changes(self, collection: str, previous_content: str, content: str) -> None:
+        """Record per-record inserts, updates and deletes of a collection rewrite."""
+        before = self._keyed_entries(collection, previous_content)
+        after = self._keyed_entries(collection, content)
+        changes = [("delete", key) for key in before if key not in after]
+        for key, entry in after.items():
+            previous = before.get(key)
+            if previous is None:
+                changes.append(("insert", key))
+            elif previous != entry:
+                changes.append(("update", key))
+        self.sqlite.record_changes(
+            collection, changes, datetime.now(timezone.utc).isoformat(timespec="seconds")
+        )
+
+    def load_keyed_entries(self, collection: str) -> dict[str, dict]:
+        """Current records of ``collection`` as stored, keyed like the change log."""
+        path = self._collection_paths[collection]
+        return self._keyed_entries(collection, path.read_text(encoding="utf-8"))
 
     # Transactions -----------------------------------------------------------------
     def list_transactions(self) -> List[Transaction]:
-        payload = json.loads(self._transactions_path.read_text(encoding="utf-8") or "[]")
+        payload = loads(self._read_collection(self._transactions_path) or "[]")
         records: list[Transaction] = []
         for item in payload:
             data = dict(item)
@@ -153,12 +367,30 @@ class LocalDataRepository:
     def list_transactions_from_sqlite(self) -> List[Transaction]:
         return self.sqlite.load_transactions()
 
+    def query_transactions(self, query: TransactionQuery) -> List[Transaction]:
+        return self.sqlite.query_transactions(query)
+
+    def page_transactions(
+        self,
+        query: TransactionQuery | None = None,
+        *,
+        cursor: str | None = None,
+        limit: int = 100,
+    ) -> TransactionPage:
+        after = decode_transaction_cursor(cursor) if cursor else None
+        # One extra row tells whether another page exists without a COUNT(*).
+        rows = self.sqlite.query_transactions(query, after=after, limit=limit + 1)
+        items = rows[:limit]
+        next_cursor = encode_transaction_cursor(items[-1]) if len(rows) > limit else None
+        return TransactionPage(items=items, next_cursor=next_cursor)
+
     def get_transaction(self, transaction_id: str) -> Transaction:
         for transaction in self.list_transactions():
             if transaction.id == transaction_id:
                 return transaction
         raise ValueError(f"Transaction {transaction_id} not found")
 
+    @_serialized
     def add_transaction(self, transaction: TransactionCreate) -> Transaction:
         transactions = self.list_transactions()
         new_transaction = Transaction(id=str(uuid4()), **transaction.model_dump())
@@ -166,6 +398,15 @@ class LocalDataRepository:
         self._write_transactions(transactions)
         return new_transaction
 
+    @_serialized
+    def add_transactions(self, payloads: Iterable[TransactionCreate]) -> list[Transaction]:
+        """Append many transactions with a single JSON/SQLite write."""
+        created = [Transaction(id=str(uuid4()), **payload.model_dump()) for payload in payloads]
+        if created:
+            self._write_transactions([*self.list_transactions(), *created])
+        return created
+
+    @_serialized
     def update_transaction(self, updated: Transaction) -> Transaction:
         transactions = self.list_transactions()
         for index, item in enumerate(transactions):
@@ -175,6 +416,7 @@ class LocalDataRepository:
                 return updated
         raise ValueError(f"Transaction {updated.id} not found")
 
+    @_serialized
     def delete_transaction(self, transaction_id: str) -> None:
         transactions = self.list_transactions()
         remaining_transactions = [tx for tx in transactions if tx.id != transaction_id]
@@ -191,14 +433,13 @@ class LocalDataRepository:
         self._write_with_mirror(
             self._transactions_path,
             transactions,
-            lambda item: item.model_dump(mode="json"),
+            Transaction,
             self.sqlite.replace_transactions,
-            lambda payload: Transaction(**payload),
         )
 
     # Funding groups ----------------------------------------------------------------
     def list_funding_groups(self) -> List[FundingGroup]:
-        payload = json.loads(self._funding_groups_path.read_text(encoding="utf-8") or "[]")
+        payload = loads(self._read_collection(self._funding_groups_path) or "[]")
         return [FundingGroup(**item) for item in payload]
 
     def list_funding_groups_from_sqlite(self) -> List[FundingGroup]:
@@ -210,6 +451,7 @@ class LocalDataRepository:
                 return group
         raise ValueError(f"Funding group {name} not found")
 
+    @_serialized
     def upsert_funding_group(self, group: FundingGroup) -> FundingGroup:
         groups = self.list_funding_groups()
         remaining = [g for g in groups if g.name != group.name]
@@ -217,6 +459,7 @@ class LocalDataRepository:
         self._write_funding_groups(remaining)
         return group
 
+    @_serialized
     def patch_funding_group(self, name: str, patch: FundingGroupUpdate) -> FundingGroup:
         groups = self.list_funding_groups()
         for index, group in enumerate(groups):
@@ -227,6 +470,7 @@ class LocalDataRepository:
                 return updated
         raise ValueError(f"Funding group {name} not found")
 
+    @_serialized
     def delete_funding_group(self, name: str) -> None:
         groups = self.list_funding_groups()
         filtered = [g for g in groups if g.name != name]
@@ -238,12 +482,12 @@ class LocalDataRepository:
         self._write_with_mirror(
             self._funding_groups_path,
             groups,
-            lambda item: item.model_dump(mode="json"),
+            FundingGroup,
             self.sqlite.replace_funding_groups,
-            lambda payload: FundingGroup(**payload),
         )
 
     # Utility -----------------------------------------------------------------------
+    @_serialized
     def ensure_default_groups(self) -> None:
         if self.list_funding_groups():
             return
@@ -253,6 +497,7 @@ class LocalDataRepository:
         ]
         self._write_funding_groups(defaults)
 
+    @_serialized
     def set_transaction_tax_status(self, transaction_id: str, status: TaxStatus) -> Transaction:
         transactions = self.list_transactions()
         for index, item in enumerate(transactions):
@@ -271,7 +516,7 @@ class LocalDataRepository:
 
     # Tax settlements ---------------------------------------------------------------
     def list_tax_settlements(self) -> list[TaxSettlementRecord]:
-        payload = json.loads(self._tax_settlements_path.read_text(encoding="utf-8") or "[]")
+        payload = loads(self._read_collection(self._tax_settlements_path) or "[]")
         records: list[TaxSettlementRecord] = []
         changed = False
         for item in payload:
@@ -359,12 +604,14 @@ class LocalDataRepository:
                 return record
         raise ValueError(f"Tax settlement {settlement_id} not found")
 
+    @_serialized
     def add_tax_settlement(self, settlement: TaxSettlementRecord) -> TaxSettlementRecord:
         settlements = self.list_tax_settlements()
         settlements.append(settlement)
         self._write_tax_settlements(settlements)
         return settlement
 
+    @_serialized
     def update_tax_settlement(
         self, settlement_id: str, updated: TaxSettlementRecord
     ) -> TaxSettlementRecord:
@@ -376,6 +623,7 @@ class LocalDataRepository:
                 return updated
         raise ValueError(f"Tax settlement {settlement_id} not found")
 
+    @_serialized
     def delete_tax_settlement(self, settlement_id: str) -> None:
         settlements = self.list_tax_settlements()
         updated = [item for item in settlements if item.id != settlement_id]
@@ -387,14 +635,13 @@ class LocalDataRepository:
         self._write_with_mirror(
             self._tax_settlements_path,
             settlements,
-            lambda item: item.model_dump(mode="json"),
+            TaxSettlementRecord,
             self.sqlite.replace_tax_settlements,
-            lambda payload: TaxSettlementRecord(**payload),
         )
 
     # Capital adjustments ---------------------------------------------------------
     def list_capital_adjustments(self) -> list[FundingCapitalAdjustment]:
-        payload = json.loads(self._capital_adjustments_path.read_text(encoding="utf-8") or "[]")
+        payload = loads(self._read_collection(self._capital_adjustments_path) or "[]")
         records = [FundingCapitalAdjustment(**item) for item in payload]
         return sorted(records, key=lambda item: (item.effective_date, item.id))
 
@@ -404,6 +651,7 @@ class LocalDataRepository:
     def list_capital_adjustments_for_group(self, name: str) -> list[FundingCapitalAdjustment]:
         return [item for item in self.list_capital_adjustments() if item.funding_group == name]
 
+    @_serialized
     def add_capital_adjustment(
         self, payload: FundingCapitalAdjustmentCreate
     ) -> FundingCapitalAdjustment:
@@ -419,14 +667,13 @@ class LocalDataRepository:
         self._write_with_mirror(
             self._capital_adjustments_path,
             adjustments,
-            lambda item: item.model_dump(mode="json"),
+            FundingCapitalAdjustment,
             self.sqlite.replace_capital_adjustments,
-            lambda payload: FundingCapitalAdjustment(**payload),
         )
 
     # FX exchanges ----------------------------------------------------------------
     def list_fx_exchanges(self) -> list[FxExchangeRecord]:
-        payload = json.loads(self._fx_exchanges_path.read_text(encoding="utf-8") or "[]")
+        payload = loads(self._read_collection(self._fx_exchanges_path) or "[]")
         records: list[FxExchangeRecord] = []
         for item in payload:
             data = dict(item)
@@ -445,6 +692,7 @@ class LocalDataRepository:
     def list_fx_exchanges_from_sqlite(self) -> list[FxExchangeRecord]:
         return self.sqlite.load_fx_exchanges()
 
+    @_serialized
     def add_fx_exchange(self, payload: FxExchangeCreate) -> FxExchangeRecord:
         record = FxExchangeRecord(id=str(uuid4()), **payload.model_dump())
         records = self.list_fx_exchanges()
@@ -452,6 +700,7 @@ class LocalDataRepository:
         self._write_fx_exchanges(records)
         return record
 
+    @_serialized
     def delete_fx_exchange(self, exchange_id: str) -> None:
         records = self.list_fx_exchanges()
         updated = [item for item in records if item.id != exchange_id]
@@ -463,14 +712,13 @@ class LocalDataRepository:
         self._write_with_mirror(
             self._fx_exchanges_path,
             exchanges,
-            lambda item: item.model_dump(mode="json"),
+            FxExchangeRecord,
             self.sqlite.replace_fx_exchanges,
-            lambda payload: FxExchangeRecord(**payload),
         )
 
     # Quotes ----------------------------------------------------------------
     def list_quotes(self) -> list[QuoteRecord]:
-        payload = json.loads(self._quotes_path.read_text(encoding="utf-8") or "[]")
+        payload = loads(self._read_collection(self._quotes_path) or "[]")
         records = [QuoteRecord(**item) for item in payload]
         return records
 
@@ -481,7 +729,6 @@ class LocalDataRepository:
         self._write_with_mirror(
             self._quotes_path,
             quotes,
-            lambda item: item.model_dump(mode="json"),
+            QuoteRecord,
             self.sqlite.replace_quotes,
-            lambda payload: QuoteRecord(**payload),
         )
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 import sqlite3
 from contextlib import contextmanager
+from datetime import date
 from pathlib import Path
 from typing import Iterable, Iterator, Sequence
 
+from .. import metrics
 from ..models.schemas import (
     FxExchangeRecord,
     FundingCapitalAdjustment,
@@ -12,9 +14,11 @@ from ..models.schemas import (
     QuoteRecord,
     TaxSettlementRecord,
     Transaction,
+    TransactionQuery,
 )
 
 
+@metrics.timed_methods(metrics.sqlite_duration)
 class SQLiteStorage:
     """Lightweight SQLite persistence for Kabumemo data."""
 
@@ -61,6 +65,12 @@ class SQLiteStorage:
         );
         CREATE INDEX IF NOT EXISTS idx_transactions_trade_date
             ON transactions (trade_date, symbol);
+        CREATE INDEX IF NOT EXISTS idx_transactions_order
+            ON transactions (trade_date, id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_symbol
+            ON transactions (symbol COLLATE NOCASE, market, trade_date, id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_funding_group
+            ON transactions (funding_group, trade_date, id);
 
         CREATE TABLE IF NOT EXISTS funding_groups (
             name TEXT PRIMARY KEY,
@@ -77,6 +87,8 @@ class SQLiteStorage:
             currency TEXT NOT NULL,
             exchange_rate REAL,
             jpy_equivalent REAL,
+            balance_exchange_rate REAL,
+            balance_usd_required REAL,
             recorded_at TEXT NOT NULL,
             FOREIGN KEY (transaction_id) REFERENCES transactions(id)
                 ON DELETE CASCADE
@@ -124,10 +136,61 @@ class SQLiteStorage:
         );
         CREATE INDEX IF NOT EXISTS idx_quotes_as_of
             ON quotes (as_of);
+
+        CREATE TABLE IF NOT EXISTS price_history (
+            symbol TEXT NOT NULL,
+            market TEXT NOT NULL,
+            date TEXT NOT NULL,
+            close REAL NOT NULL,
+            PRIMARY KEY (symbol, market, date)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS price_history_coverage (
+            symbol TEXT NOT NULL,
+            market TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            fetched_on TEXT NOT NULL,
+            PRIMARY KEY (symbol, market)
+        );
+
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            collection TEXT NOT NULL,
+            record_id TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_record
+            ON change_log (collection, record_id);
+
+        CREATE TABLE IF NOT EXISTS change_log_clients (
+            client_id TEXT PRIMARY KEY,
+            acked_seq INTEGER NOT NULL,
+            seen_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            status_code INTEGER,
+            body BLOB,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires
+            ON idempotency_keys (expires_at);
+        CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created
+            ON idempotency_keys (created_at);
+
+        CREATE TABLE IF NOT EXISTS change_log_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
         """
         with self._connect() as connection:
             connection.executescript(schema)
             self._migrate_transactions_schema(connection)
+            self._migrate_tax_settlements_schema(connection)
 
     def _migrate_transactions_schema(self, connection: sqlite3.Connection) -> None:
         columns = {
@@ -143,6 +206,16 @@ class SQLiteStorage:
         if "sell_currency" not in columns:
             connection.execute("ALTER TABLE transactions ADD COLUMN sell_currency TEXT;")
 
+    def _migrate_tax_settlements_schema(self, connection: sqlite3.Connection) -> None:
+        columns = {
+            row["name"]
+            for row in connection.execute("PRAGMA table_info(tax_settlements);").fetchall()
+        }
+        if "balance_exchange_rate" not in columns:
+            connection.execute("ALTER TABLE tax_settlements ADD COLUMN balance_exchange_rate REAL;")
+        if "balance_usd_required" not in columns:
+            connection.execute("ALTER TABLE tax_settlements ADD COLUMN balance_usd_required REAL;")
+
     # ------------------------------------------------------------------
     # Bulk mirror helpers
     def replace_transactions(self, transactions: Iterable[Transaction]) -> None:
@@ -210,6 +283,8 @@ class SQLiteStorage:
                 getattr(settlement.currency, "value", settlement.currency),
                 settlement.exchange_rate,
                 settlement.jpy_equivalent,
+                settlement.balance_exchange_rate,
+                settlement.balance_usd_required,
                 settlement.recorded_at.isoformat(),
             )
             for settlement in settlements
@@ -221,8 +296,9 @@ class SQLiteStorage:
                     """
                     INSERT INTO tax_settlements (
                         id, transaction_id, funding_group, amount,
-                        currency, exchange_rate, jpy_equivalent, recorded_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        currency, exchange_rate, jpy_equivalent,
+                        balance_exchange_rate, balance_usd_required, recorded_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """,
                     rows,
                 )
@@ -301,58 +377,398 @@ class SQLiteStorage:
                     """,
                     rows,
                 )
-    # Read helpers
-    def load_transactions(self) -> list[Transaction]:
+
+    # ------------------------------------------------------------------
+    # Price history store
+    PRICE_HISTORY_CHUNK = 50000
+
+    def upsert_price_history(self, rows: Iterable[tuple[str, str, date, float]]) -> int:
+        """Insert or overwrite ``(symbol, market, date, close)`` rows."""
+        return self.upsert_price_rows(
+            (symbol, getattr(market, "value", market), point_date.isoformat(), float(close))
+            for symbol, market, point_date, close in rows
+        )
+
+    def upsert_price_rows(self, rows: Iterable[tuple[str, str, str, float]]) -> int:
+        """Bulk upsert pre-normalized rows, committing every ``PRICE_HISTORY_CHUNK`` rows."""
+        written = 0
+        chunk: list[tuple[str, str, str, float]] = []
+        with self._connect() as connection:
+            # Price bars can be re-downloaded, so trade fsync per commit for bulk speed.
+            connection.execute("PRAGMA synchronous = NORMAL;")
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= self.PRICE_HISTORY_CHUNK:
+                    written += self._write_price_chunk(connection, chunk)
+                    connection.commit()
+                    chunk = []
+            if chunk:
+                written += self._write_price_chunk(connection, chunk)
+        return written
+
+    @staticmethod
+    def _write_price_chunk(
+        connection: sqlite3.Connection, chunk: Sequence[tuple[str, str, str, float]]
+    ) -> int:
+        connection.executemany(
+            """
+            INSERT INTO price_history (symbol, market, date, close)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (symbol, market, date) DO UPDATE SET close = excluded.close
+            """,
+            chunk,
+        )
+        return len(chunk)
+
+    def load_price_history(self, symbol: str, market: str) -> list[tuple[date, float]]:
         with self._connect() as connection:
             rows = connection.execute(
-                "SELECT id, trade_date, symbol, quantity, gross_amount, funding_group,"
-                " cash_currency, cross_currency, buy_currency, sell_currency, market,"
-                " taxed, memo FROM transactions"
-                " ORDER BY trade_date, id;"
+                "SELECT date, close FROM price_history"
+                " WHERE symbol = ? AND market = ? ORDER BY date;",
+                (symbol, getattr(market, "value", market)),
             ).fetchall()
+        return [(date.fromisoformat(row["date"]), float(row["close"])) for row in rows]
+
+    def get_price_coverage(self, symbol: str, market: str) -> tuple[date, date] | None:
+        """Return ``(start_date, fetched_on)`` recorded for a symbol, if any."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT start_date, fetched_on FROM price_history_coverage"
+                " WHERE symbol = ? AND market = ?;",
+                (symbol, getattr(market, "value", market)),
+            ).fetchone()
+        if row is None:
+            return None
+        return date.fromisoformat(row["start_date"]), date.fromisoformat(row["fetched_on"])
+
+    def set_price_coverage(
+        self, symbol: str, market: str, start_date: date, fetched_on: date
+    ) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                """
+                INSERT INTO price_history_coverage (symbol, market, start_date, fetched_on)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (symbol, market) DO UPDATE SET
+                    start_date = excluded.start_date,
+                    fetched_on = excluded.fetched_on
+                """,
+                (
+                    symbol,
+                    getattr(market, "value", market),
+                    start_date.isoformat(),
+                    fetched_on.isoformat(),
+                ),
+            )
+
+    def extend_price_coverage(self, entries: Iterable[tuple[str, str, date, date]]) -> None:
+        """Widen ``(symbol, market, start_date, fetched_on)`` coverage without shrinking it.
+
+        Coverage is one contiguous range, so an entry that neither overlaps nor
+        touches the stored range leaves it unchanged; recording the union would
+        mark the gap between them as fetched.
+        """
+        rows = [
+            (symbol, getattr(market, "value", market), start.isoformat(), fetched_on.isoformat())
+            for symbol, market, start, fetched_on in entries
+        ]
+        if not rows:
+            return
+        with self._connect() as connection:
+            connection.executemany(
+                """
+                INSERT INTO price_history_coverage (symbol, market, start_date, fetched_on)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (symbol, market) DO UPDATE SET
+                    start_date = MIN(start_date, excluded.start_date),
+                    fetched_on = MAX(fetched_on, excluded.fetched_on)
+                WHERE excluded.start_date <= date(fetched_on, '+1 day')
+                    AND excluded.fetched_on >= date(start_date, '-1 day')
+                """,
+                rows,
+            )
+
+    # Read helpers
+    # Full-table reads, shared by the load_* helpers and the streaming export.
+    SELECTS = {
+        "transactions": (
+            "SELECT id, trade_date, symbol, quantity, gross_amount, funding_group,"
+            " cash_currency, cross_currency, buy_currency, sell_currency, market,"
+            " taxed, memo FROM transactions"
+            " ORDER BY trade_date, id;"
+        ),
+        "funding_groups": (
+            "SELECT name, currency, initial_amount, notes FROM funding_groups ORDER BY name;"
+        ),
+        "tax_settlements": (
+            "SELECT id, transaction_id, funding_group, amount, currency,"
+            " exchange_rate, jpy_equivalent, balance_exchange_rate, balance_usd_required,"
+            " recorded_at FROM tax_settlements ORDER BY recorded_at, id;"
+        ),
+        "capital_adjustments": (
+            "SELECT id, funding_group, amount, effective_date, notes"
+            " FROM capital_adjustments ORDER BY effective_date, id;"
+        ),
+        "fx_exchanges": (
+            "SELECT id, transaction_id, exchange_date, from_currency, to_currency,"
+            " from_amount, to_amount, rate, notes"
+            " FROM fx_exchanges ORDER BY exchange_date, id;"
+        ),
+        "quotes": (
+            "SELECT symbol, market, price, currency, as_of FROM quotes ORDER BY symbol, market;"
+        ),
+    }
+
+    def iter_table(self, table: str, batch_size: int = 500) -> Iterator[list[sqlite3.Row]]:
+        """Yield rows of ``table`` in batches straight from a cursor.
+
+        The connection may be resumed from different threads (as a streaming
+        response does), so it is opened without the same-thread check; the
+        generator is still only ever advanced by one caller at a time.
+        """
+        connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        try:
+            cursor = connection.execute(self.SELECTS[table])
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            connection.close()
+
+    def load_transactions(self) -> list[Transaction]:
+        with self._connect() as connection:
+            rows = connection.execute(self.SELECTS["transactions"]).fetchall()
+        return [Transaction(**dict(row)) for row in rows]
+
+    def query_transactions(
+        self,
+        query: TransactionQuery | None = None,
+        *,
+        after: tuple[date, str] | None = None,
+        limit: int | None = None,
+    ) -> list[Transaction]:
+        """Filtered transactions in ``(trade_date, id)`` order.
+
+        ``after`` is an exclusive keyset position, so paging never rescans
+        earlier rows; every filter maps onto one of the transaction indexes.
+        """
+        clauses: list[str] = []
+        params: list[object] = []
+        if query is not None:
+            if query.symbol:
+                clauses.append("symbol = ? COLLATE NOCASE")
+                params.append(query.symbol.strip())
+            if query.market is not None:
+                clauses.append("market = ?")
+                params.append(query.market.value)
+            if query.funding_group:
+                clauses.append("funding_group = ?")
+                params.append(query.funding_group)
+            if query.taxed is not None:
+                clauses.append("taxed = ?")
+                params.append(query.taxed.value)
+            if query.start is not None:
+                clauses.append("trade_date >= ?")
+                params.append(query.start.isoformat())
+            if query.end is not None:
+                clauses.append("trade_date <= ?")
+                params.append(query.end.isoformat())
+        if after is not None:
+            clauses.append("(trade_date, id) > (?, ?)")
+            params.extend((after[0].isoformat(), after[1]))
+
+        sql = (
+            "SELECT id, trade_date, symbol, quantity, gross_amount, funding_group,"
+            " cash_currency, cross_currency, buy_currency, sell_currency, market,"
+            " taxed, memo FROM transactions"
+        )
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY trade_date, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as connection:
+            rows = connection.execute(sql, params).fetchall()
         return [Transaction(**dict(row)) for row in rows]
 
     def load_funding_groups(self) -> list[FundingGroup]:
         with self._connect() as connection:
-            rows = connection.execute(
-                "SELECT name, currency, initial_amount, notes FROM funding_groups"
-                " ORDER BY name;"
-            ).fetchall()
+            rows = connection.execute(self.SELECTS["funding_groups"]).fetchall()
         return [FundingGroup(**dict(row)) for row in rows]
 
     def load_tax_settlements(self) -> list[TaxSettlementRecord]:
         with self._connect() as connection:
-            rows = connection.execute(
-                "SELECT id, transaction_id, funding_group, amount, currency,"
-                " exchange_rate, jpy_equivalent, recorded_at"
-                " FROM tax_settlements ORDER BY recorded_at, id;"
-            ).fetchall()
+            rows = connection.execute(self.SELECTS["tax_settlements"]).fetchall()
         return [TaxSettlementRecord(**dict(row)) for row in rows]
 
     def load_capital_adjustments(self) -> list[FundingCapitalAdjustment]:
         with self._connect() as connection:
-            rows = connection.execute(
-                "SELECT id, funding_group, amount, effective_date, notes"
-                " FROM capital_adjustments ORDER BY effective_date, id;"
-            ).fetchall()
+            rows = connection.execute(self.SELECTS["capital_adjustments"]).fetchall()
         return [FundingCapitalAdjustment(**dict(row)) for row in rows]
 
     def load_fx_exchanges(self) -> list[FxExchangeRecord]:
         with self._connect() as connection:
-            rows = connection.execute(
-                "SELECT id, transaction_id, exchange_date, from_currency, to_currency,"
-                " from_amount, to_amount, rate, notes"
-                " FROM fx_exchanges ORDER BY exchange_date, id;"
-            ).fetchall()
+            rows = connection.execute(self.SELECTS["fx_exchanges"]).fetchall()
         return [FxExchangeRecord(**dict(row)) for row in rows]
 
     def load_quotes(self) -> list[QuoteRecord]:
         with self._connect() as connection:
-            rows = connection.execute(
-                "SELECT symbol, market, price, currency, as_of FROM quotes"
-            ).fetchall()
+            rows = connection.execute(self.SELECTS["quotes"]).fetchall()
         return [QuoteRecord(**dict(row)) for row in rows]
 
+    # ------------------------------------------------------------------
+    # Change log
+    #
+    # Only the latest change per record is kept: a client that synced before
+    # it needs the record's current state, not its history. ``horizon`` is
+    # the highest sequence number removed by compaction; clients behind it
+    # must refetch everything.
+    def record_changes(
+        self, collection: str, changes: Sequence[tuple[str, str]], changed_at: str
+    ) -> int | None:
+        """Append ``(op, record_id)`` changes and return the last sequence number."""
+        if not changes:
+            return None
+        with self._connect() as connection:
+            # Delete + insert rather than update so AUTOINCREMENT hands out a
+            # fresh, strictly increasing sequence number.
+            connection.executemany(
+                "DELETE FROM change_log WHERE collection = ? AND record_id = ?;",
+                [(collection, record_id) for _, record_id in changes],
+            )
+            connection.executemany(
+                "INSERT INTO change_log (collection, record_id, op, changed_at)"
+                " VALUES (?, ?, ?, ?);",
+                [(collection, record_id, op, changed_at) for op, record_id in changes],
+            )
+            return connection.execute("SELECT MAX(seq) FROM change_log;").fetchone()[0]
+
+    def latest_change_seq(self) -> int:
+        # sqlite_sequence keeps the highest number ever issued, even after
+        # compaction emptied the log.
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'change_log';"
+            ).fetchone()
+        return row[0] if row else 0
+
+    def change_horizon(self) -> int:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM change_log_meta WHERE key = 'horizon';"
+            ).fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, since: int, limit: int) -> list[sqlite3.Row]:
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT seq, collection, record_id, op, changed_at FROM change_log"
+                " WHERE seq > ? ORDER BY seq LIMIT ?;",
+                (since, limit),
+            ).fetchall()
+
+    def acknowledge_changes(self, client_id: str, seq: int, seen_at: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO change_log_clients (client_id, acked_seq, seen_at)"
+                " VALUES (?, ?, ?)"
+                " ON CONFLICT (client_id) DO UPDATE SET"
+                " acked_seq = MAX(acked_seq, excluded.acked_seq), seen_at = excluded.seen_at;",
+                (client_id, seq, seen_at),
+            )
+
+    def compact_changes(self, expire_before: str) -> int:
+        """Drop entries every known client has acknowledged or that expired.
+
+        Clients not seen since ``expire_before`` are forgotten first, so they
+        no longer hold entries back. Returns the number of removed entries.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM change_log_clients WHERE seen_at < ?;", (expire_before,)
+            )
+            acked = connection.execute(
+                "SELECT MIN(acked_seq), COUNT(*) FROM change_log_clients;"
+            ).fetchone()
+            # Without registered clients only the retention window applies.
+            acked_seq = acked[0] if acked[1] else 0
+            cutoff = connection.execute(
+                "SELECT MAX(seq) FROM change_log WHERE seq <= ? OR changed_at < ?;",
+                (acked_seq, expire_before),
+            ).fetchone()[0]
+            if cutoff is None:
+                return 0
+            removed = connection.execute(
+                "DELETE FROM change_log WHERE seq <= ? OR changed_at < ?;",
+                (acked_seq, expire_before),
+            ).rowcount
+            connection.execute(
+                "INSERT INTO change_log_meta (key, value) VALUES ('horizon', ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value);",
+                (cutoff,),
+            )
+            return removed
+
+    # ------------------------------------------------------------------
+    # Idempotency keys
+    #
+    # A row with a NULL status_code is a request still in flight; its
+    # expires_at is a short lease so a crashed request does not block the key
+    # for the whole TTL.
+    def claim_idempotency_key(
+        self, key: str, fingerprint: str, now: float, lease_until: float
+    ) -> sqlite3.Row | None:
+        """Reserve ``key`` for a new request, or return the row that holds it."""
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?;", (key, now)
+            )
+            claimed = connection.execute(
+                "INSERT OR IGNORE INTO idempotency_keys"
+                " (key, fingerprint, created_at, expires_at) VALUES (?, ?, ?, ?);",
+                (key, fingerprint, now, lease_until),
+            ).rowcount
+            if claimed:
+                return None
+            return connection.execute(
+                "SELECT fingerprint, status_code, body FROM idempotency_keys WHERE key = ?;",
+                (key,),
+            ).fetchone()
+
+    def complete_idempotency_key(
+        self, key: str, status_code: int, body: bytes, expires_at: float
+    ) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE idempotency_keys SET status_code = ?, body = ?, expires_at = ?"
+                " WHERE key = ?;",
+                (status_code, body, expires_at, key),
+            )
+
+    def release_idempotency_key(self, key: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM idempotency_keys WHERE key = ? AND status_code IS NULL;", (key,)
+            )
+
+    def evict_idempotency_keys(self, now: float, max_keys: int) -> int:
+        """Drop expired keys, then the oldest ones beyond ``max_keys``."""
+        with self._connect() as connection:
+            removed = connection.execute(
+                "DELETE FROM idempotency_keys WHERE expires_at <= ?;", (now,)
+            ).rowcount
+            removed += connection.execute(
+                "DELETE FROM idempotency_keys WHERE key IN ("
+                " SELECT key FROM idempotency_keys ORDER BY created_at DESC"
+                " LIMIT -1 OFFSET ?);",
+                (max_keys,),
+            ).rowcount
+        return removed
+
     def has_data(self) -> bool:
         query = "SELECT 1 FROM transactions LIMIT 1;"
         with self._connect() as connection:
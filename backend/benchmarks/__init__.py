@@ -0,0 +1,4 @@
+"""Performance benchmarks over deterministic synthetic portfolios.
+
+Run ``python -m benchmarks`` from ``backend/``; see ``benchmarks/runner.py``.
+"""
@@ -0,0 +1,171 @@
+"""Benchmark cases: storage, analytics and HTTP hot paths.
+
+Each case receives the :class:`BenchContext` of one portfolio size and
+returns the zero-argument callable that is timed.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from app.models.schemas import TransactionQuery
+from app.storage.repository import LocalDataRepository
+
+from .generator import Portfolio, generate_portfolio, write_portfolio
+
+
+@dataclass
+class BenchContext:
+    size: int
+    seed: int
+    data_dir: Path
+    portfolio: Portfolio = field(init=False)
+    repository: LocalDataRepository = field(init=False)
+    _client: Any = field(default=None, init=False)
+    _previous_repository: Any = field(default=None, init=False)
+
+    def __post_init__(self) -> None:
+        self.portfolio = generate_portfolio(self.size, seed=self.seed)
+        write_portfolio(self.portfolio, self.data_dir)
+        self.repository = LocalDataRepository(base_path=self.data_dir)
+
+    @property
+    def client(self) -> Any:
+        """TestClient bound to this portfolio's repository (built on first use)."""
+        if self._client is None:
+            # app.api.routes opens a default repository on import; keep it
+            # away from the real data directory.
+            os.environ.setdefault("KABUCOUNT_DATA_DIR", str(self.data_dir))
+            from fastapi.testclient import TestClient
+
+            from app.api import routes
+            from app.main import app
+
+            self._previous_repository = routes.repository
+            routes.repository = self.repository
+            self._client = TestClient(app)
+        return self._client
+
+    def close(self) -> None:
+        if self._client is not None:
+            from app.api import routes
+
+            routes.repository = self._previous_repository
+            self._client.close()
+            self._client = None
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    prepare: Callable[[BenchContext], Callable[[], object]]
+
+    @property
+    def group(self) -> str:
+        return self.name.split(".", 1)[0]
+
+
+CASES: dict[str, Case] = {}
+
+
+def case(name: str) -> Callable[[Callable[[BenchContext], Callable[[], object]]], Case]:
+    def register(prepare: Callable[[BenchContext], Callable[[], object]]) -> Case:
+        CASES[name] = Case(name, prepare)
+        return CASES[name]
+
+    return register
+
+
+@case("storage.list_transactions")
+def _list_transactions(ctx: BenchContext) -> Callable[[], object]:
+    return ctx.repository.list_transactions
+
+
+@case("storage.list_tax_settlements")
+def _list_tax_settlements(ctx: BenchContext) -> Callable[[], object]:
+    return ctx.repository.list_tax_settlements
+
+
+@case("storage.query_transactions")
+def _query_transactions(ctx: BenchContext) -> Callable[[], object]:
+    symbol = ctx.portfolio.transactions[len(ctx.portfolio.transactions) // 2].symbol
+    query = TransactionQuery(symbol=symbol)
+    return lambda: ctx.repository.query_transactions(query)
+
+
+@case("storage.update_transaction")
+def _update_transaction(ctx: BenchContext) -> Callable[[], object]:
+    # Rewrites the collection file, its SQLite mirror and the change log.
+    original = ctx.repository.list_transactions()[0]
+    state = {"flip": False}
+
+    def run() -> object:
+        state["flip"] = not state["flip"]
+        memo = "benchmark" if state["flip"] else None
+        return ctx.repository.update_transaction(original.model_copy(update={"memo": memo}))
+
+    return run
+
+
+@case("analytics.compute_positions")
+def _compute_positions(ctx: BenchContext) -> Callable[[], object]:
+    from app.services.analytics import compute_positions
+
+    data = ctx.portfolio
+    return lambda: compute_positions(data.transactions, data.fx_exchanges, data.quotes)
+
+
+@case("analytics.compute_fund_snapshots")
+def _compute_fund_snapshots(ctx: BenchContext) -> Callable[[], object]:
+    from app.services.analytics import compute_fund_snapshots
+
+    data = ctx.portfolio
+    return lambda: compute_fund_snapshots(
+        data.transactions,
+        data.funding_groups,
+        data.tax_settlements,
+        data.capital_adjustments,
+        data.fx_exchanges,
+    )
+
+
+@case("analytics.compute_round_trip_yield")
+def _compute_round_trip_yield(ctx: BenchContext) -> Callable[[], object]:
+    from app.services.analytics import compute_round_trip_yield
+
+    data = ctx.portfolio
+    ids = set(data.round_trip_ids)
+    selected = [tx for tx in data.transactions if tx.id in ids]
+    return lambda: compute_round_trip_yield(selected, data.tax_settlements)
+
+
+@case("analytics.build_trade_markers")
+def _build_trade_markers(ctx: BenchContext) -> Callable[[], object]:
+    from app.services.history import build_trade_markers
+
+    data = ctx.portfolio
+    target = data.transactions[len(data.transactions) // 2]
+    return lambda: build_trade_markers(
+        data.transactions, data.fx_exchanges, target.symbol, target.market
+    )
+
+
+def _endpoint(path: str) -> Callable[[BenchContext], Callable[[], object]]:
+    def prepare(ctx: BenchContext) -> Callable[[], object]:
+        client = ctx.client
+
+        def run() -> object:
+            response = client.get(path)
+            response.raise_for_status()
+            return response
+
+        return run
+
+    return prepare
+
+
+for _path in ("/api/transactions", "/api/positions", "/api/funds", "/api/dashboard"):
+    case("api.get_" + _path.rsplit("/", 1)[-1])(_endpoint(_path))
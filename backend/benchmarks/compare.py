@@ -0,0 +1,292 @@
+"""Compare benchmark results with the committed baseline and gate regressions.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.compare                     # run, then compare
+    python -m benchmarks.compare results/latest.json # compare an existing run
+    python -m benchmarks.compare --update-baseline   # run and store as baseline
+
+A timing regresses when the current median is more than ``--threshold``
+slower than the baseline median, the bootstrap confidence interval of that
+ratio lies entirely above ``1 + threshold``, and the median grew by at least
+``--min-delta-ms``; a single noisy run or jitter on a sub-millisecond case
+does not fail the gate. Peak memory regresses when it grows by more than
+``--memory-threshold``. A baseline case that the current run lacks is
+"missing". Only the gated groups (storage and analytics by default) affect
+the exit status; other cases are reported for information.
+Exit status: 0 when nothing regressed, 1 on a regression, 2 on bad input.
+
+Timings only compare meaningfully on the machine that produced the baseline;
+refresh it with ``--update-baseline`` when moving to another runner.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+from .runner import DEFAULT_SIZES, run_benchmarks
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_MIN_DELTA_SECONDS = 0.001
+DEFAULT_MEMORY_THRESHOLD = 0.25
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_GROUPS = ("storage", "analytics")
+# Statuses that fail the gate for a gated case. A gated case dropping out of
+# the run would otherwise hide any regression in it.
+FAILING_STATUSES = ("slower", "memory", "slower+memory", "missing")
+# Timed runs per case when the gate runs the benchmarks itself.
+GATE_REPEAT = 7
+BOOTSTRAP_SAMPLES = 2000
+# Below this many runs per side the interval is meaningless; use the medians.
+MIN_RUNS_FOR_INTERVAL = 3
+# Peak-memory growth smaller than this is allocator noise, whatever the ratio.
+MEMORY_NOISE_BYTES = 1 << 20
+
+
+@dataclass
+class Comparison:
+    case: str
+    size: int
+    gated: bool
+    status: str
+    baseline_median: float | None = None
+    current_median: float | None = None
+    ratio: float | None = None
+    ci_low: float | None = None
+    ci_high: float | None = None
+    baseline_memory: int | None = None
+    current_memory: int | None = None
+    memory_ratio: float | None = None
+
+
+def ratio_interval(
+    baseline: list[float], current: list[float], confidence: float, seed: int = 0
+) -> tuple[float, float]:
+    """Bootstrap interval for ``median(current) / median(baseline)``."""
+    rng = random.Random(seed)
+    ratios = sorted(
+        statistics.median(rng.choices(current, k=len(current)))
+        / statistics.median(rng.choices(baseline, k=len(baseline)))
+        for _ in range(BOOTSTRAP_SAMPLES)
+    )
+    tail = (1 - confidence) / 2
+    low = ratios[int(tail * (len(ratios) - 1))]
+    high = ratios[int((1 - tail) * (len(ratios) - 1))]
+    return low, high
+
+
+def _index(document: dict[str, Any]) -> dict[tuple[str, int], dict[str, Any]]:
+    return {(entry["case"], entry["size"]): entry for entry in document.get("results", [])}
+
+
+def compare(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta: float = DEFAULT_MIN_DELTA_SECONDS,
+    memory_threshold: float = DEFAULT_MEMORY_THRESHOLD,
+    confidence: float = DEFAULT_CONFIDENCE,
+    groups: Iterable[str] = DEFAULT_GROUPS,
+) -> list[Comparison]:
+    gated_groups = set(groups)
+    before = _index(baseline)
+    after = _index(current)
+    comparisons: list[Comparison] = []
+    for key in sorted(set(before) | set(after), key=lambda item: (item[1], item[0])):
+        case, size = key
+        gated = case.split(".", 1)[0] in gated_groups
+        old, new = before.get(key), after.get(key)
+        if old is None or new is None:
+            comparisons.append(Comparison(case, size, gated, "new" if old is None else "missing"))
+            continue
+
+        old_times, new_times = old["timings"], new["timings"]
+        old_median, new_median = statistics.median(old_times), statistics.median(new_times)
+        ratio = new_median / old_median if old_median > 0 else float("inf")
+        if min(len(old_times), len(new_times)) >= MIN_RUNS_FOR_INTERVAL and old_median > 0:
+            low, high = ratio_interval(old_times, new_times, confidence)
+        else:
+            low = high = ratio
+
+        status = "ok"
+        significant = abs(new_median - old_median) >= min_delta
+        if significant and ratio > 1 + threshold and low > 1 + threshold:
+            status = "slower"
+        elif significant and ratio < 1 / (1 + threshold) and high < 1 / (1 + threshold):
+            status = "faster"
+
+        old_memory, new_memory = old.get("peak_memory_bytes"), new.get("peak_memory_bytes")
+        memory_ratio = None
+        if old_memory and new_memory is not None:
+            memory_ratio = new_memory / old_memory
+            if (
+                memory_ratio > 1 + memory_threshold
+                and new_memory - old_memory > MEMORY_NOISE_BYTES
+            ):
+                status = "slower+memory" if status == "slower" else "memory"
+
+        comparisons.append(
+            Comparison(
+                case,
+                size,
+                gated,
+                status,
+                baseline_median=old_median,
+                current_median=new_median,
+                ratio=ratio,
+                ci_low=low,
+                ci_high=high,
+                baseline_memory=old_memory,
+                current_memory=new_memory,
+                memory_ratio=memory_ratio,
+            )
+        )
+    return comparisons
+
+
+def regressions(comparisons: Iterable[Comparison]) -> list[Comparison]:
+    return [item for item in comparisons if item.gated and item.status in FAILING_STATUSES]
+
+
+def format_report(comparisons: list[Comparison]) -> str:
+    lines = [
+        f"{'case':<36} {'size':>9} {'baseline':>11} {'current':>11} "
+        f"{'ratio':>6} {'CI':>13} {'memory':>7}  status"
+    ]
+    for item in comparisons:
+        if item.ratio is None:
+            lines.append(f"{item.case:<36} {item.size:>9,} {'':>62}  {item.status}")
+            continue
+        interval = f"{item.ci_low:.2f}-{item.ci_high:.2f}"
+        memory = f"{item.memory_ratio:.2f}x" if item.memory_ratio is not None else "-"
+        status = item.status if item.gated else f"{item.status} (info)"
+        lines.append(
+            f"{item.case:<36} {item.size:>9,} "
+            f"{item.baseline_median * 1000:>8.2f} ms {item.current_median * 1000:>8.2f} ms "
+            f"{item.ratio:>5.2f}x {interval:>13} {memory:>7}  {status}"
+        )
+    return "\n".join(lines)
+
+
+def _load(path: Path) -> dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Cannot read benchmark results {path}: {exc}") from exc
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare",
+        description="Fail when benchmarks regress against the committed baseline.",
+    )
+    parser.add_argument(
+        "current",
+        nargs="?",
+        type=Path,
+        help="Results file to check. Omitted: run the baseline's cases and sizes now.",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown (0.5 = 50%%).",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=DEFAULT_MIN_DELTA_SECONDS * 1000,
+        help="Ignore median changes smaller than this many milliseconds.",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=DEFAULT_MEMORY_THRESHOLD,
+        help="Allowed peak-memory growth (0.25 = 25%%).",
+    )
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument(
+        "--groups",
+        default=",".join(DEFAULT_GROUPS),
+        help="Comma-separated case groups that gate the exit status.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, help="Timed runs when running now (default: the baseline's)."
+    )
+    parser.add_argument("--report", type=Path, help="Also write the comparison as JSON.")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the current results as the new baseline instead of comparing.",
+    )
+    args = parser.parse_args(argv)
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence must be between 0 and 1")
+
+    try:
+        # Updating only needs the old baseline for its run configuration.
+        baseline = None
+        if not args.update_baseline or (args.current is None and args.baseline.exists()):
+            baseline = _load(args.baseline)
+        if args.current is not None:
+            current = _load(args.current)
+        else:
+            config = (baseline or {}).get("config", {})
+            current = run_benchmarks(
+                sizes=config.get("sizes") or DEFAULT_SIZES,
+                repeat=args.repeat or config.get("repeat") or GATE_REPEAT,
+                cases=config.get("cases"),
+                seed=config.get("seed", 0),
+                log=print,
+            )
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    assert baseline is not None
+
+    comparisons = compare(
+        baseline,
+        current,
+        threshold=args.threshold,
+        min_delta=args.min_delta_ms / 1000,
+        memory_threshold=args.memory_threshold,
+        confidence=args.confidence,
+        groups=[item.strip() for item in args.groups.split(",") if item.strip()],
+    )
+    print(format_report(comparisons))
+    if args.report is not None:
+        args.report.write_text(
+            json.dumps([asdict(item) for item in comparisons], indent=2) + "\n", encoding="utf-8"
+        )
+    failed = regressions(comparisons)
+    if failed:
+        slower = [item for item in failed if item.status != "missing"]
+        missing = [item for item in failed if item.status == "missing"]
+        print()
+        if slower:
+            names = ", ".join(f"{item.case}@{item.size}" for item in slower)
+            print(f"{len(slower)} regression(s): {names}")
+        if missing:
+            names = ", ".join(f"{item.case}@{item.size}" for item in missing)
+            print(f"{len(missing)} gated case(s) missing from the current run: {names}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
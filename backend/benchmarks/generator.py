@@ -0,0 +1,278 @@
+"""Deterministic synthetic portfolios for benchmarks.
+
+The same ``(transactions, seed)`` always yields the same records, ids
+included, so timings from different runs are measured on identical data.
+Portfolios are valid by construction: sells never exceed the holding of their
+funding group, cross-currency sells carry a linked FX exchange, tax
+settlements reference profitable sells, and every symbol has a quote.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+
+from app.models.schemas import (
+    Currency,
+    FundingCapitalAdjustment,
+    FundingGroup,
+    FxExchangeRecord,
+    Market,
+    QuoteRecord,
+    TaxSettlementRecord,
+    Transaction,
+)
+from app.serialization import dump_json
+
+START_DATE = date(2014, 1, 6)
+SPAN_DAYS = 365 * 10
+TAX_RATE = 0.20315
+
+
+@dataclass
+class Portfolio:
+    transactions: list[Transaction] = field(default_factory=list)
+    funding_groups: list[FundingGroup] = field(default_factory=list)
+    tax_settlements: list[TaxSettlementRecord] = field(default_factory=list)
+    capital_adjustments: list[FundingCapitalAdjustment] = field(default_factory=list)
+    fx_exchanges: list[FxExchangeRecord] = field(default_factory=list)
+    quotes: list[QuoteRecord] = field(default_factory=list)
+    # Ids of the longest buy/sell sequence of one holding that nets to zero,
+    # a valid input for compute_round_trip_yield.
+    round_trip_ids: list[str] = field(default_factory=list)
+
+    def collections(self) -> dict[str, tuple[type, list]]:
+        return {
+            "transactions": (Transaction, self.transactions),
+            "funding_groups": (FundingGroup, self.funding_groups),
+            "tax_settlements": (TaxSettlementRecord, self.tax_settlements),
+            "capital_adjustments": (FundingCapitalAdjustment, self.capital_adjustments),
+            "fx_exchanges": (FxExchangeRecord, self.fx_exchanges),
+            "quotes": (QuoteRecord, self.quotes),
+        }
+
+
+@dataclass
+class _Holding:
+    quantity: float = 0.0
+    total_cost: float = 0.0
+    open_ids: list[str] = field(default_factory=list)
+
+
+def _ticker(index: int) -> str:
+    letters = ""
+    index += 26 * 27  # Start at three letters: "AAA".
+    while index:
+        index, remainder = divmod(index, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _symbols(count: int) -> dict[Market, list[str]]:
+    jp_count = (count + 1) // 2
+    return {
+        Market.JP: [f"{1300 + index * 7 % 8600}.T" for index in range(jp_count)],
+        Market.US: [_ticker(index) for index in range(count - jp_count)],
+    }
+
+
+def generate_portfolio(
+    transactions: int,
+    seed: int = 0,
+    symbols: int | None = None,
+    groups: int | None = None,
+) -> Portfolio:
+    """Build a portfolio with ``transactions`` trades over ten years.
+
+    Symbol and funding-group counts scale with the size unless given: 1k
+    trades spread over 20 symbols and 2 groups, 1M over 5,000 symbols and 20
+    groups. Half of the groups fund JP trades in JPY, half US trades in USD.
+    """
+    rng = random.Random(seed)
+
+    def new_id() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    symbol_count = symbols or max(20, min(5000, transactions // 200))
+    group_count = groups or max(2, min(20, transactions // 5000))
+    universe = _symbols(symbol_count)
+    base_price = {
+        symbol: (rng.uniform(500, 8000) if market == Market.JP else rng.uniform(10, 400))
+        for market, names in universe.items()
+        for symbol in names
+    }
+    phase = {symbol: rng.uniform(0, 2 * math.pi) for symbol in base_price}
+
+    portfolio = Portfolio()
+    group_market: dict[str, Market] = {}
+    for index in range(group_count):
+        market = Market.JP if index % 2 == 0 else Market.US
+        currency = Currency.JPY if market == Market.JP else Currency.USD
+        name = currency.value if index < 2 else f"{currency.value}-{index // 2 + 1}"
+        group_market[name] = market
+        portfolio.funding_groups.append(
+            FundingGroup(
+                name=name,
+                currency=currency,
+                initial_amount=5e8 if currency == Currency.JPY else 5e6,
+            )
+        )
+    group_names = list(group_market)
+
+    def price_on(symbol: str, day: int) -> float:
+        wave = 1 + 0.35 * math.sin(day / 120 + phase[symbol]) + day / SPAN_DAYS * 0.5
+        return base_price[symbol] * wave * rng.uniform(0.98, 1.02)
+
+    holdings: dict[tuple[str, str], _Holding] = {}
+    best_round_trip: list[str] = []
+    last_price: dict[str, tuple[float, date]] = {}
+
+    for step in range(transactions):
+        day = step * SPAN_DAYS // max(transactions, 1)
+        trade_date = START_DATE + timedelta(days=day)
+        group = rng.choice(group_names)
+        market = group_market[group]
+        currency = Currency.JPY if market == Market.JP else Currency.USD
+        symbol = rng.choice(universe[market])
+        holding = holdings.setdefault((symbol, group), _Holding())
+        price = price_on(symbol, day)
+        last_price[symbol] = (price, trade_date)
+        lot = 100 if market == Market.JP else 1
+        tx_id = new_id()
+
+        if holding.quantity > 0 and rng.random() < 0.45:
+            if rng.random() < 0.35:
+                quantity = holding.quantity
+            else:
+                lots = int(holding.quantity // lot)
+                quantity = max(1, rng.randint(1, lots)) * lot if lots else holding.quantity
+            gross = round(quantity * price, 2)
+            average = holding.total_cost / holding.quantity
+            cross = market == Market.US and rng.random() < 0.3
+            portfolio.transactions.append(
+                Transaction(
+                    id=tx_id,
+                    trade_date=trade_date,
+                    symbol=symbol,
+                    quantity=-quantity,
+                    gross_amount=gross,
+                    funding_group=group,
+                    cash_currency=currency,
+                    cross_currency=cross,
+                    buy_currency=Currency.USD if cross else None,
+                    sell_currency=Currency.JPY if cross else None,
+                    market=market,
+                    taxed="N",
+                )
+            )
+            if cross:
+                rate = round(rng.uniform(100, 155), 2)
+                portfolio.fx_exchanges.append(
+                    FxExchangeRecord(
+                        id=new_id(),
+                        exchange_date=trade_date,
+                        from_currency=Currency.USD,
+                        to_currency=Currency.JPY,
+                        from_amount=gross,
+                        to_amount=round(gross * rate, 2),
+                        rate=rate,
+                        transaction_id=tx_id,
+                    )
+                )
+            profit = gross - average * quantity
+            if profit > 0 and rng.random() < 0.5:
+                rate = None if currency == Currency.JPY else round(rng.uniform(100, 155), 2)
+                portfolio.tax_settlements.append(
+                    TaxSettlementRecord(
+                        id=new_id(),
+                        transaction_id=tx_id,
+                        funding_group=group,
+                        amount=round(profit * TAX_RATE * (rate or 1), 0) or 1.0,
+                        currency=Currency.JPY,
+                        balance_exchange_rate=rate,
+                        recorded_at=trade_date + timedelta(days=1),
+                    )
+                )
+            holding.open_ids.append(tx_id)
+            holding.total_cost -= average * quantity
+            holding.quantity -= quantity
+            if holding.quantity <= 1e-9:
+                if len(holding.open_ids) > len(best_round_trip):
+                    best_round_trip = holding.open_ids
+                holdings[(symbol, group)] = _Holding()
+        else:
+            quantity = rng.randint(1, 10) * lot
+            gross = round(quantity * price, 2)
+            portfolio.transactions.append(
+                Transaction(
+                    id=tx_id,
+                    trade_date=trade_date,
+                    symbol=symbol,
+                    quantity=quantity,
+                    gross_amount=gross,
+                    funding_group=group,
+                    cash_currency=currency,
+                    market=market,
+                    taxed="Y",
+                )
+            )
+            holding.quantity += quantity
+            holding.total_cost += gross
+            holding.open_ids.append(tx_id)
+
+        if step % 250 == 0 and market == Market.US:
+            rate = round(rng.uniform(100, 155), 2)
+            portfolio.fx_exchanges.append(
+                FxExchangeRecord(
+                    id=new_id(),
+                    exchange_date=trade_date,
+                    from_currency=Currency.JPY,
+                    to_currency=Currency.USD,
+                    from_amount=1_500_000,
+                    to_amount=round(1_500_000 / rate, 2),
+                    rate=rate,
+                    notes="Funding top-up",
+                )
+            )
+        if step % 500 == 0:
+            portfolio.capital_adjustments.append(
+                FundingCapitalAdjustment(
+                    id=new_id(),
+                    funding_group=group,
+                    amount=1_000_000 if currency == Currency.JPY else 10_000,
+                    effective_date=trade_date,
+                )
+            )
+
+    for market, names in universe.items():
+        for symbol in names:
+            if symbol not in last_price:
+                continue
+            price, as_of = last_price[symbol]
+            portfolio.quotes.append(
+                QuoteRecord(
+                    symbol=symbol,
+                    market=market,
+                    price=round(price, 2),
+                    currency=Currency.JPY if market == Market.JP else Currency.USD,
+                    as_of=as_of,
+                )
+            )
+    portfolio.round_trip_ids = list(best_round_trip)
+    return portfolio
+
+
+def write_portfolio(portfolio: Portfolio, directory: Path) -> None:
+    """Write the JSON collection files in the repository's on-disk format.
+
+    A ``LocalDataRepository`` opened on ``directory`` afterwards mirrors them
+    into a fresh SQLite database.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, (model, records) in portfolio.collections().items():
+        content = dump_json(list[model], records, indent=2).decode("utf-8")
+        (directory / f"{name}.json").write_text(content, encoding="utf-8")
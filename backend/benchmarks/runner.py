@@ -0,0 +1,236 @@
+"""Run the benchmark cases and write machine-readable results.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks --sizes 1000,10000 --repeat 7
+    python -m benchmarks --sizes 1000000 --cases 'analytics.*' --output big.json
+
+Each case is warmed up once, timed ``repeat`` times, then run once more under
+``tracemalloc`` for its peak allocation (kept out of the timed runs, which it
+would slow down).
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from .cases import CASES, BenchContext, Case
+
+RESULTS_SCHEMA = 1
+DEFAULT_SIZES = (1_000, 10_000)
+DEFAULT_REPEAT = 5
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def select_cases(patterns: Iterable[str] | None) -> list[Case]:
+    patterns = [item for item in (patterns or []) if item]
+    if not patterns:
+        return list(CASES.values())
+    selected = [
+        item for name, item in CASES.items() if any(fnmatch.fnmatch(name, p) for p in patterns)
+    ]
+    if not selected:
+        raise ValueError(f"No benchmark case matches {', '.join(patterns)}")
+    return selected
+
+
+def time_runs(func: Callable[[], object], repeat: int, warmup: int = 1) -> list[float]:
+    for _ in range(warmup):
+        func()
+    timings: list[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(timings: list[float]) -> dict[str, float]:
+    return {
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "min": min(timings),
+        "max": max(timings),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def environment() -> dict[str, Any]:
+    from app import serialization
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "git_commit": _git_commit(),
+        "orjson": serialization.orjson is not None,
+    }
+
+
+def run_benchmarks(
+    sizes: Iterable[int] = DEFAULT_SIZES,
+    repeat: int = DEFAULT_REPEAT,
+    cases: Iterable[str] | None = None,
+    seed: int = 0,
+    memory: bool = True,
+    log: Callable[[str], None] | None = None,
+) -> dict[str, Any]:
+    """Run the selected cases for every size and return the results document."""
+    selected = select_cases(cases)
+    sizes = list(sizes)
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="kabumemo-bench-") as workdir:
+        for size in sizes:
+            ctx = BenchContext(size=size, seed=seed, data_dir=Path(workdir) / str(size))
+            try:
+                for item in selected:
+                    func = item.prepare(ctx)
+                    timings = time_runs(func, repeat)
+                    entry: dict[str, Any] = {
+                        "case": item.name,
+                        "group": item.group,
+                        "size": size,
+                        "timings": timings,
+                        **summarize(timings),
+                        "peak_memory_bytes": peak_memory(func) if memory else None,
+                    }
+                    results.append(entry)
+                    if log is not None:
+                        log(_format_row(entry))
+            finally:
+                ctx.close()
+    return {
+        "schema": RESULTS_SCHEMA,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": {
+            "sizes": sizes,
+            "repeat": repeat,
+            "seed": seed,
+            "cases": [item.name for item in selected],
+        },
+        "results": results,
+    }
+
+
+def _format_row(entry: dict[str, Any]) -> str:
+    memory = entry["peak_memory_bytes"]
+    memory_text = f"{memory / 2**20:9.1f} MiB" if memory is not None else " " * 13
+    return (
+        f"{entry['case']:<36} {entry['size']:>9,} "
+        f"median {entry['median'] * 1000:10.2f} ms  "
+        f"stdev {entry['stdev'] * 1000:8.2f} ms  {memory_text}"
+    )
+
+
+def _parse_sizes(value: str) -> list[int]:
+    sizes: list[int] = []
+    for item in value.split(","):
+        item = item.strip().lower().replace("_", "")
+        if not item:
+            continue
+        factor = 1
+        if item.endswith("k"):
+            item, factor = item[:-1], 1_000
+        elif item.endswith("m"):
+            item, factor = item[:-1], 1_000_000
+        sizes.append(int(float(item) * factor))
+    if not sizes or any(size <= 0 for size in sizes):
+        raise argparse.ArgumentTypeError("sizes must be positive integers, e.g. 1k,10k,1m")
+    return sizes
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark Kabumemo storage, analytics and API hot paths.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=_parse_sizes,
+        default=list(DEFAULT_SIZES),
+        help="Comma-separated transaction counts (1k, 10k, 1m, ...). Default: 1k,10k.",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per case.")
+    parser.add_argument(
+        "--cases",
+        action="append",
+        help="Glob of case names to run, e.g. 'analytics.*'; may be repeated.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed.")
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip the tracemalloc peak-memory run."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Results file. Default: benchmarks/results/<timestamp>.json.",
+    )
+    parser.add_argument("--list", action="store_true", help="List case names and exit.")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in CASES:
+            print(name)
+        return 0
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    try:
+        document = run_benchmarks(
+            sizes=args.sizes,
+            repeat=args.repeat,
+            cases=args.cases,
+            seed=args.seed,
+            memory=not args.no_memory,
+            log=print,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    output = args.output or RESULTS_DIR / f"{time.strftime('%Y%m%dT%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+from app.models.schemas import Market
+from app.services.price_import import detect_format, import_price_frame, read_price_frame
+from app.storage.repository import LocalDataRepository
+
+
+def resolve_data_dir(explicit: str | None) -> Path:
+    if explicit:
+        return Path(explicit).expanduser().resolve()
+    env_path = os.environ.get("KABUCOUNT_DATA_DIR")
+    if env_path:
+        return Path(env_path).expanduser().resolve()
+    return Path(__file__).resolve().parents[2] / "data"
+
+
+def collect_files(paths: list[str]) -> list[Path]:
+    files: list[Path] = []
+    for raw in paths:
+        path = Path(raw).expanduser()
+        if path.is_dir():
+            files.extend(
+                sorted(
+                    item
+                    for item in path.rglob("*")
+                    if item.suffix.lower() in {".csv", ".parquet", ".pq"}
+                )
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Bulk-load daily closes from CSV/Parquet files into the local price store."
+    )
+    parser.add_argument("paths", nargs="+", help="Price files or directories to scan.")
+    parser.add_argument(
+        "--data-dir",
+        help="Directory containing the JSON files and the SQLite database.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        help="Force the file format instead of detecting it from the extension.",
+    )
+    parser.add_argument(
+        "--symbol",
+        help="Symbol for files without a symbol column (defaults to the file name).",
+    )
+    parser.add_argument(
+        "--market",
+        choices=[market.value for market in Market],
+        help="Market for rows without a market column (otherwise inferred from the ticker).",
+    )
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    repository = LocalDataRepository(base_path=resolve_data_dir(args.data_dir))
+    market = Market(args.market) if args.market else None
+    started = time.perf_counter()
+
+    frames = []
+    for path in collect_files(args.paths):
+        fmt = detect_format(path.name, args.format)
+        frame = read_price_frame(path, fmt, symbol=args.symbol or path.stem, market=market)
+        print(f"Parsed {len(frame)} rows from {path}")
+        frames.append(frame)
+    if not frames:
+        raise SystemExit("No price files found.")
+
+    combined = pd.concat(frames, ignore_index=True).drop_duplicates(
+        subset=["symbol", "market", "date"], keep="last"
+    )
+    summary = import_price_frame(repository.sqlite, combined)
+
+    print(
+        "Imported",
+        summary.rows,
+        "rows for",
+        summary.symbols,
+        "symbols",
+        f"({summary.first_date} → {summary.last_date})",
+        f"in {time.perf_counter() - started:.2f}s into",
+        repository.sqlite.db_path,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import sys
+import time
 from pathlib import Path
 
 import pytest # type: ignore
@@ -750,4 +751,595 @@ def test_cross_currency_requires_cash_currency_match_buy_currency(client: TestCl
     }
 
     resp = client.post("/api/transactions", json=payload)
-    assert resp.status_code == 422
\ No newline at end of file
+    assert resp.status_code == 422
+
+def test_positions_history_batch(client: TestClient, monkeypatch):
+    import json
+
+    from app.models.schemas import PriceHistoryPoint  # type: ignore
+    from app.services import history  # type: ignore
+
+    history.clear_price_history_cache()
+
+    def fake_batch(symbols, start, end=None):
+        return {symbol: [PriceHistoryPoint(date="2025-09-01", close=100.0)] for symbol in symbols}
+
+    monkeypatch.setattr(history, "_download_price_histories", fake_batch)
+
+    buy_payload = {
+        "trade_date": "2025-09-01",
+        "symbol": "7203.T",
+        "quantity": 10,
+        "gross_amount": 150000,
+        "funding_group": "JPY",
+        "cash_currency": "JPY",
+        "market": "JP",
+    }
+    assert client.post("/api/transactions", json=buy_payload).status_code == 201
+
+    body = {
+        "items": [
+            {"symbol": "7203.T", "market": "JP"},
+            {"symbol": "AAPL", "market": "US"},
+        ]
+    }
+    resp = client.post("/api/positions/history/batch", json=body)
+    assert resp.status_code == 200, resp.text
+    items = resp.json()["items"]
+    assert [item["symbol"] for item in items] == ["7203.T", "AAPL"]
+    assert len(items[0]["markers"]) == 1
+    assert items[1]["markers"] == []
+
+    stream = client.post("/api/positions/history/batch?format=ndjson", json=body)
+    assert stream.status_code == 200
+    assert stream.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in stream.text.splitlines() if line]
+    assert {line["symbol"] for line in lines} == {"7203.T", "AAPL"}
+    history.clear_price_history_cache()
+
+
+def test_price_import_feeds_history_without_provider(client: TestClient, monkeypatch):
+    from datetime import date, timedelta
+
+    from app.services import history  # type: ignore
+
+    history.clear_price_history_cache()
+
+    def offline(*args, **kwargs):
+        raise AssertionError("provider must not be called")
+
+    monkeypatch.setattr(history, "_download_price_history", offline)
+    monkeypatch.setattr(history, "_download_price_histories", offline)
+
+    today = date.today()
+    rows = ["symbol,date,close"]
+    for offset in range(40, 0, -1):
+        day = today - timedelta(days=offset)
+        rows.append(f"7203.T,{day.isoformat()},{1000 + offset}")
+        rows.append(f"AAPL,{day.isoformat()},{200 + offset}")
+    rows.append(f"AAPL,{(today - timedelta(days=1)).isoformat()},999")
+    rows.append("AAPL,not-a-date,1")
+
+    resp = client.post(
+        "/api/prices/import",
+        content="\n".join(rows).encode(),
+        headers={"content-type": "text/csv"},
+    )
+    assert resp.status_code == 200, resp.text
+    summary = resp.json()
+    assert summary["rows"] == 80
+    assert summary["symbols"] == 2
+
+    start = (today - timedelta(days=30)).isoformat()
+    history_resp = client.get(
+        f"/api/positions/history?symbol=AAPL&market=US&start={start}"
+    )
+    assert history_resp.status_code == 200, history_resp.text
+    series = history_resp.json()["series"]
+    assert len(series) == 30
+    assert series[-1]["close"] == 999
+
+    bad = client.post("/api/prices/import?format=xlsx", content=b"a,b")
+    assert bad.status_code == 400
+    history.clear_price_history_cache()
+
+
+def test_transactions_page_filters_and_cursor(client: TestClient):
+    for day in range(1, 8):
+        resp = client.post(
+            "/api/transactions",
+            json={
+                "trade_date": f"2025-03-0{day}",
+                "symbol": "xpev" if day % 2 else "NIO",
+                "quantity": 1,
+                "gross_amount": 10.0 * day,
+                "funding_group": "USD",
+                "cash_currency": "USD",
+                "market": "US",
+            },
+        )
+        assert resp.status_code == 201
+
+    seen: list[str] = []
+    cursor = None
+    while True:
+        params = {"symbol": "XPEV", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get("/api/transactions/page", params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        assert len(page["items"]) <= 2
+        seen.extend(item["trade_date"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["2025-03-01", "2025-03-03", "2025-03-05", "2025-03-07"]
+
+    resp = client.get(
+        "/api/transactions", params={"start": "2025-03-02", "end": "2025-03-04"}
+    )
+    assert [item["trade_date"] for item in resp.json()] == [
+        "2025-03-02",
+        "2025-03-03",
+        "2025-03-04",
+    ]
+    assert len(client.get("/api/transactions").json()) == 7
+    assert client.get("/api/transactions/page", params={"cursor": "%%%"}).status_code == 400
+
+
+def test_conditional_get_returns_not_modified(client: TestClient):
+    first = client.get("/api/transactions")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    repeat = client.get("/api/transactions", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == etag
+
+    funds = client.get("/api/funds")
+    assert client.get("/api/funds", headers={"If-None-Match": funds.headers["etag"]}).status_code == 304
+
+    resp = client.post(
+        "/api/transactions",
+        json={
+            "trade_date": "2025-03-01",
+            "symbol": "XPEV",
+            "quantity": 1,
+            "gross_amount": 10.0,
+            "funding_group": "USD",
+            "cash_currency": "USD",
+            "market": "US",
+        },
+    )
+    assert resp.status_code == 201
+
+    changed = client.get("/api/transactions", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()) == 1
+    assert (
+        client.get("/api/funds", headers={"If-None-Match": funds.headers["etag"]}).status_code
+        == 200
+    )
+    filtered = client.get("/api/transactions", params={"symbol": "NIO"})
+    assert filtered.headers["etag"] != changed.headers["etag"]
+
+
+def test_bulk_transactions_validate_chronologically(client: TestClient):
+    import json
+
+    def row(trade_date: str, quantity: float, **extra):
+        payload = {
+            "trade_date": trade_date,
+            "symbol": "XPEV",
+            "quantity": quantity,
+            "gross_amount": 100.0,
+            "funding_group": "USD",
+            "cash_currency": "USD",
+            "market": "US",
+        }
+        payload.update(extra)
+        return payload
+
+    body = "\n".join(
+        [
+            json.dumps(row("2025-01-10", 10)),
+            # Sold before the shares were bought.
+            json.dumps(row("2025-01-05", -5)),
+            # Checked after the earlier 2025-01-11 sell, which leaves only 5 shares.
+            json.dumps(row("2025-01-12", -6)),
+            json.dumps(row("2025-01-11", -5)),
+            json.dumps(row("2025-01-13", 1, funding_group="Missing")),
+            "{not json",
+        ]
+    )
+    resp = client.post(
+        "/api/transactions/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    payload = resp.json()
+    assert [item["status"] for item in payload["results"]] == [
+        "created",
+        "error",
+        "error",
+        "created",
+        "error",
+        "error",
+    ]
+    assert payload["created"] == 2
+    assert payload["results"][1]["error"] == "Insufficient position to complete sell order"
+    assert payload["results"][4]["error"] == "Funding group not found"
+    assert payload["results"][0]["transaction"]["id"]
+    assert len(client.get("/api/transactions").json()) == 2
+
+    atomic = client.post(
+        "/api/transactions/bulk?atomic=true",
+        json=[row("2025-02-01", 1), row("2025-02-02", -50)],
+    )
+    assert atomic.json()["committed"] is False
+    assert [item["status"] for item in atomic.json()["results"]] == ["skipped", "error"]
+    assert len(client.get("/api/transactions").json()) == 2
+
+
+def test_export_streams_collections_and_archive(client: TestClient):
+    import csv
+    import io
+    import json
+    import zipfile
+
+    for day in (1, 2):
+        client.post(
+            "/api/transactions",
+            json={
+                "trade_date": f"2025-04-0{day}",
+                "symbol": "XPEV",
+                "quantity": 2,
+                "gross_amount": 50.0,
+                "funding_group": "USD",
+                "cash_currency": "USD",
+                "market": "US",
+                "memo": "line, with comma",
+            },
+        )
+
+    resp = client.get("/api/export/transactions")
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row["trade_date"] for row in rows] == ["2025-04-01", "2025-04-02"]
+    assert rows[0]["cross_currency"] is False
+
+    resp = client.get("/api/export/transactions", params={"format": "csv"})
+    parsed = list(csv.DictReader(io.StringIO(resp.text)))
+    assert parsed[0]["memo"] == "line, with comma"
+    assert parsed[0]["buy_currency"] == ""
+
+    resp = client.get("/api/export")
+    assert resp.headers["content-disposition"].startswith("attachment;")
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as archive:
+        names = archive.namelist()
+        assert "transactions.ndjson" in names and "funding-groups.ndjson" in names
+        groups = [json.loads(line) for line in archive.read("funding-groups.ndjson").splitlines()]
+        assert {group["name"] for group in groups} == {"JPY", "USD"}
+
+    assert client.get("/api/export/unknown").status_code == 404
+    assert client.get("/api/export/quotes", params={"format": "xml"}).status_code == 400
+
+
+def test_dashboard_loads_each_collection_once(client: TestClient, monkeypatch):
+    repository = getattr(client, "repository")
+    resp = client.post(
+        "/api/transactions",
+        json={
+            "trade_date": "2024-03-01",
+            "symbol": "AAPL",
+            "quantity": 5,
+            "gross_amount": 900,
+            "funding_group": "USD",
+            "cash_currency": "USD",
+            "market": "US",
+        },
+    )
+    assert resp.status_code == 201
+
+    reads: list[str] = []
+    original = repository.list_transactions
+
+    def counting_list_transactions():
+        reads.append("transactions")
+        return original()
+
+    monkeypatch.setattr(repository, "list_transactions", counting_list_transactions)
+
+    resp = client.get("/api/dashboard")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert reads == ["transactions"]
+    assert [item["symbol"] for item in body["transactions"]] == ["AAPL"]
+    assert body["positions"][0]["breakdown"][0]["quantity"] == 5
+    assert {fund["name"] for fund in body["funds"]["funds"]} == {"JPY", "USD"}
+    assert {group["name"] for group in body["funding_groups"]} == {"JPY", "USD"}
+    assert body["quotes"]["records"] == []
+    assert body["tax_settlements"] == []
+
+    resp = client.get("/api/dashboard", params={"include": "positions,funding-groups"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["positions"][0]["symbol"] == "AAPL"
+    assert body["funding_groups"] and body["funds"] is None and body["transactions"] is None
+
+    etag = resp.headers["etag"]
+    resp = client.get(
+        "/api/dashboard",
+        params={"include": "positions,funding-groups"},
+        headers={"If-None-Match": etag},
+    )
+    assert resp.status_code == 304
+
+    assert client.get("/api/dashboard", params={"include": "bogus"}).status_code == 400
+
+
+def test_field_projection_on_heavy_endpoints(client: TestClient):
+    resp = client.post(
+        "/api/transactions",
+        json={
+            "trade_date": "2024-03-01",
+            "symbol": "7203",
+            "quantity": 100,
+            "gross_amount": 250000,
+            "funding_group": "JPY",
+            "cash_currency": "JPY",
+            "market": "JP",
+            "memo": "first lot",
+        },
+    )
+    assert resp.status_code == 201
+
+    resp = client.get("/api/transactions", params={"fields": "symbol,quantity"})
+    assert resp.status_code == 200
+    assert resp.json() == [{"symbol": "7203.T", "quantity": 100.0}]
+    assert resp.headers["etag"]
+
+    resp = client.get("/api/transactions", params={"exclude": "memo,id"})
+    assert "memo" not in resp.json()[0] and "id" not in resp.json()[0]
+
+    resp = client.get("/api/transactions/page", params={"fields": "id"})
+    body = resp.json()
+    assert list(body) == ["items", "next_cursor"]
+    assert list(body["items"][0]) == ["id"]
+
+    resp = client.get(
+        "/api/positions", params={"fields": "symbol,breakdown.quantity", "exclude": "group_breakdown"}
+    )
+    assert resp.json() == [{"symbol": "7203.T", "breakdown": [{"quantity": 100.0}]}]
+
+    resp = client.get("/api/funds", params={"fields": "funds.name,aggregated.currency"})
+    body = resp.json()
+    assert {fund["name"] for fund in body["funds"]} == {"JPY", "USD"}
+    assert all(list(item) == ["currency"] for item in body["aggregated"])
+
+    resp = client.get("/api/dashboard", params={"include": "positions", "fields": "positions.symbol"})
+    assert resp.json() == {"positions": [{"symbol": "7203.T"}]}
+
+    assert client.get("/api/positions", params={"fields": "nope"}).status_code == 400
+    assert client.get("/api/positions", params={"fields": "symbol.x"}).status_code == 400
+
+
+def test_change_log_delta_sync(client: TestClient, monkeypatch):
+    repository = getattr(client, "repository")
+
+    bootstrap = client.get("/api/changes").json()
+    assert bootstrap["reset"] is True
+    cursor = bootstrap["latest_seq"]
+
+    tx = client.post(
+        "/api/transactions",
+        json={
+            "trade_date": "2024-04-01",
+            "symbol": "MSFT",
+            "quantity": 2,
+            "gross_amount": 800,
+            "funding_group": "USD",
+            "cash_currency": "USD",
+            "market": "US",
+        },
+    ).json()
+    client.put(f"/api/transactions/{tx['id']}", json={**tx, "memo": "edited"})
+    client.post(
+        "/api/funding-groups",
+        json={"name": "NISA", "currency": "JPY", "initial_amount": 100000},
+    )
+
+    body = client.get("/api/changes", params={"since": cursor, "client_id": "phone"}).json()
+    assert body["reset"] is False and body["has_more"] is False
+    # Only the latest change per record is kept.
+    assert [(item["collection"], item["op"]) for item in body["changes"]] == [
+        ("transactions", "update"),
+        ("funding_groups", "insert"),
+    ]
+    assert body["changes"][0]["record"]["memo"] == "edited"
+    cursor = body["latest_seq"]
+
+    client.delete(f"/api/transactions/{tx['id']}")
+    page = client.get("/api/changes", params={"since": cursor, "limit": 1}).json()
+    assert page["changes"] == [
+        {
+            "seq": page["latest_seq"],
+            "collection": "transactions",
+            "op": "delete",
+            "id": tx["id"],
+            "changed_at": page["changes"][0]["changed_at"],
+            "record": None,
+        }
+    ]
+
+    # Once every known client acknowledged the log, a stale cursor must reset.
+    client.get("/api/changes", params={"since": page["latest_seq"], "client_id": "phone"})
+    assert repository.sqlite.change_horizon() == page["latest_seq"]
+    assert client.get("/api/changes", params={"since": cursor}).json()["reset"] is True
+    current = client.get("/api/changes", params={"since": page["latest_seq"]}).json()
+    assert current["reset"] is False and current["changes"] == []
+
+
+def test_idempotency_key_replays_without_duplicating(client: TestClient):
+    repository = getattr(client, "repository")
+    payload = {
+        "trade_date": "2024-06-03",
+        "symbol": "NVDA",
+        "quantity": 3,
+        "gross_amount": 3000,
+        "funding_group": "USD",
+        "cash_currency": "USD",
+        "market": "US",
+    }
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/api/transactions", json=payload, headers=headers)
+    assert first.status_code == 201
+    replay = client.post("/api/transactions", json=payload, headers=headers)
+    assert replay.status_code == 201
+    assert replay.json() == first.json()
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert len(repository.list_transactions()) == 1
+
+    conflict = client.post(
+        "/api/transactions", json={**payload, "quantity": 4}, headers=headers
+    )
+    assert conflict.status_code == 422
+
+    # A failed request releases its key so the corrected retry can run.
+    sell_headers = {"Idempotency-Key": "sell-1"}
+    sell = {**payload, "quantity": -5, "gross_amount": 5000}
+    assert client.post("/api/transactions", json=sell, headers=sell_headers).status_code == 400
+    sell["quantity"] = -1
+    assert client.post("/api/transactions", json=sell, headers=sell_headers).status_code == 201
+    assert len(repository.list_transactions()) == 2
+
+    fx_headers = {"Idempotency-Key": "fx-1"}
+    fx = {"from_currency": "JPY", "to_currency": "USD", "from_amount": 15000, "rate": 150}
+    assert client.post("/api/fx-exchanges", json=fx, headers=fx_headers).status_code == 201
+    assert client.post("/api/fx-exchanges", json=fx, headers=fx_headers).status_code == 201
+    assert len(repository.list_fx_exchanges()) == 1
+
+    # A key still held by an in-flight request is rejected.
+    repository.sqlite.claim_idempotency_key("busy", "x", time.time(), time.time() + 60)
+    busy = client.post("/api/transactions", json=payload, headers={"Idempotency-Key": "busy"})
+    assert busy.status_code == 409
+    assert len(repository.list_transactions()) == 2
+
+
+def test_batch_runs_atomically_with_references(client: TestClient):
+    repository = getattr(client, "repository")
+    writes: list[str] = []
+    repository.add_change_listener(writes.append)
+
+    resp = client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {
+                    "action": "create",
+                    "resource": "transactions",
+                    "payload": {
+                        "trade_date": "2024-02-01",
+                        "symbol": "AAPL",
+                        "quantity": 10,
+                        "gross_amount": 1800,
+                        "funding_group": "USD",
+                        "cash_currency": "USD",
+                        "market": "US",
+                    },
+                },
+                {
+                    "action": "create",
+                    "resource": "transactions",
+                    "payload": {
+                        "trade_date": "2024-02-05",
+                        "symbol": "AAPL",
+                        "quantity": -4,
+                        "gross_amount": 760,
+                        "funding_group": "USD",
+                        "cash_currency": "USD",
+                        "market": "US",
+                    },
+                },
+                {
+                    "action": "create",
+                    "resource": "fx_exchanges",
+                    "payload": {
+                        "exchange_date": "2024-02-05",
+                        "from_currency": "USD",
+                        "to_currency": "JPY",
+                        "from_amount": 760,
+                        "rate": 149,
+                        "transaction_id": "$1.id",
+                    },
+                },
+            ]
+        },
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["committed"] is True
+    assert [item["status_code"] for item in body["results"]] == [201, 201, 201]
+    sell_id = body["results"][1]["result"]["id"]
+    assert body["results"][2]["result"]["transaction_id"] == sell_id
+    # One write per touched collection.
+    assert sorted(writes) == ["fx_exchanges", "transactions"]
+    assert len(repository.list_transactions()) == 2
+
+    writes.clear()
+    resp = client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {"action": "delete", "resource": "fx_exchanges", "id": body["results"][2]["result"]["id"]},
+                {"action": "delete", "resource": "transactions", "id": "missing"},
+                {"action": "delete", "resource": "transactions", "id": sell_id},
+            ]
+        },
+    )
+    body = resp.json()
+    assert body["committed"] is False
+    assert [item["status_code"] for item in body["results"]] == [204, 404, 424]
+    assert writes == []
+    assert len(repository.list_fx_exchanges()) == 1
+
+
+def test_metrics_exposes_route_storage_and_analytics_timings(client: TestClient):
+    resp = client.post(
+        "/api/transactions",
+        json={
+            "trade_date": "2024-01-10",
+            "symbol": "7203.T",
+            "quantity": 100,
+            "gross_amount": 250000,
+            "funding_group": "JPY",
+            "cash_currency": "JPY",
+            "market": "JP",
+        },
+    )
+    assert resp.status_code == 201, resp.text
+    transaction_id = resp.json()["id"]
+    first = client.get("/api/positions")
+    assert client.get("/api/positions", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    assert '# TYPE kabumemo_http_request_duration_seconds histogram' in text
+    assert 'route="/api/positions",status="304"' in text
+    assert client.delete(f"/api/transactions/{transaction_id}").status_code == 204
+    text = client.get("/metrics").text
+    # Path parameters are reported by template, not by value.
+    assert 'method="DELETE",route="/api/transactions/{transaction_id}",status="204"' in text
+    assert transaction_id not in text
+    assert 'kabumemo_repository_write_seconds_count{collection="transactions"}' in text
+    assert 'kabumemo_repository_read_bytes_total{collection="transactions"}' in text
+    assert 'kabumemo_sqlite_operation_seconds_count{operation="replace_transactions"}' in text
+    assert 'kabumemo_analytics_seconds_count{function="compute_positions"}' in text
+    assert 'kabumemo_cache_requests_total{cache="etag_positions",result="hit"}' in text
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest  # type: ignore
+
+from app.services.provider import ProviderBusyError, ProviderGate
+from app.storage.async_repository import AsyncLocalDataRepository
+from app.storage.repository import LocalDataRepository
+
+
+def test_provider_gate_acall_coalesces_without_blocking_the_loop():
+    gate = ProviderGate(concurrency=1, timeout=2.0)
+    release = threading.Event()
+    calls = 0
+
+    def slow_download() -> str:
+        nonlocal calls
+        calls += 1
+        release.wait(2.0)
+        return "prices"
+
+    async def scenario() -> None:
+        first = asyncio.create_task(gate.acall("quotes", slow_download))
+        second = asyncio.create_task(gate.acall("quotes", slow_download))
+        # The loop stays responsive while both callers wait on the provider.
+        ticks = 0
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        release.set()
+        assert await first == "prices"
+        assert await second == "prices"
+
+    asyncio.run(scenario())
+    assert calls == 1
+
+    async def timed_out() -> None:
+        await gate.acall("stuck", lambda: time.sleep(0.5), timeout=0.05)
+
+    with pytest.raises(ProviderBusyError):
+        asyncio.run(timed_out())
+
+
+def test_async_repository_offloads_calls(tmp_path):
+    repository = LocalDataRepository(base_path=tmp_path)
+    repository.ensure_default_groups()
+    store = AsyncLocalDataRepository(repository)
+    loop_thread = threading.get_ident()
+
+    def group_names(repo: LocalDataRepository) -> tuple[int, list[str]]:
+        return threading.get_ident(), [group.name for group in repo.list_funding_groups()]
+
+    async def scenario() -> None:
+        groups = await store.list_funding_groups()
+        assert {group.name for group in groups} == {"JPY", "USD"}
+        worker_thread, names = await store.run(group_names)
+        assert worker_thread != loop_thread
+        assert sorted(names) == ["JPY", "USD"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import json
+
+from app.services.analytics import (
+    compute_fund_snapshots,
+    compute_positions,
+    compute_round_trip_yield,
+)
+from benchmarks.compare import compare, regressions
+from benchmarks.compare import main as gate_main
+from benchmarks.generator import generate_portfolio
+from benchmarks.runner import main, run_benchmarks
+
+
+def test_generator_is_deterministic_and_valid():
+    first = generate_portfolio(600, seed=3)
+    second = generate_portfolio(600, seed=3)
+    assert first.transactions == second.transactions
+    assert first.fx_exchanges == second.fx_exchanges
+    assert generate_portfolio(600, seed=4).transactions != first.transactions
+
+    assert len(first.transactions) == 600
+    assert {group.name for group in first.funding_groups} == {"JPY", "USD"}
+    linked = {fx.transaction_id for fx in first.fx_exchanges if fx.transaction_id}
+    assert linked and all(
+        tx.cross_currency for tx in first.transactions if tx.id in linked
+    )
+    compute_positions(first.transactions, first.fx_exchanges, first.quotes)
+    compute_fund_snapshots(
+        first.transactions,
+        first.funding_groups,
+        first.tax_settlements,
+        first.capital_adjustments,
+        first.fx_exchanges,
+    )
+    ids = set(first.round_trip_ids)
+    selected = [tx for tx in first.transactions if tx.id in ids]
+    assert compute_round_trip_yield(selected, first.tax_settlements).trade_count == len(ids)
+
+
+def test_runner_writes_results(tmp_path):
+    document = run_benchmarks(
+        sizes=[200], repeat=2, cases=["analytics.compute_positions", "api.get_funds"]
+    )
+    assert [entry["case"] for entry in document["results"]] == [
+        "analytics.compute_positions",
+        "api.get_funds",
+    ]
+    entry = document["results"][0]
+    assert len(entry["timings"]) == 2
+    assert entry["median"] > 0 and entry["peak_memory_bytes"] > 0
+
+    output = tmp_path / "results.json"
+    argv = ["--sizes", "100", "--repeat", "1", "--cases", "storage.*", "--no-memory"]
+    assert main([*argv, "--output", str(output)]) == 0
+    assert '"storage.update_transaction"' in output.read_text(encoding="utf-8")
+
+
+def _document(**cases: tuple[list[float], int]) -> dict:
+    return {
+        "config": {},
+        "results": [
+            {
+                "case": name.replace("__", "."),
+                "size": 1000,
+                "timings": timings,
+                "peak_memory_bytes": memory,
+            }
+            for name, (timings, memory) in cases.items()
+        ],
+    }
+
+
+def test_gate_flags_significant_regressions_only(tmp_path, capsys):
+    steady = [0.010, 0.011, 0.0105, 0.0102, 0.0108]
+    baseline = _document(
+        analytics__compute_fund_snapshots=(steady, 10 << 20),
+        storage__list_transactions=(steady, 10 << 20),
+        storage__add_transactions_bulk=(steady, 10 << 20),
+        api__get_funds=(steady, 10 << 20),
+        api__get_dashboard=(steady, 10 << 20),
+    )
+    current = _document(
+        # 3x slower across every run: a regression.
+        analytics__compute_fund_snapshots=([value * 3 for value in steady], 10 << 20),
+        # One slow outlier leaves the median and the interval in range.
+        storage__list_transactions=([*steady[:4], 0.05], 30 << 20),
+        # Outside the gated groups: reported only.
+        api__get_funds=([value * 3 for value in steady], 10 << 20),
+        # storage.add_transactions_bulk and api.get_dashboard did not run.
+    )
+    statuses = {item.case: item.status for item in compare(baseline, current)}
+    assert statuses == {
+        "analytics.compute_fund_snapshots": "slower",
+        "storage.list_transactions": "memory",
+        "storage.add_transactions_bulk": "missing",
+        "api.get_funds": "slower",
+        "api.get_dashboard": "missing",
+    }
+    failed = {item.case for item in regressions(compare(baseline, current))}
+    assert failed == {
+        "analytics.compute_fund_snapshots",
+        "storage.list_transactions",
+        "storage.add_transactions_bulk",
+    }
+    assert regressions(compare(baseline, baseline)) == []
+
+    baseline_path = tmp_path / "baseline.json"
+    current_path = tmp_path / "current.json"
+    baseline_path.write_text(json.dumps(baseline), encoding="utf-8")
+    current_path.write_text(json.dumps(current), encoding="utf-8")
+    assert gate_main([str(current_path), "--baseline", str(baseline_path)]) == 1
+    assert "missing from the current run: storage.add_transactions_bulk@1000" in (
+        capsys.readouterr().out
+    )
+    assert gate_main([str(baseline_path), "--baseline", str(baseline_path)]) == 0
+    assert gate_main([str(tmp_path / "missing.json"), "--baseline", str(baseline_path)]) == 2
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+
+from app.models.schemas import Currency, Market, QuoteRecord, TransactionCreate
+from app.services.events import ChangeFeed, EventBroadcaster
+from app.storage.repository import LocalDataRepository
+
+
+def test_broadcaster_replaces_backlog_with_resync():
+    broadcaster = EventBroadcaster(queue_size=2)
+
+    async def scenario() -> list[str]:
+        async with broadcaster.subscribe() as queue:
+            assert broadcaster.subscriber_count == 1
+            for index in range(3):
+                broadcaster.publish("quotes", {"index": index})
+            await asyncio.sleep(0)
+            names = []
+            while not queue.empty():
+                names.append((await queue.get()).name)
+        assert broadcaster.subscriber_count == 0
+        return names
+
+    assert asyncio.run(scenario()) == ["resync"]
+
+
+def test_change_feed_publishes_deltas(tmp_path):
+    repository = LocalDataRepository(base_path=tmp_path)
+    repository.ensure_default_groups()
+    broadcaster = EventBroadcaster()
+    feed = ChangeFeed(broadcaster, debounce=0.01)
+    feed.attach(repository)
+
+    async def next_events(queue, count: int) -> dict[str, dict]:
+        events = {}
+        for _ in range(count):
+            event = await asyncio.wait_for(queue.get(), 2.0)
+            events[event.name] = event.data
+        return events
+
+    async def scenario() -> None:
+        async with broadcaster.subscribe() as queue:
+            await feed.ensure_running()
+            await asyncio.to_thread(
+                repository.add_transaction,
+                TransactionCreate(
+                    trade_date=date(2024, 1, 10),
+                    symbol="AAPL",
+                    quantity=10,
+                    gross_amount=1500,
+                    funding_group="USD",
+                    cash_currency=Currency.USD,
+                    market=Market.US,
+                ),
+            )
+            events = await next_events(queue, 2)
+            assert [item["symbol"] for item in events["positions"]["changed"]] == ["AAPL"]
+            usd = next(item for item in events["funds"]["changed"] if item["name"] == "USD")
+            assert usd["holding_cost"] == 1500
+
+            await asyncio.to_thread(
+                repository.replace_quotes,
+                [
+                    QuoteRecord(
+                        symbol="AAPL",
+                        market=Market.US,
+                        price=160,
+                        currency=Currency.USD,
+                        as_of=date(2024, 1, 11),
+                    )
+                ],
+            )
+            events = await next_events(queue, 2)
+            assert events["quotes"]["changed"][0]["price"] == 160
+            breakdown = events["positions"]["changed"][0]["breakdown"][0]
+            assert breakdown["unrealized_pl"] == 100
+            # Only the views the write touched are recomputed.
+            assert "funds" not in events
+
+    asyncio.run(scenario())
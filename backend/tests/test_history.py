@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, timedelta
 
 import pytest # type: ignore
 
@@ -61,7 +61,7 @@ def test_build_trade_markers_converts_fx():
 def test_get_position_history_includes_markers(monkeypatch):
     series = [history.PriceHistoryPoint(date=date(2025, 1, 2), close=101.5)]
 
-    def fake_fetch(symbol: str, market: Market, period: str = "1y"):
+    def fake_fetch(symbol: str, market: Market, period: str = "1y", **_):
         return series
 
     monkeypatch.setattr(history, "fetch_price_history", fake_fetch)
@@ -81,3 +81,330 @@ def test_get_position_history_includes_markers(monkeypatch):
     marker = response.markers[0]
     assert marker.side == TradeSide.SELL
     assert marker.price == pytest.approx(110.0)
+
+
+@pytest.fixture()
+def fresh_cache():
+    history.clear_price_history_cache()
+    yield
+    history.clear_price_history_cache()
+
+
+def test_fetch_price_history_coalesces_concurrent_calls(monkeypatch, fresh_cache):
+    import threading
+    import time
+
+    calls: list[str] = []
+    series = [history.PriceHistoryPoint(date=date.today() - timedelta(days=1), close=10.0)]
+
+    def slow_download(symbol: str, start: date, end: date | None = None):
+        calls.append(symbol)
+        time.sleep(0.2)
+        return series
+
+    monkeypatch.setattr(history, "_download_price_history", slow_download)
+
+    results: list[list[history.PriceHistoryPoint]] = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(history.fetch_price_history("XPEV", Market.US))
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["XPEV"]
+    assert results == [series] * 5
+
+    # Same-day repeat is served from the cache without another provider call.
+    assert history.fetch_price_history("XPEV", Market.US) == series
+    assert calls == ["XPEV"]
+
+
+def test_fetch_price_history_degrades_to_cached_series(monkeypatch, fresh_cache):
+    import time
+
+    stale_day = date.today() - timedelta(days=30)
+    stale = [history.PriceHistoryPoint(date=stale_day, close=9.0)]
+    history._series_cache[("XPEV", Market.US)] = history._PriceSeries(
+        dates=[stale_day],
+        points=stale,
+        coverage_start=date(2000, 1, 1),
+        fetched_on=stale_day,
+    )
+
+    def hanging_download(symbol: str, start: date, end: date | None = None):
+        time.sleep(0.5)
+        return []
+
+    monkeypatch.setattr(history, "_download_price_history", hanging_download)
+    monkeypatch.setattr(history.provider_gate, "timeout", 0.05)
+
+    started = time.perf_counter()
+    assert history.fetch_price_history("XPEV", Market.US) == stale
+    assert time.perf_counter() - started < 0.4
+
+
+def test_get_position_histories_batches_cache_misses(monkeypatch, fresh_cache):
+    day = date.today() - timedelta(days=3)
+    cached = [history.PriceHistoryPoint(date=day, close=50.0)]
+    history._store_download("AAPL", Market.US, (date(2000, 1, 1), None), cached, None)
+    batches: list[list[str]] = []
+
+    def fake_batch(symbols, start, end=None):
+        batches.append(list(symbols))
+        return {
+            symbol: [history.PriceHistoryPoint(date=day, close=float(len(symbol)))]
+            for symbol in symbols
+        }
+
+    monkeypatch.setattr(history, "_download_price_histories", fake_batch)
+
+    transactions = [
+        make_transaction(id="tx-1", symbol="XPEV"),
+        make_transaction(id="tx-2", symbol="7203.T", market=Market.JP, cash_currency=Currency.JPY),
+        make_transaction(id="tx-3", symbol="AAPL", quantity=-2.0, gross_amount=300.0),
+    ]
+    items = [("XPEV", Market.US), ("AAPL", Market.US), ("7203.T", Market.JP)]
+
+    responses = history.get_position_histories(
+        transactions=transactions, fx_exchanges=[], items=items
+    )
+
+    assert batches == [["XPEV", "7203.T"]]
+    assert [(item.symbol, item.market) for item in responses] == items
+    assert responses[1].series == cached
+    assert [marker.transaction_id for marker in responses[0].markers] == ["tx-1"]
+    assert [marker.transaction_id for marker in responses[1].markers] == ["tx-3"]
+    assert responses[2].currency == Currency.JPY
+    assert responses[2].series[0].close == pytest.approx(6.0)
+
+
+def test_downsample_series_keeps_shape_and_marker_anchors():
+    import math
+    from datetime import timedelta
+
+    from app.services.downsampling import downsample_series
+
+    start = date(2020, 1, 1)
+    points = [
+        history.PriceHistoryPoint(
+            date=start + timedelta(days=offset), close=100 + 10 * math.sin(offset / 25)
+        )
+        for offset in range(1500)
+    ]
+    anchor = date(2021, 6, 5)
+    peak = max(points, key=lambda point: point.close)
+
+    reduced = downsample_series(points, max_points=120, anchors=[anchor, date(2030, 1, 1)])
+
+    assert len(reduced) <= 120
+    assert reduced[0] == points[0] and reduced[-1] == points[-1]
+    assert any(point.date == anchor for point in reduced)
+    assert max(point.close for point in reduced) == pytest.approx(peak.close, abs=0.05)
+    assert [point.date for point in reduced] == sorted(point.date for point in reduced)
+
+    monthly = downsample_series(points, resolution="1mo", anchors=[anchor])
+    assert monthly[0].date == date(2020, 1, 31)
+    assert any(point.date == anchor for point in monthly)
+    assert len(monthly) == 51
+
+    with pytest.raises(ValueError):
+        downsample_series(points, resolution="5m")
+
+
+def test_price_history_served_from_store_with_incremental_top_up(
+    monkeypatch, fresh_cache, tmp_path
+):
+    from app.storage.sqlite_storage import SQLiteStorage
+
+    store = SQLiteStorage(tmp_path / "prices.db")
+    today = date.today()
+    downloads: list[tuple[date, date | None]] = []
+    bars = {
+        today - timedelta(days=offset): 100.0 + offset for offset in range(1, 4000)
+    }
+
+    def fake_download(symbol: str, start: date, end: date | None = None):
+        downloads.append((start, end))
+        return [
+            history.PriceHistoryPoint(date=day, close=close)
+            for day, close in sorted(bars.items())
+            if day >= start and (end is None or day < end)
+        ]
+
+    monkeypatch.setattr(history, "_download_price_history", fake_download)
+
+    one_year_start = history.resolve_history_range("1y")[0]
+    five_year_start = history.resolve_history_range("5y")[0]
+    one_year = history.fetch_price_history("XPEV", Market.US, "1y", store=store)
+    assert downloads == [(one_year_start, None)]
+
+    # A longer preset only backfills the years before the stored coverage.
+    five_years = history.fetch_price_history("XPEV", Market.US, "5y", store=store)
+    assert downloads[1:] == [(five_year_start, one_year_start)]
+    assert five_years[0].date >= five_year_start
+    assert five_years[-len(one_year):] == one_year
+    assert [point.date for point in five_years] == sorted(
+        day for day in bars if day >= five_year_start
+    )
+
+    # A shorter preset and a custom range are sliced locally, even after a restart.
+    history.clear_price_history_cache()
+    again = history.fetch_price_history("XPEV", Market.US, "1y", store=store)
+    custom = history.fetch_price_history(
+        "XPEV", Market.US, start=today - timedelta(days=30), end=today - timedelta(days=10), store=store
+    )
+    assert len(downloads) == 2
+    assert again == one_year
+    assert [point.date for point in custom] == [
+        today - timedelta(days=offset) for offset in range(30, 9, -1)
+    ]
+
+    # A stale store only downloads bars from the last stored date onwards.
+    store.set_price_coverage("XPEV", "US", five_year_start, today - timedelta(days=5))
+    bars[today] = 1.0
+    history.clear_price_history_cache()
+    refreshed = history.fetch_price_history("XPEV", Market.US, "1y", store=store)
+    assert downloads[-1] == (today - timedelta(days=1), None)
+    assert refreshed[-1].date == today
+
+    with pytest.raises(ValueError):
+        history.resolve_history_range("7d")
+
+
+def test_failed_download_does_not_record_coverage(monkeypatch, fresh_cache, tmp_path):
+    from app.storage.sqlite_storage import SQLiteStorage
+
+    store = SQLiteStorage(tmp_path / "prices.db")
+    day = date.today() - timedelta(days=1)
+    downloads: list[date] = []
+
+    def flaky_download(symbol: str, start: date, end: date | None = None):
+        downloads.append(start)
+        if len(downloads) == 1:
+            raise RuntimeError("Too Many Requests")
+        return [history.PriceHistoryPoint(date=day, close=10.0)]
+
+    monkeypatch.setattr(history, "_download_price_history", flaky_download)
+
+    assert history.fetch_price_history("XPEV", Market.US, store=store) == []
+    assert store.get_price_coverage("XPEV", "US") is None
+
+    # The range is still unknown, so the next request downloads it again.
+    history.clear_price_history_cache()
+    series = history.fetch_price_history("XPEV", Market.US, store=store)
+    assert downloads == [history.resolve_history_range("1y")[0]] * 2
+    assert [point.close for point in series] == [10.0]
+    assert store.get_price_coverage("XPEV", "US") == (downloads[0], date.today())
+
+    # yfinance logs failures per ticker; an empty window is not one of them.
+    from yfinance import shared
+
+    monkeypatch.setattr(
+        shared,
+        "_ERRORS",
+        {"XPEV": "YFRateLimitError('Too Many Requests')", "AAPL": "YFPricesMissingError('$AAPL')"},
+    )
+    assert list(history._download_errors(["XPEV", "AAPL", "MSFT"])) == ["XPEV"]
+
+
+def test_empty_backfill_window_is_downloaded_once(monkeypatch, fresh_cache, tmp_path):
+    from app.storage.sqlite_storage import SQLiteStorage
+
+    store = SQLiteStorage(tmp_path / "prices.db")
+    today = date.today()
+    # Stored from a Monday; the request starts on the Saturday before it.
+    monday = date(2021, 1, 4)
+    store.upsert_price_history([("XPEV", "US", monday, 10.0)])
+    store.set_price_coverage("XPEV", "US", monday, today)
+    downloads: list[tuple[date, date | None]] = []
+
+    def fake_download(symbol: str, start: date, end: date | None = None):
+        downloads.append((start, end))
+        return []
+
+    monkeypatch.setattr(history, "_download_price_history", fake_download)
+
+    for _ in range(2):
+        series = history.fetch_price_history(
+            "XPEV", Market.US, start=date(2021, 1, 2), end=date(2021, 1, 8), store=store
+        )
+        assert [point.date for point in series] == [monday]
+        history.clear_price_history_cache()
+
+    assert downloads == [(date(2021, 1, 2), monday)]
+    assert store.get_price_coverage("XPEV", "US") == (date(2021, 1, 2), today)
+
+
+def test_align_history_tracks_position_and_average_cost():
+    series = [
+        history.PriceHistoryPoint(date=date(2025, 1, day), close=100.0 + day)
+        for day in (6, 7, 8, 9, 10)
+    ]
+    transactions = [
+        make_transaction(id="tx-0", trade_date=date(2025, 1, 3), quantity=5.0, gross_amount=450.0),
+        make_transaction(id="tx-1", trade_date=date(2025, 1, 7), quantity=5.0, gross_amount=550.0),
+        make_transaction(id="tx-2", trade_date=date(2025, 1, 8), quantity=-4.0, gross_amount=480.0),
+        make_transaction(id="tx-3", trade_date=date(2025, 1, 20), quantity=-6.0, gross_amount=600.0),
+    ]
+    markers = history.build_trade_markers(transactions, [], "XPEV", Market.US)
+
+    rows = history.align_history(series, markers, Currency.USD)
+
+    assert [row.date for row in rows] == [point.date for point in series]
+    assert [len(row.markers) for row in rows] == [0, 1, 1, 0, 0]
+    assert [row.position for row in rows] == [5.0, 10.0, 6.0, 6.0, 6.0]
+    assert rows[0].average_cost == pytest.approx(90.0)
+    assert rows[1].average_cost == pytest.approx(100.0)
+    assert rows[2].average_cost == pytest.approx(100.0)
+    assert rows[2].markers[0].transaction_id == "tx-2"
+
+
+def test_align_history_without_markers_reports_flat_position():
+    series = [
+        history.PriceHistoryPoint(date=date(2025, 1, day), close=100.0 + day)
+        for day in (6, 7, 8)
+    ]
+
+    rows = history.align_history(series, [], Currency.USD)
+
+    assert [row.date for row in rows] == [point.date for point in series]
+    assert [row.position for row in rows] == [0.0, 0.0, 0.0]
+    assert all(row.average_cost is None and row.markers == [] for row in rows)
+
+
+def test_disjoint_price_import_keeps_gap_downloadable(monkeypatch, fresh_cache, tmp_path):
+    from app.services.price_import import import_price_file
+    from app.storage.sqlite_storage import SQLiteStorage
+
+    store = SQLiteStorage(tmp_path / "prices.db")
+    today = date.today()
+    year_ago = history.resolve_history_range("1y")[0]
+    store.upsert_price_history([("XPEV", "US", today - timedelta(days=1), 10.0)])
+    store.set_price_coverage("XPEV", "US", year_ago, today)
+    downloads: list[tuple[date, date | None]] = []
+
+    def fake_download(symbol: str, start: date, end: date | None = None):
+        downloads.append((start, end))
+        return [history.PriceHistoryPoint(date=date(2011, 6, 1), close=5.0)]
+
+    monkeypatch.setattr(history, "_download_price_history", fake_download)
+
+    older = b"date,close\n1995-01-03,1.0\n1995-01-04,1.1\n"
+    import_price_file(store, older, "csv", symbol="XPEV")
+    assert store.get_price_coverage("XPEV", "US") == (year_ago, today)
+
+    series = history.fetch_price_history(
+        "XPEV", Market.US, start=date(2010, 1, 1), end=date(2012, 12, 31), store=store
+    )
+    assert downloads == [(date(2010, 1, 1), year_ago)]
+    assert [point.close for point in series] == [5.0]
+
+    # A file that joins the stored range still widens it.
+    adjacent = b"date,close\n2009-12-30,4.8\n2009-12-31,4.9\n"
+    import_price_file(store, adjacent, "csv", symbol="XPEV")
+    assert store.get_price_coverage("XPEV", "US") == (date(2009, 12, 30), today)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import profiling
+from app.profiling import StackSampler, profile_requested
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_collects_stacks_of_matching_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    try:
+        with StackSampler(interval=0.001, include=(__file__,)) as sampler:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = sampler.collapsed().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1].startswith("_busy_loop (")
+
+
+def test_profile_requested_by_header_or_query():
+    assert profile_requested(b"", [(b"x-kabumemo-profile", b"1")])
+    assert profile_requested(b"symbol=AAPL&profile=1", [])
+    assert not profile_requested(b"profile=0", [(b"x-kabumemo-profile", b"0")])
+    assert not profile_requested(b"", [])
+
+
+def test_profiled_request_stores_collapsed_stacks(tmp_path, monkeypatch):
+    from app.api import routes
+    from app.main import create_app
+    from app.storage.repository import LocalDataRepository
+
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    repository = LocalDataRepository(base_path=tmp_path)
+    repository.ensure_default_groups()
+    monkeypatch.setattr(routes, "repository", repository)
+    client = TestClient(create_app())
+
+    assert "x-kabumemo-profile" not in client.get("/api/funds").headers
+
+    resp = client.get("/api/funds", headers={"X-Kabumemo-Profile": "1"})
+    assert resp.status_code == 200
+    name = resp.headers["x-kabumemo-profile"]
+    assert name.endswith("-get-api-funds.collapsed")
+    assert Path(tmp_path / "profiles" / name).is_file()
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import json
+from datetime import date
+
+from app.models.schemas import Currency, Market, Transaction, TransactionCreate
+from app.serialization import dump_json, dumps, loads
+from app.storage.repository import LocalDataRepository
+
+
+def test_storage_writes_match_indented_json_dumps(tmp_path):
+    repository = LocalDataRepository(base_path=tmp_path)
+    repository.ensure_default_groups()
+    repository.add_transactions(
+        [
+            TransactionCreate(
+                trade_date=date(2024, 5, 1),
+                symbol="7203",
+                quantity=quantity,
+                gross_amount=1234.5678 * quantity,
+                funding_group="JPY",
+                cash_currency=Currency.JPY,
+                market=Market.JP,
+                memo="東京 memo" if quantity == 3 else None,
+            )
+            for quantity in (1, 3, 7)
+        ]
+    )
+
+    transactions = repository.list_transactions()
+    expected = json.dumps(
+        [item.model_dump(mode="json") for item in transactions], ensure_ascii=False, indent=2
+    )
+    path = tmp_path / "transactions.json"
+    assert path.read_text(encoding="utf-8") == expected
+    assert dump_json(list[Transaction], [], indent=2) == b"[]"
+
+
+def test_plain_json_round_trip():
+    payload = {"name": "資金", "values": [1, 2.5, None, True]}
+    assert loads(dumps(payload)) == payload
+    assert b" " not in dumps({"a": [1, 2]})
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Generous ceiling for `import app.main`; override on slow CI machines.
+IMPORT_BUDGET_MS = float(os.environ.get("KABUCOUNT_IMPORT_BUDGET_MS", "1500"))
+
+HEAVY_MODULES = ("pandas", "yfinance", "numpy")
+
+
+def _import_app(tmp_path: Path) -> tuple[dict[str, int], set[str]]:
+    script = (
+        "import sys\n"
+        "import app.main\n"
+        f"print('LOADED', ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    env = {**os.environ, "KABUCOUNT_DATA_DIR": str(tmp_path / "data")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative_us.isdigit():
+            cumulative[name] = int(cumulative_us)
+    loaded_line = next(line for line in result.stdout.splitlines() if line.startswith("LOADED"))
+    loaded = {name for name in loaded_line.removeprefix("LOADED").strip().split(",") if name}
+    return cumulative, loaded
+
+
+def test_app_import_defers_market_data_stack(tmp_path):
+    cumulative, loaded = _import_app(tmp_path)
+
+    assert loaded == set()
+    assert "app.main" in cumulative
+    elapsed_ms = cumulative["app.main"] / 1000
+    assert elapsed_ms < IMPORT_BUDGET_MS, f"import app.main took {elapsed_ms:.0f} ms"
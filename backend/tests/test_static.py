@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import gzip
+import sys
+from pathlib import Path
+
+import pytest  # type: ignore
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+
+@pytest.fixture()
+def dist_dir(tmp_path, monkeypatch):
+    dist = tmp_path / "dist"
+    assets = dist / "assets"
+    assets.mkdir(parents=True)
+    (dist / "index.html").write_text("<!doctype html><div id=app></div>", encoding="utf-8")
+    script = "console.log('kabumemo');\n" * 200
+    (assets / "index-abc123.js").write_text(script, encoding="utf-8")
+    (assets / "index-abc123.js.gz").write_bytes(gzip.compress(script.encode("utf-8")))
+    monkeypatch.setenv("KABUMEMO_DIST_DIR", str(dist))
+    monkeypatch.setenv("KABUCOUNT_DATA_DIR", str(tmp_path / "data"))
+    return dist
+
+
+def test_precompressed_asset_is_served(dist_dir):
+    from app.main import create_app  # type: ignore
+
+    client = TestClient(create_app())
+    resp = client.get("/assets/index-abc123.js", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["content-type"].startswith("text/javascript")
+    assert "accept-encoding" in resp.headers["vary"].lower()
+    assert resp.text.startswith("console.log")
+
+    plain = client.get("/assets/index-abc123.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.text == resp.text
+
+
+def test_api_responses_are_compressed_above_threshold(dist_dir):
+    from app.api import routes  # type: ignore
+    from app.main import create_app  # type: ignore
+    from app.storage.repository import LocalDataRepository  # type: ignore
+
+    repository = LocalDataRepository(base_path=dist_dir.parent / "data")
+    repository.ensure_default_groups()
+    routes.repository = repository
+    client = TestClient(create_app())
+
+    small = client.get("/api/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    for day in range(1, 29):
+        client.post(
+            "/api/transactions",
+            json={
+                "trade_date": f"2025-02-{day:02d}",
+                "symbol": "XPEV",
+                "quantity": 1,
+                "gross_amount": 10.0,
+                "funding_group": "USD",
+                "cash_currency": "USD",
+                "market": "US",
+            },
+        )
+    resp = client.get("/api/transactions", headers={"Accept-Encoding": "gzip;q=1, br;q=0"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert int(resp.headers["content-length"]) < len(resp.content)
+    assert len(resp.json()) == 28
+    assert resp.headers["etag"].startswith("W/")
+
+    cached = client.get(
+        "/api/transactions",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["etag"]},
+    )
+    assert cached.status_code == 304
+
+
+def test_spa_shell_served_from_memory_with_etag(dist_dir):
+    from app.main import create_app  # type: ignore
+
+    client = TestClient(create_app())
+    (dist_dir / "index.html").unlink()  # deep links must not depend on the disk copy
+
+    resp = client.get("/portfolio/positions")
+    assert resp.status_code == 200
+    assert "id=app" in resp.text
+    assert resp.headers["cache-control"] == "no-cache"
+    etag = resp.headers["etag"]
+
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/unknown").status_code == 404
+
+    asset = client.get("/assets/index-abc123.js")
+    assert asset.headers["cache-control"] == "public, max-age=31536000, immutable"
@@ -0,0 +1,49 @@
+// Write .br and .gz siblings next to compressible build outputs so the
+// backend can serve them without compressing on every request.
+import { readdir, readFile, stat, writeFile } from "node:fs/promises";
+import { join, extname } from "node:path";
+import { fileURLToPath } from "node:url";
+import { brotliCompressSync, constants, gzipSync } from "node:zlib";
+
+const distDir = fileURLToPath(new URL("../dist", import.meta.url));
+const extensions = new Set([".js", ".mjs", ".css", ".html", ".svg", ".json", ".txt", ".map"]);
+const minimumSize = 1024;
+
+async function* walk(dir) {
+  for (const entry of await readdir(dir, { withFileTypes: true })) {
+    const path = join(dir, entry.name);
+    if (entry.isDirectory()) {
+      yield* walk(path);
+    } else if (extensions.has(extname(entry.name))) {
+      yield path;
+    }
+  }
+}
+
+let written = 0;
+for await (const path of walk(distDir)) {
+  if ((await stat(path)).size < minimumSize) {
+    continue;
+  }
+  const source = await readFile(path);
+  const variants = [
+    [
+      ".br",
+      brotliCompressSync(source, {
+        params: {
+          [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+          [constants.BROTLI_PARAM_SIZE_HINT]: source.length
+        }
+      })
+    ],
+    [".gz", gzipSync(source, { level: 9 })]
+  ];
+  for (const [suffix, compressed] of variants) {
+    // Skip variants that would not save anything.
+    if (compressed.length < source.length) {
+      await writeFile(path + suffix, compressed);
+      written += 1;
+    }
+  }
+}
+console.log(`[precompress] wrote ${written} compressed assets in ${distDir}`);
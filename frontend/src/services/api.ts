@@ -1,4 +1,10 @@
 import type {
+  BatchOperation,
+  BatchResponse,
+  BulkTransactionResponse,
+  ChangesResponse,
+  DashboardResponse,
+  DashboardSection,
   FxExchangeCreate,
   FxExchangeRecord,
   FundSnapshot,
@@ -8,7 +14,10 @@ import type {
   FundingGroup,
   FundingGroupUpdate,
   HealthResponse,
+  LiveEventHandlers,
   Position,
+  PositionHistoryBatchResponse,
+  PositionHistoryItem,
   PositionHistoryResponse,
   QuoteSnapshot,
   RoundTripYieldRequest,
@@ -18,6 +27,8 @@ import type {
   TaxSettlementUpdate,
   Transaction,
   TransactionCreate,
+  TransactionPage,
+  TransactionQuery,
   TransactionUpdate
 } from "@/types/api";
 
@@ -71,6 +82,30 @@ export function getTransactions(): Promise<Transaction[]> {
   return request<Transaction[]>("/transactions");
 }
 
+export function runBatch(operations: BatchOperation[]): Promise<BatchResponse> {
+  return request<BatchResponse>("/batch", {
+    method: "POST",
+    body: JSON.stringify({ operations })
+  });
+}
+
+export function getTransactionPage(
+  query: TransactionQuery = {},
+  cursor?: string | null,
+  limit = 100
+): Promise<TransactionPage> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  for (const [key, value] of Object.entries(query)) {
+    if (value) {
+      params.set(key, String(value));
+    }
+  }
+  if (cursor) {
+    params.set("cursor", cursor);
+  }
+  return request<TransactionPage>(`/transactions/page?${params.toString()}`);
+}
+
 export function createTransaction(payload: TransactionCreate): Promise<Transaction> {
   return request<Transaction>("/transactions", {
     method: "POST",
@@ -78,6 +113,16 @@ export function createTransaction(payload: TransactionCreate): Promise<Transacti
   });
 }
 
+export function createTransactionsBulk(
+  payloads: TransactionCreate[],
+  atomic = false
+): Promise<BulkTransactionResponse> {
+  return request<BulkTransactionResponse>(`/transactions/bulk?atomic=${atomic}`, {
+    method: "POST",
+    body: JSON.stringify(payloads)
+  });
+}
+
 export function updateTransaction(
   id: string,
   payload: TransactionUpdate
@@ -117,6 +162,16 @@ export function getPositionHistory(
   return request<PositionHistoryResponse>(`/positions/history?${params.toString()}`);
 }
 
+export function getPositionHistoryBatch(
+  items: PositionHistoryItem[],
+  period = "1y"
+): Promise<PositionHistoryBatchResponse> {
+  return request<PositionHistoryBatchResponse>("/positions/history/batch", {
+    method: "POST",
+    body: JSON.stringify({ items, period })
+  });
+}
+
 // Quotes ------------------------------------------------------------------------
 export function getQuotes(): Promise<QuoteSnapshot> {
   return request<QuoteSnapshot>("/quotes");
@@ -134,6 +189,11 @@ export function getFunds(): Promise<FundSnapshotsResponse> {
   return request<FundSnapshotsResponse>("/funds");
 }
 
+export function getDashboard(include?: DashboardSection[]): Promise<DashboardResponse> {
+  const query = include?.length ? `?include=${encodeURIComponent(include.join(","))}` : "";
+  return request<DashboardResponse>(`/dashboard${query}`);
+}
+
 // Funding groups -----------------------------------------------------------------
 export function getFundingGroups(): Promise<FundingGroup[]> {
   return request<FundingGroup[]>("/funding-groups");
@@ -225,4 +285,28 @@ export function deleteTaxSettlement(id: string): Promise<void> {
   });
 }
 
+// Delta sync ----------------------------------------------------------------------
+export function getChanges(since: number, clientId?: string): Promise<ChangesResponse> {
+  const params = new URLSearchParams({ since: String(since) });
+  if (clientId) {
+    params.set("client_id", clientId);
+  }
+  return request<ChangesResponse>(`/changes?${params.toString()}`);
+}
+
+// Live updates --------------------------------------------------------------------
+export function subscribeEvents(handlers: LiveEventHandlers): () => void {
+  const source = new EventSource(`${API_BASE}/events`);
+  for (const name of ["positions", "quotes", "funds"] as const) {
+    const handler = handlers[name];
+    if (handler) {
+      source.addEventListener(name, (event) =>
+        handler(JSON.parse((event as MessageEvent<string>).data))
+      );
+    }
+  }
+  source.addEventListener("resync", () => handlers.resync?.());
+  return () => source.close();
+}
+
 export { ApiError };
@@ -156,12 +156,58 @@ export interface TradeMarker {
   transaction_id: string;
 }
 
+export interface AlignedHistoryRow {
+  date: string;
+  close: number;
+  markers: TradeMarker[];
+  position: number;
+  average_cost: number | null;
+}
+
 export interface PositionHistoryResponse {
   symbol: string;
   market: Market;
   currency: Currency;
   series: PriceHistoryPoint[];
   markers: TradeMarker[];
+  aligned?: AlignedHistoryRow[] | null;
+}
+
+export interface TransactionQuery {
+  symbol?: string;
+  market?: Market;
+  funding_group?: string;
+  taxed?: TaxStatus;
+  start?: string;
+  end?: string;
+}
+
+export interface BulkTransactionResult {
+  index: number;
+  status: "created" | "skipped" | "error";
+  transaction: Transaction | null;
+  error: string | null;
+}
+
+export interface BulkTransactionResponse {
+  committed: boolean;
+  created: number;
+  failed: number;
+  results: BulkTransactionResult[];
+}
+
+export interface TransactionPage {
+  items: Transaction[];
+  next_cursor: string | null;
+}
+
+export interface PositionHistoryItem {
+  symbol: string;
+  market: Market;
+}
+
+export interface PositionHistoryBatchResponse {
+  items: PositionHistoryResponse[];
 }
 
 export interface FundSnapshot {
@@ -229,3 +275,88 @@ export interface TaxSettlementUpdate {
 export interface HealthResponse {
   status: string;
 }
+
+export type DashboardSection =
+  | "transactions"
+  | "positions"
+  | "funds"
+  | "funding-groups"
+  | "quotes"
+  | "tax-settlements";
+
+export interface DashboardResponse {
+  transactions: Transaction[] | null;
+  positions: Position[] | null;
+  funds: FundSnapshotsResponse | null;
+  funding_groups: FundingGroup[] | null;
+  quotes: QuoteSnapshot | null;
+  tax_settlements: TaxSettlementRecord[] | null;
+}
+
+export type BatchAction = "create" | "update" | "delete";
+
+export type BatchResource =
+  | "transactions"
+  | "fx_exchanges"
+  | "tax_settlements"
+  | "capital_adjustments";
+
+export interface BatchOperation {
+  action: BatchAction;
+  resource: BatchResource;
+  id?: string;
+  payload?: Record<string, unknown>;
+}
+
+export interface BatchOperationResult {
+  index: number;
+  status_code: number;
+  result: Record<string, unknown> | null;
+  error: string | null;
+}
+
+export interface BatchResponse {
+  committed: boolean;
+  results: BatchOperationResult[];
+}
+
+export type ChangeOperation = "insert" | "update" | "delete";
+
+export interface ChangeEntry {
+  seq: number;
+  collection: string;
+  op: ChangeOperation;
+  id: string;
+  changed_at: string;
+  record: Record<string, unknown> | null;
+}
+
+export interface ChangesResponse {
+  since: number;
+  latest_seq: number;
+  reset: boolean;
+  has_more: boolean;
+  changes: ChangeEntry[];
+}
+
+export interface PositionsEvent {
+  changed: Position[];
+  removed: { symbol: string; market: Market }[];
+}
+
+export interface QuotesEvent {
+  changed: QuoteRecord[];
+}
+
+export interface FundsEvent {
+  changed: FundSnapshot[];
+  removed: string[];
+  aggregated: AggregatedFundSnapshot[];
+}
+
+export interface LiveEventHandlers {
+  positions?: (event: PositionsEvent) => void;
+  quotes?: (event: QuotesEvent) => void;
+  funds?: (event: FundsEvent) => void;
+  resync?: () => void;
+}